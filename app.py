@@ -1,4 +1,5 @@
 from app import create_app
+from app.sockets import socketio
 
 app = create_app()
 
@@ -6,5 +7,6 @@ PORT = 8000
 # host = '127.0.0.1'
 host = '0.0.0.0'
 
+# Servidor de desarrollo; en produccion: gunicorn wsgi:app (ver gunicorn.conf.py)
 if __name__ == "__main__":
-    app.run(host = host, port=PORT,debug=True)
+    socketio.run(app, host = host, port=PORT,debug=True)
@@ -5,6 +5,18 @@ from app.config.config import Config
 from app.controllers.auth import bcrypt
 from dotenv import load_dotenv
 from app.routers.index import api_bp
+from app.sockets import init_sockets
+from app.services.autosave import autosave_buffer
+from app.services.pubsub import pubsub
+from app.services.codegen import export_cache
+from app.services.diagram_analysis import analysis_cache
+from app.services.listing_cache import listing_cache
+from app.services.jobs import job_runner
+from app.services.audit_rollup import audit_rollup
+from app.services.thumbnails import thumbnail_service
+from app.services.metrics import metrics
+from app.services.profiling import request_profiler
+from app.services.structured_logging import init_logging
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
 from http import HTTPStatus # Necesario para usar códigos de estado en los manejadores
@@ -12,16 +24,34 @@ from http import HTTPStatus # Necesario para usar códigos de estado en los mane
 load_dotenv()
 jwt = JWTManager()
 
-def create_app():
+def create_app(config_class=Config):
     app = Flask(__name__)
     
-    # Carga la configuración directamente desde la clase Config
-    app.config.from_object(Config)
+    # Carga la configuración desde la clase Config (los benchmarks pasan una subclase)
+    app.config.from_object(config_class)
+
+    # Registro estructurado antes que nada, para que las extensiones ya escriban por la cola
+    init_logging(app)
     
     # Inicializa las extensiones
     init_db(app)
     bcrypt.init_app(app)
     jwt.init_app(app)
+    pubsub.init_app(app)
+    autosave_buffer.init_app(app)
+    export_cache.init_app(app)
+    analysis_cache.init_app(app)
+    listing_cache.init_app(app)
+    job_runner.init_app(app)
+    audit_rollup.init_app(app)
+    thumbnail_service.init_app(app)
+    metrics.init_app(app)
+    request_profiler.init_app(app)
+
+    # Cada worker empieza a escuchar el bus de eventos con su primera peticion (despues del fork)
+    app.before_request(pubsub.start)
+    # Y el despachador de trabajos, por el mismo motivo (con JOB_EXECUTOR=thread)
+    app.before_request(job_runner.start)
     
     # --- MANEJADORES DE ERRORES DE JWT ---
     # Esto asegura que los errores 401 de JWT (token faltante, inválido o expirado)
@@ -54,7 +84,7 @@ def create_app():
     # Captura cualquier error 500 no manejado por otras funciones.
     @app.errorhandler(HTTPStatus.INTERNAL_SERVER_ERROR) # 500
     def handle_internal_server_error(e):
-        print(f"Error 500 no manejado: {e}")
+        app.logger.error("Error 500 no manejado: %s", e, exc_info=getattr(e, "original_exception", None) or e)
         return jsonify({
             "message": "Error interno del servidor no manejado. Por favor, revisa los logs del backend.",
             "error_detail": str(e)
@@ -73,5 +103,8 @@ def create_app():
 
     app.register_blueprint(api_bp, url_prefix="/api")
 
+    # Canal de edicion colaborativa (un espacio de nombres Socket.IO por proyecto)
+    init_sockets(app)
+
     from . import models
     return app
\ No newline at end of file
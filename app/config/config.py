@@ -4,6 +4,9 @@ import json
 # Cargar variables del .env
 load_dotenv()
 
+# Raiz del repositorio, para ubicar los directorios locales de trabajo (var/)
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
 class Config: 
     SECRET_KEY = os.getenv("SECRET_KEY", "supersecretkey")
     JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "jwtsecretkey")
@@ -16,4 +19,136 @@ class Config:
 
     SQLALCHEMY_DATABASE_URI = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    SQLALCHEMY_ECHO = True
\ No newline at end of file
+    # Pool por worker: con gthread hay muchos hilos, pero la mayoria esperan en WebSockets
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    }
+    # El eco de SQLAlchemy escribe cada sentencia de forma sincrona: solo para depurar
+    SQLALCHEMY_ECHO = os.getenv("SQLALCHEMY_ECHO", "false").lower() == "true"
+
+    # Socket.IO para la edicion colaborativa en tiempo real
+    SOCKETIO_ASYNC_MODE = os.getenv("SOCKETIO_ASYNC_MODE", "threading")
+    SOCKETIO_CORS_ORIGINS = os.getenv("SOCKETIO_CORS_ORIGINS", "https://primerparcialingsw.netlify.app").split(",")
+
+    # Presencia y cursores en vivo (solo memoria, nunca se guardan en la BD)
+    CURSOR_BROADCAST_INTERVAL_MS = int(os.getenv("CURSOR_BROADCAST_INTERVAL_MS", "50"))
+    CURSOR_STALE_MS = int(os.getenv("CURSOR_STALE_MS", "1000"))
+    CURSOR_MAX_SELECTION = int(os.getenv("CURSOR_MAX_SELECTION", "256"))
+
+    # Autosave con escritura diferida: las ediciones se coalescen en memoria y se vuelcan a la BD
+    AUTOSAVE_DEBOUNCE_SECONDS = float(os.getenv("AUTOSAVE_DEBOUNCE_SECONDS", "2"))
+    AUTOSAVE_MAX_DELAY_SECONDS = float(os.getenv("AUTOSAVE_MAX_DELAY_SECONDS", "10"))
+    AUTOSAVE_MAX_PENDING_EDITS = int(os.getenv("AUTOSAVE_MAX_PENDING_EDITS", "500"))
+    AUTOSAVE_JOURNAL_DIR = os.getenv("AUTOSAVE_JOURNAL_DIR", os.path.join(BASE_DIR, "var", "autosave"))
+    AUTOSAVE_JOURNAL_FSYNC = os.getenv("AUTOSAVE_JOURNAL_FSYNC", "true").lower() == "true"
+    # Espera maxima a que otro worker vuelque o descarte sus ediciones de un proyecto
+    AUTOSAVE_SETTLE_TIMEOUT_SECONDS = float(os.getenv("AUTOSAVE_SETTLE_TIMEOUT_SECONDS", "5"))
+    # Cada cuanto cada worker reaplica los diarios que dejo un worker caido
+    AUTOSAVE_RECOVERY_INTERVAL_SECONDS = float(os.getenv("AUTOSAVE_RECOVERY_INTERVAL_SECONDS", "30"))
+
+    # Bus de eventos entre workers: "inprocess" (un solo proceso) o "unix" (sockets Unix, sin broker)
+    PUBSUB_BACKEND = os.getenv("PUBSUB_BACKEND", "inprocess")
+    PUBSUB_SOCKET_DIR = os.getenv("PUBSUB_SOCKET_DIR", os.path.join(BASE_DIR, "var", "pubsub"))
+
+    # Cache en disco de los zips de codigo generado (uno por version de proyecto)
+    CODEGEN_CACHE_DIR = os.getenv("CODEGEN_CACHE_DIR", os.path.join(BASE_DIR, "var", "exports"))
+
+    # Importacion en streaming de XMI/PlantUML
+    IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+    IMPORT_MAX_BYTES = int(os.getenv("IMPORT_MAX_BYTES", str(200 * 1024 * 1024)))
+
+    # Limites del guardado completo (/save); se comprueban antes de parsear el JSON
+    SAVE_MAX_BYTES = int(os.getenv("SAVE_MAX_BYTES", str(20 * 1024 * 1024)))
+    SAVE_MAX_CLASSES = int(os.getenv("SAVE_MAX_CLASSES", "20000"))
+    SAVE_MAX_RELATIONSHIPS = int(os.getenv("SAVE_MAX_RELATIONSHIPS", "50000"))
+    # Cota de objetos JSON (clases, atributos, metodos, parametros...) estimada sin parsear
+    SAVE_MAX_OBJECTS = int(os.getenv("SAVE_MAX_OBJECTS", "1000000"))
+
+    # Analisis del diagrama: cache por version y validacion al guardar ("off", "warn" o "strict")
+    ANALYSIS_CACHE_SIZE = int(os.getenv("ANALYSIS_CACHE_SIZE", "256"))
+    DIAGRAM_VALIDATION = os.getenv("DIAGRAM_VALIDATION", "warn")
+
+    # Cache por usuario del listado de proyectos (/api/projects/list); 0 en cualquiera la desactiva
+    PROJECT_LIST_CACHE_TTL_SECONDS = float(os.getenv("PROJECT_LIST_CACHE_TTL_SECONDS", "300"))
+    PROJECT_LIST_CACHE_MAX_BYTES = int(os.getenv("PROJECT_LIST_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+    # Layout automatico en el servidor (NumPy); la repulsion se calcula en bloques de LAYOUT_CHUNK_SIZE filas
+    LAYOUT_MAX_ITERATIONS = int(os.getenv("LAYOUT_MAX_ITERATIONS", "300"))
+    LAYOUT_CHUNK_SIZE = int(os.getenv("LAYOUT_CHUNK_SIZE", "256"))
+
+    # Busqueda de texto completo (/api/search)
+    SEARCH_PAGE_SIZE = int(os.getenv("SEARCH_PAGE_SIZE", "20"))
+    SEARCH_MAX_PAGE_SIZE = int(os.getenv("SEARCH_MAX_PAGE_SIZE", "100"))
+
+    # Historial de revisiones: copia completa cada N guardados y deltas comprimidos entre ellas
+    REVISION_SNAPSHOT_INTERVAL = int(os.getenv("REVISION_SNAPSHOT_INTERVAL", "20"))
+    REVISION_COMPRESSION_LEVEL = int(os.getenv("REVISION_COMPRESSION_LEVEL", "6"))
+    REVISION_PAGE_SIZE = int(os.getenv("REVISION_PAGE_SIZE", "50"))
+
+    # Miniaturas SVG de los proyectos (trabajo "thumbnail" en la cola despues de cada guardado)
+    THUMBNAIL_DIR = os.getenv("THUMBNAIL_DIR", os.path.join(BASE_DIR, "var", "thumbnails"))
+    THUMBNAIL_WIDTH = int(os.getenv("THUMBNAIL_WIDTH", "320"))
+    THUMBNAIL_HEIGHT = int(os.getenv("THUMBNAIL_HEIGHT", "200"))
+    # Vigencia de las URLs firmadas de las miniaturas (cada URL vale entre una y dos veces este
+    # valor); debe ser mayor que PROJECT_LIST_CACHE_TTL_SECONDS
+    THUMBNAIL_URL_TTL_SECONDS = int(os.getenv("THUMBNAIL_URL_TTL_SECONDS", str(24 * 3600)))
+
+    # Consultas por area visible (/api/classes?bbox=): tamaño maximo de una clase en el lienzo
+    VIEWPORT_CLASS_WIDTH = float(os.getenv("VIEWPORT_CLASS_WIDTH", "400"))
+    VIEWPORT_CLASS_HEIGHT = float(os.getenv("VIEWPORT_CLASS_HEIGHT", "600"))
+
+    # Sincronizacion incremental de los listados (?since=&limit=&fields=)
+    SYNC_PAGE_SIZE = int(os.getenv("SYNC_PAGE_SIZE", "500"))
+    SYNC_MAX_PAGE_SIZE = int(os.getenv("SYNC_MAX_PAGE_SIZE", "5000"))
+    SYNC_TOMBSTONE_RETENTION_DAYS = int(os.getenv("SYNC_TOMBSTONE_RETENTION_DAYS", "30"))
+
+    # Particiones hash por proyecto de las tablas classes y relationships. Solo lo lee la migracion
+    # que las crea; para cambiarlo hay que volver a ejecutarla (ver migrations/versions/a2c7e9f4b1d3)
+    DIAGRAM_PARTITIONS = int(os.getenv("DIAGRAM_PARTITIONS", "32"))
+
+    # Instrumentacion (/metrics): umbral del registro de peticiones lentas y token del scrape
+    # ('Authorization: Bearer <METRICS_TOKEN>'). Sin token, /metrics responde 404
+    SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "1000"))
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+    # Registro estructurado: JSON por linea ("json") o legible ("text"), escrito desde una cola
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+    LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    # Muestreo de advertencias repetidas: cuantas pasan por plantilla de mensaje en cada intervalo
+    LOG_SAMPLE_BURST = int(os.getenv("LOG_SAMPLE_BURST", "10"))
+    LOG_SAMPLE_INTERVAL_SECONDS = float(os.getenv("LOG_SAMPLE_INTERVAL_SECONDS", "60"))
+
+    # Perfilado bajo demanda: cabecera X-Profile con este token, o muestreo de las rutas de PROFILE_PATHS
+    PROFILING_TOKEN = os.getenv("PROFILING_TOKEN")
+    PROFILE_PATHS = os.getenv("PROFILE_PATHS", "")
+    PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0.01"))
+    PROFILE_MAX_PER_MINUTE = int(os.getenv("PROFILE_MAX_PER_MINUTE", "10"))
+    PROFILE_MODE = os.getenv("PROFILE_MODE", "cprofile")
+    PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+    PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(BASE_DIR, "var", "profiles"))
+
+    # Cola de trabajos en segundo plano (tabla 'jobs'). JOB_EXECUTOR=thread los ejecuta en los
+    # workers web; con "off" solo se encolan y los ejecuta "flask --app wsgi jobs worker"
+    JOB_EXECUTOR = os.getenv("JOB_EXECUTOR", "thread")
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+    JOB_POLL_INTERVAL_SECONDS = float(os.getenv("JOB_POLL_INTERVAL_SECONDS", "1"))
+    JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "120"))
+    JOB_SHUTDOWN_TIMEOUT_SECONDS = float(os.getenv("JOB_SHUTDOWN_TIMEOUT_SECONDS", "10"))
+    JOB_RETENTION_DAYS = int(os.getenv("JOB_RETENTION_DAYS", "7"))
+    # Limites globales por tipo que sustituyen a los del codigo, p. ej. "layout=1,thumbnail=4"
+    JOB_CONCURRENCY = os.getenv("JOB_CONCURRENCY", "")
+    JOB_SPOOL_DIR = os.getenv("JOB_SPOOL_DIR", os.path.join(BASE_DIR, "var", "jobs"))
+
+    # Resumenes de la bitacora de sesiones (/api/audit). Sin AUDIT_TOKEN las consultas no estan
+    # disponibles; se envian con 'Authorization: Bearer <AUDIT_TOKEN>'. Los eventos se suman cada
+    # AUDIT_ROLLUP_INTERVAL_SECONDS como mucho
+    AUDIT_TOKEN = os.getenv("AUDIT_TOKEN")
+    AUDIT_ROLLUP_INTERVAL_SECONDS = float(os.getenv("AUDIT_ROLLUP_INTERVAL_SECONDS", "60"))
+    AUDIT_DEFAULT_DAYS = int(os.getenv("AUDIT_DEFAULT_DAYS", "30"))
+    AUDIT_MAX_DAYS = int(os.getenv("AUDIT_MAX_DAYS", "366"))
+    AUDIT_PAGE_SIZE = int(os.getenv("AUDIT_PAGE_SIZE", "50"))
+    AUDIT_MAX_PAGE_SIZE = int(os.getenv("AUDIT_MAX_PAGE_SIZE", "500"))
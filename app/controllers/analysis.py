@@ -0,0 +1,64 @@
+import logging
+from flask import Blueprint, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.database import db
+from app.models import Project, Class, Relationship
+from app.errors.errors import GenericError
+from app.services.autosave import autosave_buffer
+from app.services.diagram_analysis import analysis_cache, analyze
+from http import HTTPStatus
+
+analysis_bp = Blueprint('analysis_bp', __name__)
+logger = logging.getLogger(__name__)
+
+@analysis_bp.route('/<uuid:project_id>/analysis', methods=['GET'])
+@jwt_required()
+def get_project_analysis(project_id):
+    """
+    Analiza la estructura del diagrama: ciclos de herencia, relaciones colgantes o duplicadas,
+    clases huerfanas y metricas por clase (profundidad de herencia, acoplamiento).
+    El resultado se guarda en cache por version del proyecto.
+    """
+    try:
+        current_user_id = get_jwt_identity()
+
+        project = Project.get_active().filter_by(id=project_id).one_or_none()
+
+        if not project:
+            raise GenericError(HTTPStatus.NOT_FOUND, HTTPStatus.NOT_FOUND.phrase, "Proyecto no encontrado o eliminado.")
+
+        if str(project.user_id) != current_user_id:
+            raise GenericError(HTTPStatus.FORBIDDEN, HTTPStatus.FORBIDDEN.phrase, "Acceso denegado. El proyecto no te pertenece.")
+
+        # Solo el dueño vuelca las ediciones pendientes; refresh() relee la version que dejo el volcado
+        autosave_buffer.flush(project_id)
+        db.session.refresh(project)
+
+        version = project.version
+        result = analysis_cache.get(project.id, version)
+        cached = result is not None
+
+        if not cached:
+            # Solo se leen las columnas que necesita el indice, sin materializar objetos ORM
+            classes = db.session.query(Class.id, Class.name).filter_by(project_id=project.id, is_deleted=False).all()
+            relationships = db.session.query(
+                Relationship.id, Relationship.source_class_id, Relationship.target_class_id, Relationship.relationship_type
+            ).filter_by(project_id=project.id, is_deleted=False).all()
+            result = analyze(classes, relationships)
+            analysis_cache.put(project.id, version, result)
+
+        db.session.remove()
+
+        return jsonify({"projectId": str(project_id), "version": version, "cached": cached, **result}), HTTPStatus.OK
+
+    except GenericError as e:
+        db.session.rollback()
+        db.session.remove()
+        return jsonify({"message": e.message}), e.status
+    except Exception as err:
+        db.session.rollback()
+        db.session.remove()
+        logger.exception("Error inesperado en get_project_analysis")
+        return jsonify({
+            "message": "Error interno del servidor al analizar el proyecto."
+        }), HTTPStatus.INTERNAL_SERVER_ERROR
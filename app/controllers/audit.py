@@ -0,0 +1,121 @@
+import hmac
+import logging
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from flask import Blueprint, current_app, jsonify, request
+from app.database import db
+from app.errors.errors import GenericError
+from app.services.audit_rollup import audit_rollup
+from http import HTTPStatus
+
+audit_bp = Blueprint('audit_bp', __name__)
+logger = logging.getLogger(__name__)
+
+
+def _require_admin():
+    # Los resumenes llevan IPs de todos los usuarios: sin AUDIT_TOKEN configurado no se exponen
+    token = current_app.config['AUDIT_TOKEN']
+    if not token:
+        raise GenericError(HTTPStatus.NOT_FOUND, HTTPStatus.NOT_FOUND.phrase, "Recurso no disponible.")
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {token}"):
+        raise GenericError(HTTPStatus.UNAUTHORIZED, HTTPStatus.UNAUTHORIZED.phrase, "Token de administracion invalido.")
+
+
+def _date_range():
+    """Rango 'from'/'to' (AAAA-MM-DD, incluidos); por defecto los ultimos AUDIT_DEFAULT_DAYS dias UTC."""
+    try:
+        end = date.fromisoformat(request.args['to']) if 'to' in request.args else datetime.now(timezone.utc).date()
+        start = date.fromisoformat(request.args['from']) if 'from' in request.args else end - timedelta(days=current_app.config['AUDIT_DEFAULT_DAYS'] - 1)
+    except ValueError:
+        raise GenericError(HTTPStatus.BAD_REQUEST, HTTPStatus.BAD_REQUEST.phrase, "Los parametros 'from' y 'to' deben ser fechas AAAA-MM-DD.")
+    if start > end:
+        raise GenericError(HTTPStatus.BAD_REQUEST, HTTPStatus.BAD_REQUEST.phrase, "El parametro 'from' es posterior a 'to'.")
+    if (end - start).days + 1 > current_app.config['AUDIT_MAX_DAYS']:
+        raise GenericError(HTTPStatus.BAD_REQUEST, HTTPStatus.BAD_REQUEST.phrase, f"El rango no puede pasar de {current_app.config['AUDIT_MAX_DAYS']} dias.")
+    return start, end
+
+
+@audit_bp.route('/sessions', methods=['GET'])
+def get_session_counts():
+    """
+    Registros, inicios y cierres de sesion por dia (UTC) desde los resumenes de la bitacora, con
+    'Authorization: Bearer <AUDIT_TOKEN>'. Query params: 'from' y 'to' (AAAA-MM-DD) y 'userId'
+    para los de un usuario, que ademas trae su ultima IP. El coste depende de los dias del rango,
+    no de los eventos; 'refreshedThrough' indica hasta donde estan sumados.
+    """
+    try:
+        _require_admin()
+        start, end = _date_range()
+
+        user_id = request.args.get('userId')
+        if user_id is not None:
+            try:
+                user_id = uuid.UUID(user_id)
+            except ValueError:
+                raise GenericError(HTTPStatus.BAD_REQUEST, HTTPStatus.BAD_REQUEST.phrase, "El parametro 'userId' debe ser un UUID valido.")
+
+        days = audit_rollup.daily_counts(start, end, user_id)
+        totals = {}
+        for day in days:
+            for name, count in day["actions"].items():
+                totals[name] = totals.get(name, 0) + count
+
+        body = {
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "refreshedThrough": audit_rollup.refreshed_at().isoformat(),
+            "actions": audit_rollup.actions(),
+            "totals": totals,
+            "days": days,
+        }
+        if user_id is not None:
+            body["userId"] = str(user_id)
+            body["lastIp"] = audit_rollup.last_ip(user_id)
+        db.session.remove()
+        return jsonify(body), HTTPStatus.OK
+
+    except GenericError as e:
+        db.session.rollback()
+        return jsonify({"message": e.message}), e.status
+    except Exception as err:
+        db.session.rollback()
+        logger.exception("Error inesperado en get_session_counts")
+        return jsonify({
+            "message": "Error interno del servidor al consultar la bitacora."
+        }), HTTPStatus.INTERNAL_SERVER_ERROR
+
+
+@audit_bp.route('/last-ips', methods=['GET'])
+def get_last_ips():
+    """
+    Ultima IP conocida de cada usuario, de la actividad mas reciente a la mas antigua, con
+    'Authorization: Bearer <AUDIT_TOKEN>'. Query params: 'page' (desde 1) y 'per_page'.
+    """
+    try:
+        _require_admin()
+
+        page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('per_page', current_app.config['AUDIT_PAGE_SIZE'], type=int)
+        if page < 1 or not (1 <= per_page <= current_app.config['AUDIT_MAX_PAGE_SIZE']):
+            raise GenericError(HTTPStatus.BAD_REQUEST, HTTPStatus.BAD_REQUEST.phrase, f"'page' debe ser >= 1 y 'per_page' estar entre 1 y {current_app.config['AUDIT_MAX_PAGE_SIZE']}.")
+
+        total, rows = audit_rollup.last_ips(per_page, (page - 1) * per_page)
+        body = {
+            "page": page,
+            "perPage": per_page,
+            "total": total,
+            "refreshedThrough": audit_rollup.refreshed_at().isoformat(),
+            "results": rows,
+        }
+        db.session.remove()
+        return jsonify(body), HTTPStatus.OK
+
+    except GenericError as e:
+        db.session.rollback()
+        return jsonify({"message": e.message}), e.status
+    except Exception as err:
+        db.session.rollback()
+        logger.exception("Error inesperado en get_last_ips")
+        return jsonify({
+            "message": "Error interno del servidor al consultar la bitacora."
+        }), HTTPStatus.INTERNAL_SERVER_ERROR
@@ -1,3 +1,4 @@
+import logging
 from datetime import timedelta
 from http import HTTPStatus
 
@@ -9,6 +10,7 @@ from marshmallow import ValidationError
 from app.errors.errors import GenericError
 from app.models import BitacoraUsers, Users
 from app.database import db
+from app.services.pubsub import pubsub
 # El esquema que me pasaste ahora está en este archivo
 from app.schemas.auth_schema_body import AuthLoginSchemaBody, AuthRegisterSchemaBody
 from app.schemas.schemas import UsuarioSchema
@@ -17,6 +19,7 @@ from app.utils.enums.enums import Sesion
 # Se inicializa una vez en tu archivo principal de la app
 bcrypt = Bcrypt()
 auth_bp = Blueprint('auth', __name__)
+logger = logging.getLogger(__name__)
 
 def obtener_ip():
     """Obtiene la dirección IP del cliente de forma segura."""
@@ -57,6 +60,11 @@ def register():
         db.session.add(bitacora_usuario)
         
         db.session.commit()
+        # Los resumenes de la bitacora (services/audit_rollup.py) se actualizan en segundo plano
+        pubsub.publish("bitacora.logged", {
+            "userId": str(nuevo_usuario.id),
+            "tipoAccion": bitacora_usuario.tipo_accion
+        })
         
         response = UsuarioSchema().dump(nuevo_usuario)
         return jsonify({"usuario": response}), HTTPStatus.CREATED
@@ -107,6 +115,10 @@ def login():
         )
         db.session.add(bitacora_usuario)
         db.session.commit()
+        pubsub.publish("bitacora.logged", {
+            "userId": str(usuario_db.id),
+            "tipoAccion": bitacora_usuario.tipo_accion
+        })
         
         return jsonify({
             "message": f"Bienvenido Usuario {usuario_db.username}",
@@ -145,7 +157,7 @@ def get_authenticated_user():
     except Exception as e:
         # Manejo de cualquier error inesperado de DB o serialización.
         db.session.rollback()
-        print(f"FATAL Error en /api/auth/me: {e}") 
+        logger.exception("Error en /api/auth/me")
         
         # Devolver un 500 limpio.
         return jsonify({
@@ -175,6 +187,10 @@ def logout():
         usuario.bitacora_entries.append(bitacora_usuario)
         db.session.add(bitacora_usuario)
         db.session.commit()
+        pubsub.publish("bitacora.logged", {
+            "userId": str(usuario.id),
+            "tipoAccion": bitacora_usuario.tipo_accion
+        })
         
         return jsonify({
             "message": "Sesión cerrada exitosamente."
@@ -1,13 +1,18 @@
-from flask import Blueprint, jsonify, request
+import logging
+from flask import Blueprint, current_app, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.database import db
-from app.models import Project, Class # Necesitamos Project para verificar la propiedad
-from app.schemas.project_schema import UMLClassSchema 
+from app.models import Project, Class, Relationship # Necesitamos Project para verificar la propiedad
+from app.schemas.project_schema import UMLClassSchema, UMLRelationshipSchema
 from app.errors.errors import GenericError
+from app.services.autosave import autosave_buffer
+from app.services.metrics import metrics
+from app.services.sync import load_columns, parse_fields, sync_page
 from http import HTTPStatus
 import uuid
 
 classes_bp = Blueprint('classes_bp', __name__)
+logger = logging.getLogger(__name__)
 
 @classes_bp.route('/', methods=['GET'])
 @jwt_required()
@@ -15,6 +20,14 @@ def get_classes_by_project():
     """
     Endpoint para obtener todas las clases de un proyecto específico.
     Requiere el query param 'projectId'. Verifica la propiedad del proyecto.
+
+    'fields=id,name,...' limita los campos devueltos. Con 'since' (cursor o fecha ISO) y/o 'limit'
+    la respuesta pasa a ser {items, deleted, cursor, hasMore}: las clases cambiadas despues del
+    cursor en orden de version, las ids borradas y el cursor para la siguiente peticion.
+
+    Con el query param 'bbox=minX,minY,maxX,maxY' devuelve solo las clases que tocan ese
+    rectangulo del lienzo, las relaciones que las involucran y la posicion de las clases
+    del otro extremo que quedan fuera (para poder dibujar la linea).
     """
     try:
         current_user_id = get_jwt_identity()
@@ -44,21 +57,86 @@ def get_classes_by_project():
                 HTTPStatus.FORBIDDEN.phrase,
                 "Acceso denegado. El proyecto no te pertenece."
             )
+
+        # Las ediciones pendientes del autosave se vuelcan antes de leer
+        autosave_buffer.flush(project_id)
             
-        # 2. Obtener todas las clases del proyecto
-        classes = Class.query.filter_by(project_id=project_id).all()
+        bbox_str = request.args.get('bbox')
+        if bbox_str:
+            return jsonify(_get_classes_in_bbox(project_id, bbox_str)), HTTPStatus.OK
+
+        # Sincronizacion incremental / paginacion por cursor
+        if 'since' in request.args or 'limit' in request.args:
+            return jsonify(sync_page('class', UMLClassSchema, project_id, request.args)), HTTPStatus.OK
+
+        # 2. Obtener todas las clases activas del proyecto (solo las columnas pedidas en 'fields')
+        fields = parse_fields(request.args.get('fields'), 'class')
+        query = Class.get_active().filter_by(project_id=project_id)
+        if fields:
+            query = query.options(load_columns('class', fields))
+        classes = query.all()
         
         # 3. Serializar y devolver
-        classes_data = UMLClassSchema(many=True).dump(classes)
+        with metrics.serialization_timer():
+            classes_data = UMLClassSchema(many=True, only=fields).dump(classes)
         
         return jsonify(classes_data), HTTPStatus.OK
 
     except GenericError as e:
         return jsonify({"message": e.message}), e.status
     except Exception as err:
-        print(f"Error en get_classes_by_project: {err}")
+        logger.exception("Error en get_classes_by_project")
         raise GenericError(
             HTTPStatus.INTERNAL_SERVER_ERROR,
             HTTPStatus.INTERNAL_SERVER_ERROR.phrase,
             f"Error inesperado al obtener clases: {str(err)}"
-        )
\ No newline at end of file
+        )
+
+
+def _get_classes_in_bbox(project_id, bbox_str):
+    try:
+        min_x, min_y, max_x, max_y = (float(value) for value in bbox_str.split(','))
+    except ValueError:
+        raise GenericError(HTTPStatus.BAD_REQUEST, HTTPStatus.BAD_REQUEST.phrase, "El parametro 'bbox' debe ser 'minX,minY,maxX,maxY'.")
+    if min_x > max_x or min_y > max_y:
+        raise GenericError(HTTPStatus.BAD_REQUEST, HTTPStatus.BAD_REQUEST.phrase, "El parametro 'bbox' tiene el minimo mayor que el maximo.")
+
+    # La posicion es la esquina superior izquierda: una clase que empieza un poco antes del
+    # rectangulo todavia puede verse, por eso el rango se amplia con el tamaño maximo de clase
+    margin_x = current_app.config['VIEWPORT_CLASS_WIDTH']
+    margin_y = current_app.config['VIEWPORT_CLASS_HEIGHT']
+    classes = Class.query.filter(
+        Class.project_id == project_id,
+        Class.is_deleted.is_(False),
+        Class.pos_x.between(min_x - margin_x, max_x),
+        Class.pos_y.between(min_y - margin_y, max_y)
+    ).all()
+
+    visible_ids = [item.id for item in classes]
+    relationships = []
+    external = []
+    if visible_ids:
+        relationships = Relationship.query.filter(
+            Relationship.project_id == project_id,
+            Relationship.is_deleted.is_(False),
+            db.or_(Relationship.source_class_id.in_(visible_ids), Relationship.target_class_id.in_(visible_ids))
+        ).all()
+        visible = set(visible_ids)
+        external_ids = {
+            class_id
+            for rel in relationships
+            for class_id in (rel.source_class_id, rel.target_class_id)
+            if class_id not in visible
+        }
+        if external_ids:
+            external = [
+                {"id": str(row.id), "name": row.name, "position": row.position}
+                for row in db.session.query(Class.id, Class.name, Class.position).filter(Class.project_id == project_id, Class.id.in_(external_ids))
+            ]
+
+    return {
+        "bbox": [min_x, min_y, max_x, max_y],
+        "classes": UMLClassSchema(many=True).dump(classes),
+        "relationships": UMLRelationshipSchema(many=True).dump(relationships),
+        "externalClasses": external
+    }
\ No newline at end of file
@@ -0,0 +1,182 @@
+import logging
+import os
+from flask import Blueprint, Response, jsonify, request, send_file
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from werkzeug.utils import secure_filename
+from app.database import db
+from app.models import Project, Class, Relationship
+from app.errors.errors import GenericError
+from app.services.autosave import autosave_buffer
+from app.services.codegen import TARGETS, DiagramModel, build_files, export_cache, iter_zip
+from app.services.jobs import job_accepted, job_runner
+from http import HTTPStatus
+
+exports_bp = Blueprint('exports_bp', __name__)
+logger = logging.getLogger(__name__)
+
+def _requested_targets():
+    targets = [target.strip() for target in request.args.get('targets', ','.join(TARGETS)).split(',') if target.strip()]
+    invalid = [target for target in targets if target not in TARGETS]
+    if not targets or invalid:
+        raise GenericError(
+            HTTPStatus.BAD_REQUEST,
+            HTTPStatus.BAD_REQUEST.phrase,
+            f"Objetivos no soportados: {', '.join(invalid) or 'ninguno'}. Usa: {', '.join(TARGETS)}."
+        )
+    return sorted(set(targets))
+
+
+def _diagram_model(project):
+    # Se copian los datos a estructuras simples: el generador corre despues de cerrar la sesion
+    classes = [
+        {
+            "id": item.id,
+            "name": item.name,
+            "stereotype": item.stereotype,
+            "attributes": item.attributes or [],
+            "methods": item.methods or [],
+        }
+        for item in Class.query.filter_by(project_id=project.id, is_deleted=False).all()
+    ]
+    relationships = [
+        {
+            "source_class_id": rel.source_class_id,
+            "target_class_id": rel.target_class_id,
+            "relationship_type": rel.relationship_type,
+            "source_multiplicity": rel.source_multiplicity,
+            "target_multiplicity": rel.target_multiplicity,
+            "label": rel.label,
+        }
+        for rel in Relationship.query.filter_by(project_id=project.id, is_deleted=False).all()
+    ]
+    return DiagramModel(project.name, classes, relationships)
+
+
+@exports_bp.route('/<uuid:project_id>/export', methods=['GET'])
+@jwt_required()
+def export_project_code(project_id):
+    """
+    Genera el codigo del diagrama (clases Java/Python y DDL SQL) y lo devuelve como zip.
+
+    Query param opcional 'targets' (por defecto 'java,python,sql'). El zip se entrega en
+    streaming y queda en cache por version del proyecto: si el proyecto no cambio, la
+    descarga siguiente se sirve desde disco (o con 304 si el cliente ya la tiene).
+    """
+    try:
+        current_user_id = get_jwt_identity()
+
+        targets = _requested_targets()
+
+        project = Project.get_active().filter_by(id=project_id).one_or_none()
+
+        if not project:
+            raise GenericError(HTTPStatus.NOT_FOUND, HTTPStatus.NOT_FOUND.phrase, "Proyecto no encontrado o eliminado.")
+
+        if str(project.user_id) != current_user_id:
+            raise GenericError(HTTPStatus.FORBIDDEN, HTTPStatus.FORBIDDEN.phrase, "Acceso denegado. El proyecto no te pertenece.")
+
+        # Las ediciones pendientes del autosave forman parte de la version a exportar
+        autosave_buffer.flush(project_id)
+        db.session.refresh(project)
+
+        version = project.version
+        etag = f"{project.id}-{version}-{'-'.join(targets)}"
+        filename = f"{secure_filename(project.name) or 'proyecto'}-codigo.zip"
+
+        if request.if_none_match.contains(etag):
+            return Response(status=HTTPStatus.NOT_MODIFIED, headers={"ETag": f'"{etag}"'})
+
+        cached_path = export_cache.lookup(project.id, version, targets)
+        if cached_path:
+            response = send_file(cached_path, mimetype='application/zip', as_attachment=True, download_name=filename, etag=etag)
+            response.headers['Cache-Control'] = 'private, max-age=0, must-revalidate'
+            return response
+
+        model = _diagram_model(project)
+        project_key = project.id
+        db.session.remove()
+
+        chunks = export_cache.stream_and_store(project_key, version, targets, iter_zip(build_files(model, targets)))
+        return Response(chunks, mimetype='application/zip', headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "ETag": f'"{etag}"',
+            "Cache-Control": "private, max-age=0, must-revalidate",
+        })
+
+    except GenericError as e:
+        return jsonify({"message": e.message}), e.status
+    except Exception as err:
+        db.session.rollback()
+        logger.exception("Error inesperado en export_project_code")
+        return jsonify({
+            "message": "Error interno del servidor al generar el codigo del proyecto."
+        }), HTTPStatus.INTERNAL_SERVER_ERROR
+
+
+@exports_bp.route('/<uuid:project_id>/export', methods=['POST'])
+@jwt_required()
+def schedule_project_export(project_id):
+    """
+    Genera el zip en segundo plano (202 con la URL del trabajo) para proyectos grandes: cuando
+    el trabajo termina, su resultado trae la URL de descarga, que ya se sirve desde la cache.
+    Acepta el mismo query param 'targets' que la descarga.
+    """
+    try:
+        current_user_id = get_jwt_identity()
+        targets = _requested_targets()
+
+        project = Project.get_active().filter_by(id=project_id).one_or_none()
+
+        if not project:
+            raise GenericError(HTTPStatus.NOT_FOUND, HTTPStatus.NOT_FOUND.phrase, "Proyecto no encontrado o eliminado.")
+
+        if str(project.user_id) != current_user_id:
+            raise GenericError(HTTPStatus.FORBIDDEN, HTTPStatus.FORBIDDEN.phrase, "Acceso denegado. El proyecto no te pertenece.")
+        db.session.remove()
+
+        job_id = job_runner.enqueue(
+            "export",
+            {"projectId": str(project_id), "userId": current_user_id, "targets": targets},
+            user_id=current_user_id, project_id=project_id,
+            dedupe_key=f"export:{project_id}:{'-'.join(targets)}"
+        )
+        return job_accepted(job_id)
+
+    except GenericError as e:
+        return jsonify({"message": e.message}), e.status
+    except Exception as err:
+        db.session.rollback()
+        logger.exception("Error inesperado en schedule_project_export")
+        return jsonify({
+            "message": "Error interno del servidor al encolar la exportacion."
+        }), HTTPStatus.INTERNAL_SERVER_ERROR
+
+
+@job_runner.task("export", concurrency=2, max_attempts=3)
+def run_export_job(payload):
+    """Deja en la cache el zip de la version actual del proyecto."""
+    project_id, targets = payload["projectId"], payload["targets"]
+
+    project = Project.get_active().filter_by(id=project_id).one_or_none()
+
+    if not project:
+        raise GenericError(HTTPStatus.NOT_FOUND, HTTPStatus.NOT_FOUND.phrase, "Proyecto no encontrado o eliminado.")
+
+    # La propiedad se comprobo al encolar; las ediciones pendientes forman parte de la version a exportar
+    autosave_buffer.flush(project_id)
+    db.session.refresh(project)
+
+    version = project.version
+    path = export_cache.lookup(project.id, version, targets)
+    if not path:
+        model = _diagram_model(project)
+        db.session.remove()
+        for _ in export_cache.stream_and_store(project_id, version, targets, iter_zip(build_files(model, targets))):
+            pass
+        path = export_cache.path(project_id, version, targets)
+
+    return {
+        "downloadUrl": f"/api/projects/{project_id}/export?targets={','.join(targets)}",
+        "version": version,
+        "bytes": os.path.getsize(path)
+    }
@@ -0,0 +1,124 @@
+import logging
+import os
+from datetime import datetime, timezone
+from flask import Blueprint, current_app, jsonify, request
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.database import db
+from app.models import Project, Class, Relationship
+from app.errors.errors import GenericError
+from app.services.autosave import autosave_buffer
+from app.services.diagram_import import IMPORT_FORMATS, import_diagram
+from app.services.jobs import job_accepted, job_runner
+from app.services.pubsub import pubsub
+from app.services.revisions import record_rows_revision
+from http import HTTPStatus
+
+imports_bp = Blueprint('imports_bp', __name__)
+logger = logging.getLogger(__name__)
+
+IMPORT_MODES = ("append", "replace")
+
+@imports_bp.route('/<uuid:project_id>/import', methods=['POST'])
+@jwt_required()
+def import_project_diagram(project_id):
+    """
+    Importa un diagrama de clases XMI o PlantUML enviado como cuerpo crudo de la solicitud.
+
+    Query params: 'format' (xmi | plantuml) y 'mode' (append por defecto, o replace para
+    sustituir el diagrama actual). El cuerpo se copia en streaming a disco y la importacion
+    corre como trabajo en segundo plano (202 con la URL del trabajo): las filas se insertan por
+    lotes en una sola transaccion, o entra el modelo completo o no entra nada.
+    """
+    try:
+        current_user_id = get_jwt_identity()
+
+        import_format = request.args.get('format', '').lower()
+        mode = request.args.get('mode', 'append').lower()
+        if import_format not in IMPORT_FORMATS:
+            raise GenericError(HTTPStatus.BAD_REQUEST, HTTPStatus.BAD_REQUEST.phrase, f"Formato no soportado. Usa: {', '.join(IMPORT_FORMATS)}.")
+        if mode not in IMPORT_MODES:
+            raise GenericError(HTTPStatus.BAD_REQUEST, HTTPStatus.BAD_REQUEST.phrase, f"Modo no soportado. Usa: {', '.join(IMPORT_MODES)}.")
+
+        max_bytes = current_app.config['IMPORT_MAX_BYTES']
+        if request.content_length is not None and request.content_length > max_bytes:
+            raise GenericError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, HTTPStatus.REQUEST_ENTITY_TOO_LARGE.phrase, f"El archivo supera el limite de {max_bytes} bytes.")
+
+        project = Project.get_active().filter_by(id=project_id).one_or_none()
+
+        if not project:
+            raise GenericError(HTTPStatus.NOT_FOUND, HTTPStatus.NOT_FOUND.phrase, "Proyecto no encontrado o eliminado.")
+
+        if str(project.user_id) != current_user_id:
+            raise GenericError(HTTPStatus.FORBIDDEN, HTTPStatus.FORBIDDEN.phrase, "Acceso denegado. No tienes permiso para editar este proyecto.")
+        db.session.remove()
+
+        path = job_runner.spool(request.stream, max_bytes)
+        try:
+            job_id = job_runner.enqueue("import", {
+                "projectId": str(project_id),
+                "userId": current_user_id,
+                "format": import_format,
+                "mode": mode,
+                "path": path
+            }, user_id=current_user_id, project_id=project_id)
+        except Exception:
+            _discard_upload({"path": path})
+            raise
+        return job_accepted(job_id)
+
+    except GenericError as e:
+        db.session.rollback()
+        db.session.remove()
+        return jsonify({"message": e.message}), e.status
+    except Exception as err:
+        db.session.rollback()
+        db.session.remove()
+        logger.exception("Error inesperado en import_project_diagram")
+        return jsonify({
+            "message": "Error interno del servidor al importar el diagrama."
+        }), HTTPStatus.INTERNAL_SERVER_ERROR
+
+
+def _discard_upload(payload):
+    try:
+        os.unlink(payload["path"])
+    except FileNotFoundError:
+        pass
+
+
+@job_runner.task("import", concurrency=2, max_attempts=3, on_failure=_discard_upload)
+def run_import_job(payload):
+    """Inserta el archivo guardado por import_project_diagram; un reintento parte de cero (todo o nada)."""
+    project = Project.get_active().filter_by(id=payload["projectId"]).one_or_none()
+
+    if not project:
+        raise GenericError(HTTPStatus.NOT_FOUND, HTTPStatus.NOT_FOUND.phrase, "Proyecto no encontrado o eliminado.")
+
+    if payload["mode"] == 'replace':
+        autosave_buffer.discard(project.id)
+        Relationship.query.filter_by(project_id=project.id).delete()
+        Class.query.filter_by(project_id=project.id).delete()
+    else:
+        # Las ediciones pendientes se escriben antes para no mezclarse con la importacion
+        autosave_buffer.flush(project.id)
+
+    with open(payload["path"], "rb") as stream:
+        stats = import_diagram(project, stream, payload["format"], current_app.config['IMPORT_BATCH_SIZE'])
+
+    project.updated_at = datetime.now(timezone.utc)
+    record_rows_revision(project, payload["userId"])
+    db.session.commit()
+    updated_at_str = project.updated_at.isoformat()
+    _discard_upload(payload)
+
+    pubsub.publish("project.saved", {
+        "projectId": payload["projectId"],
+        "userId": payload["userId"],
+        "updatedAt": updated_at_str
+    })
+
+    return {
+        "message": "Diagrama importado exitosamente.",
+        "updatedAt": updated_at_str,
+        **stats
+    }
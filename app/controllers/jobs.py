@@ -0,0 +1,44 @@
+import logging
+from flask import Blueprint, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.database import db
+from app.models import Job
+from app.errors.errors import GenericError
+from app.services.jobs import QUEUED, RUNNING, serialize_job
+from http import HTTPStatus
+
+jobs_bp = Blueprint('jobs_bp', __name__)
+logger = logging.getLogger(__name__)
+
+@jobs_bp.route('/<uuid:job_id>', methods=['GET'])
+@jwt_required()
+def get_job_status(job_id):
+    """
+    Estado de un trabajo en segundo plano (layout, importacion, exportacion...). Mientras esta
+    'queued' o 'running' la respuesta lleva Retry-After; al terminar, 'result' tiene lo que
+    antes devolvia el endpoint sincrono, o 'error' si fallo.
+    """
+    try:
+        current_user_id = get_jwt_identity()
+
+        job = Job.query.filter_by(id=job_id).one_or_none()
+
+        # Un trabajo ajeno se responde igual que uno inexistente
+        if not job or str(job.user_id) != current_user_id:
+            raise GenericError(HTTPStatus.NOT_FOUND, HTTPStatus.NOT_FOUND.phrase, "Trabajo no encontrado.")
+
+        response = jsonify(serialize_job(job))
+        if job.status in (QUEUED, RUNNING):
+            response.headers['Retry-After'] = '1'
+            response.headers['Cache-Control'] = 'no-store'
+        db.session.remove()
+        return response, HTTPStatus.OK
+
+    except GenericError as e:
+        return jsonify({"message": e.message}), e.status
+    except Exception as err:
+        db.session.rollback()
+        logger.exception("Error inesperado en get_job_status")
+        return jsonify({
+            "message": "Error interno del servidor al consultar el trabajo."
+        }), HTTPStatus.INTERNAL_SERVER_ERROR
@@ -0,0 +1,132 @@
+import logging
+import time
+from datetime import datetime, timezone
+from flask import Blueprint, current_app, jsonify, request
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import update
+from app.database import db
+from app.models import Project, Class, Relationship
+from app.errors.errors import GenericError
+from app.services.autosave import autosave_buffer
+from app.services.jobs import job_accepted, job_runner
+from app.services.layout import DEFAULT_ITERATIONS, DEFAULT_SPACING, force_directed_layout
+from app.services.pubsub import pubsub
+from app.services.revisions import record_rows_revision
+from http import HTTPStatus
+
+layout_bp = Blueprint('layout_bp', __name__)
+logger = logging.getLogger(__name__)
+
+@layout_bp.route('/<uuid:project_id>/layout', methods=['POST'])
+@jwt_required()
+def layout_project(project_id):
+    """
+    Encola el recalculo de la posicion de todas las clases del proyecto con un layout de fuerzas
+    (Fruchterman-Reingold vectorizado con NumPy) y responde 202 con la URL del trabajo; su
+    resultado trae las posiciones nuevas, ya guardadas en una sola actualizacion masiva.
+
+    Cuerpo JSON opcional: {"iterations": int, "seed": int, "spacing": numero en pixeles}.
+    """
+    try:
+        current_user_id = get_jwt_identity()
+        data = request.get_json(silent=True) or {}
+
+        try:
+            iterations = int(data.get('iterations', DEFAULT_ITERATIONS))
+            seed = int(data.get('seed', 0))
+            spacing = float(data.get('spacing', DEFAULT_SPACING))
+        except (TypeError, ValueError):
+            raise GenericError(HTTPStatus.BAD_REQUEST, HTTPStatus.BAD_REQUEST.phrase, "'iterations', 'seed' y 'spacing' deben ser numericos.")
+
+        max_iterations = current_app.config['LAYOUT_MAX_ITERATIONS']
+        if not (1 <= iterations <= max_iterations) or spacing <= 0:
+            raise GenericError(HTTPStatus.BAD_REQUEST, HTTPStatus.BAD_REQUEST.phrase, f"'iterations' debe estar entre 1 y {max_iterations} y 'spacing' ser positivo.")
+
+        project = Project.get_active().filter_by(id=project_id).one_or_none()
+
+        if not project:
+            raise GenericError(HTTPStatus.NOT_FOUND, HTTPStatus.NOT_FOUND.phrase, "Proyecto no encontrado o eliminado.")
+
+        if str(project.user_id) != current_user_id:
+            raise GenericError(HTTPStatus.FORBIDDEN, HTTPStatus.FORBIDDEN.phrase, "Acceso denegado. No tienes permiso para editar este proyecto.")
+        db.session.remove()
+
+        job_id = job_runner.enqueue("layout", {
+            "projectId": str(project_id),
+            "userId": current_user_id,
+            "iterations": iterations,
+            "seed": seed,
+            "spacing": spacing
+        }, user_id=current_user_id, project_id=project_id)
+        return job_accepted(job_id)
+
+    except GenericError as e:
+        db.session.rollback()
+        db.session.remove()
+        return jsonify({"message": e.message}), e.status
+    except Exception as err:
+        db.session.rollback()
+        db.session.remove()
+        logger.exception("Error inesperado en layout_project")
+        return jsonify({
+            "message": "Error interno del servidor al encolar el layout."
+        }), HTTPStatus.INTERNAL_SERVER_ERROR
+
+
+@job_runner.task("layout", concurrency=2, max_attempts=3)
+def run_layout_job(payload):
+    """Calcula y guarda el layout; el diccionario devuelto es el resultado del trabajo."""
+    project_id = payload["projectId"]
+
+    project = Project.get_active().filter_by(id=project_id).one_or_none()
+
+    if not project:
+        raise GenericError(HTTPStatus.NOT_FOUND, HTTPStatus.NOT_FOUND.phrase, "Proyecto no encontrado o eliminado.")
+
+    # La propiedad se comprobo al encolar; las ediciones pendientes se aplican antes para no
+    # pisar posiciones con datos viejos
+    autosave_buffer.flush(project_id)
+    db.session.refresh(project)
+
+    class_ids = [row.id for row in db.session.query(Class.id).filter_by(project_id=project.id, is_deleted=False).order_by(Class.created_at, Class.id)]
+    index = {class_id: position for position, class_id in enumerate(class_ids)}
+    edges = [
+        (index[source], index[target])
+        for source, target in db.session.query(Relationship.source_class_id, Relationship.target_class_id)
+            .filter_by(project_id=project.id, is_deleted=False)
+        if source in index and target in index
+    ]
+
+    started = time.perf_counter()
+    positions = force_directed_layout(
+        len(class_ids), edges, iterations=payload["iterations"], seed=payload["seed"],
+        chunk_size=current_app.config['LAYOUT_CHUNK_SIZE'], spacing=payload["spacing"]
+    ).round().astype(int).tolist()
+    layout_seconds = time.perf_counter() - started
+
+    # Actualizacion masiva por clave primaria (project_id, id): un UPDATE ejecutado en lote, sin cargar objetos
+    if class_ids:
+        db.session.execute(update(Class), [
+            {"project_id": project.id, "id": class_id, "position": {"x": x, "y": y}}
+            for class_id, (x, y) in zip(class_ids, positions)
+        ])
+    project.updated_at = datetime.now(timezone.utc)
+    record_rows_revision(project, payload["userId"])
+    db.session.commit()
+    updated_at_str = project.updated_at.isoformat()
+
+    pubsub.publish("project.saved", {
+        "projectId": project_id,
+        "userId": payload["userId"],
+        "updatedAt": updated_at_str
+    })
+
+    return {
+        "message": "Layout aplicado exitosamente.",
+        "updatedAt": updated_at_str,
+        "classes": len(class_ids),
+        "relationships": len(edges),
+        "iterations": payload["iterations"],
+        "layoutSeconds": round(layout_seconds, 4),
+        "positions": {str(class_id): {"x": x, "y": y} for class_id, (x, y) in zip(class_ids, positions)}
+    }
@@ -1,15 +1,28 @@
-from flask import Blueprint, jsonify, request
+import logging
+from flask import Blueprint, current_app, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.database import db
-from app.models import Project, Users, Relationship, Class # Asegúrate de que tu modelo se llame 'Projects'
+from app.models import Project, Users # Asegúrate de que tu modelo se llame 'Projects'
 from app.errors.errors import GenericError
 from app.schemas.project_schema_body import ProjectCreateSchemaBody
 from app.schemas.project_schema import ProjectSchema 
-from sqlalchemy.orm import joinedload
+from app.services.autosave import autosave_buffer
+from app.services.cloning import clone_project
+from app.services.diagram_analysis import SEVERITY_INFO, VALIDATION_MODES, analyze
+from app.services.diagram_ingest import PayloadError, parse_save_payload, read_body
+from app.services.listing_cache import listing_cache
+from app.services.diagram_operations import normalize_operation, replace_diagram
+from app.services.metrics import metrics
+from app.services.pubsub import pubsub
+from app.services.revisions import record_rows_revision
+from app.services.sync import prune_tombstones
+from app.services.thumbnails import thumbnail_service
+from sqlalchemy.orm import joinedload, load_only
 from marshmallow import ValidationError
 from http import HTTPStatus
 
 projects_bp = Blueprint('projects_bp', __name__)
+logger = logging.getLogger(__name__)
 
 # Esquema para validación de entrada
 project_create_schema = ProjectCreateSchemaBody()
@@ -19,36 +32,61 @@ project_schema = ProjectSchema()
 @projects_bp.route('/list', methods=['GET'])
 @jwt_required()
 def get_user_projects():
-    """Endpoint para obtener los proyectos del usuario autenticado."""
+    """
+    Endpoint para obtener los proyectos del usuario autenticado.
+    La respuesta se guarda por usuario (listing_cache) y lleva ETag/Last-Modified: si el cliente
+    ya tiene la version actual recibe 304 sin cuerpo.
+    """
     try:
         # Obtener la identidad del token (en este caso, el user_id)
         current_user_id = get_jwt_identity()
 
-        # Usar el user_id para buscar al usuario y sus proyectos
-        user = Users.query.filter_by(id=current_user_id).first()
+        entry = listing_cache.get(current_user_id) if listing_cache.enabled else None
+        if entry is None:
+            token = listing_cache.begin(current_user_id)
+
+            # Usar el user_id para buscar al usuario y sus proyectos
+            user = Users.query.filter_by(id=current_user_id).first()
+
+            if not user:
+                return jsonify({"message": "Usuario no encontrado"}), 404
 
-        if not user:
-            return jsonify({"message": "Usuario no encontrado"}), 404
+            # Proyectos del usuario por la relacion del modelo, sin cargar diagram_data
+            projects = Project.query.with_parent(user).options(
+                load_only(Project.id, Project.name, Project.created_at, Project.updated_at)
+            ).all()
 
-        # Obtener los proyectos del usuario usando la relación del modelo
-        # Esto filtra automáticamente los proyectos por el user_id
-        projects = user.projects
+            # Serializar los proyectos a un formato JSON
+            projects_list = [
+                {
+                    "id": str(project.id),
+                    "name": project.name,
+                    "created_at": project.created_at.isoformat(),
+                    "updated_at": project.updated_at.isoformat(),
+                    "thumbnailUrl": thumbnail_service.url(project.id, project.version)
+                }
+                for project in projects
+            ]
 
-        # Serializar los proyectos a un formato JSON
-        projects_list = [
-            {
-                "id": str(project.id),
-                "name": project.name,
-                "created_at": project.created_at.isoformat(),
-                "updated_at": project.updated_at.isoformat()
-            }
-            for project in projects
-        ]
+            body = current_app.json.dumps(projects_list).encode("utf-8")
+            last_modified = max((project.updated_at for project in projects), default=None)
+            entry = listing_cache.put(current_user_id, token, body, last_modified)
 
-        return jsonify(projects_list), 200
+        response = current_app.response_class(entry.body, status=HTTPStatus.OK, mimetype="application/json")
+        response.set_etag(entry.etag)
+        if entry.last_modified is not None:
+            response.last_modified = entry.last_modified
+        # El navegador puede guardarla pero debe revalidar siempre: el listado cambia con cada guardado
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
 
     except Exception as err:
-        raise GenericError(f"Error inesperado al obtener proyectos: {str(err)}")
+        raise GenericError(
+            HTTPStatus.INTERNAL_SERVER_ERROR,
+            HTTPStatus.INTERNAL_SERVER_ERROR.phrase,
+            f"Error inesperado al obtener proyectos: {str(err)}"
+        )
 
 @projects_bp.route('', methods=['POST'])
 @jwt_required()
@@ -71,6 +109,12 @@ def create_project():
         # 3. Guardar en la base de datos
         db.session.add(new_project)
         db.session.commit()
+
+        # El listado del usuario (en todos los workers) ya no es valido
+        pubsub.publish("project.created", {
+            "projectId": str(new_project.id),
+            "userId": current_user_id
+        })
         
         # 4. Devolver la información del proyecto creado
         return jsonify({
@@ -98,32 +142,45 @@ def get_project_data(project_id):
     """
     try:
         current_user_id = get_jwt_identity()
-        
-        # 1. Buscar el proyecto activo por ID con CARGA ANSIOSA (EAGER LOADING)
-        # Esto asegura que project.classes y project.relationships estén llenos.
-        project = Project.get_active().options(
-            joinedload(Project.classes),
-            joinedload(Project.relationships)
-        ).filter_by(id=project_id).one_or_none()
-        
-        if not project:
+
+        # 1. Verificar que el proyecto existe y la propiedad (solo la columna del dueño)
+        owner_id = Project.get_active().filter_by(id=project_id).with_entities(Project.user_id).scalar()
+
+        if owner_id is None:
             raise GenericError(
                 HTTPStatus.NOT_FOUND,
                 HTTPStatus.NOT_FOUND.phrase,
                 "Proyecto no encontrado o eliminado."
             )
 
-        # 2. Verificar la propiedad
-        if str(project.user_id) != current_user_id:
+        if str(owner_id) != current_user_id:
             raise GenericError(
                 HTTPStatus.FORBIDDEN,
                 HTTPStatus.FORBIDDEN.phrase,
                 "Acceso denegado. El proyecto no te pertenece."
             )
+
+        # 2. Volcar las ediciones pendientes del autosave para leer el estado mas reciente
+        autosave_buffer.flush(project_id)
+
+        # Buscar el proyecto activo por ID con CARGA ANSIOSA (EAGER LOADING)
+        # Esto asegura que project.classes y project.relationships estén llenos.
+        project = Project.get_active().options(
+            joinedload(Project.classes),
+            joinedload(Project.relationships)
+        ).filter_by(id=project_id).one_or_none()
+
+        if not project:
+            raise GenericError(
+                HTTPStatus.NOT_FOUND,
+                HTTPStatus.NOT_FOUND.phrase,
+                "Proyecto no encontrado o eliminado."
+            )
             
         # 3. Serializar y devolver
         # ProjectSchema ahora serializará las relaciones que están cargadas en 'project'
-        project_data = ProjectSchema().dump(project)
+        with metrics.serialization_timer():
+            project_data = ProjectSchema().dump(project)
         
         # Limpiar la sesión después de usarla
         db.session.remove() 
@@ -137,7 +194,7 @@ def get_project_data(project_id):
     except Exception as err:
         db.session.rollback()
         db.session.remove() 
-        print(f"Error inesperado en get_project_data: {err}")
+        logger.exception("Error inesperado en get_project_data")
         return jsonify({
             "message": "Error interno del servidor al cargar el proyecto."
         }), HTTPStatus.INTERNAL_SERVER_ERROR
@@ -148,15 +205,23 @@ def save_project_data(project_id):
     """
     Guarda los datos del diagrama (classes y relationships) en las tablas relacionales.
     
-    Esta función implementa la lógica de 'upsert' mediante un borrado y reinserción
-    completa para simplificar la sincronización del diagrama (una estrategia común para 
-    datos que se gestionan de forma monolítica en el frontend, como un diagrama).
+    El frontend envía el diagrama completo, pero se sincroniza mediante un 'upsert' por id:
+    las clases y relaciones que siguen se actualizan en su lugar (solo si cambiaron), las
+    nuevas se insertan y las que ya no están se borran (ver replace_diagram).
     """
     updated_at_str = None
     
     try:
         current_user_id = get_jwt_identity()
-        data = request.json
+
+        # 0. Ingesta acotada: tamaño, numero de elementos, parseo y tipos, antes de tocar la BD
+        config = current_app.config
+        data = parse_save_payload(
+            read_body(request, config['SAVE_MAX_BYTES']),
+            config['SAVE_MAX_CLASSES'],
+            config['SAVE_MAX_RELATIONSHIPS'],
+            config['SAVE_MAX_OBJECTS']
+        )
         
         # 1. Buscar el proyecto y verificar la propiedad
         project = Project.get_active().filter_by(id=project_id).one_or_none()
@@ -167,71 +232,44 @@ def save_project_data(project_id):
         if str(project.user_id) != current_user_id:
             raise GenericError(HTTPStatus.FORBIDDEN, HTTPStatus.FORBIDDEN.phrase, "Acceso denegado. No tienes permiso para editar este proyecto.")
 
-        # 2. Validación de datos de entrada
-        if not (data and 'classes' in data and 'relationships' in data):
-             raise GenericError(HTTPStatus.BAD_REQUEST, HTTPStatus.BAD_REQUEST.phrase, "El cuerpo de la solicitud debe contener las listas 'classes' y 'relationships'.")
+        # 2. Analisis estructural del diagrama recibido (modo por config o por query param 'validation')
+        validation = request.args.get('validation', current_app.config['DIAGRAM_VALIDATION']).lower()
+        if validation not in VALIDATION_MODES:
+            raise GenericError(HTTPStatus.BAD_REQUEST, HTTPStatus.BAD_REQUEST.phrase, f"Modo de validacion no soportado. Usa: {', '.join(VALIDATION_MODES)}.")
+
+        issues = []
+        if validation != 'off':
+            analysis = analyze(
+                ((class_data.get('id'), class_data.get('name')) for class_data in data['classes']),
+                (
+                    (rel_data.get('id'), rel_data.get('sourceClassId'), rel_data.get('targetClassId'), rel_data.get('relationshipType'))
+                    for rel_data in data['relationships']
+                )
+            )
+            issues = [issue for issue in analysis['issues'] if issue['severity'] != SEVERITY_INFO]
+            if validation == 'strict' and not analysis['valid']:
+                return jsonify({
+                    "message": "El diagrama tiene errores estructurales y no se guardo.",
+                    "issues": issues
+                }), HTTPStatus.UNPROCESSABLE_ENTITY
 
         # --- LÓGICA DE SINCRONIZACIÓN RELACIONAL ---
 
-        # 2a. Actualizar el campo JSON (opcional, pero buena práctica si se usa como caché/backup)
-        project.diagram_data = data 
-        db.session.add(project)
-        
-        # 2b. Eliminación de datos antiguos (Las relaciones se borran en cascada con las clases si se usa ORM)
-        # SQLAlchemy gestionará los borrados en cascada definidos en el modelo (cascade="all, delete-orphan").
-        # Borrando las colecciones de Python asociadas al objeto, SQLAlchemy sabe que debe eliminarlas de la DB.
-
-        # Borrar relaciones existentes (ya que dependen de las clases)
-        Relationship.query.filter_by(project_id=project.id).delete()
-        # Borrar clases existentes
-        Class.query.filter_by(project_id=project.id).delete()
-        
-        # 2c. Reinserción de las nuevas clases
-        class_id_map = {} # Mapeo para manejar IDs temporales del frontend
-        
-        for class_data in data['classes']:
-            # El ID del frontend se usará temporalmente como clave para mapear las relaciones
-            temp_id = class_data.get('id')
-            
-            # Creamos un nuevo objeto Class (SQLAlchemy generará un nuevo ID UUID)
-            new_class = Class(
-                project_id=project.id,
-                name=class_data.get('name', 'ClaseSinNombre'),
-                stereotype=class_data.get('stereotype'),
-                attributes=class_data.get('attributes', []),
-                methods=class_data.get('methods', []),
-                # Aseguramos que position es un dict, aunque JSON lo mapee por defecto
-                position=class_data.get('position', {"x": 0, "y": 0}) 
-            )
-            db.session.add(new_class)
-            # Guardamos el mapeo: ID Temporal del Frontend -> Objeto ORM (el ID de la DB se generará en el commit)
-            class_id_map[str(temp_id)] = new_class
+        # El guardado completo reemplaza el diagrama: las ediciones granulares pendientes ya no aplican
+        autosave_buffer.discard(project.id)
 
-        # 2d. Reinserción de las nuevas relaciones
-        
-        # Es necesario forzar el flush para que los nuevos objetos Class tengan sus IDs de BD generados
-        # antes de intentar usarlos para las claves foráneas de las relaciones.
-        db.session.flush() 
-
-        for rel_data in data['relationships']:
-            # Usamos el mapeo para encontrar el objeto Class real (con su ID de BD)
-            source_class_orm = class_id_map.get(str(rel_data.get('sourceClassId')))
-            target_class_orm = class_id_map.get(str(rel_data.get('targetClassId')))
-
-            if source_class_orm and target_class_orm:
-                new_relationship = Relationship(
-                    project_id=project.id,
-                    source_class_id=source_class_orm.id, # Usamos el ID generado por la BD
-                    target_class_id=target_class_orm.id, # Usamos el ID generado por la BD
-                    relationship_type=rel_data.get('relationshipType'),
-                    source_multiplicity=rel_data.get('sourceMultiplicity'),
-                    target_multiplicity=rel_data.get('targetMultiplicity'),
-                    label=rel_data.get('label')
-                )
-                db.session.add(new_relationship)
-            else:
-                 print(f"Advertencia: Relación ignorada debido a IDs de clase no encontrados: {rel_data}")
+        # 2a. Clases y relaciones emparejadas por id: se actualiza solo lo que cambio, se inserta lo
+        # nuevo y se borra lo que ya no esta (sin reescribir ni dejar lapidas del diagrama entero)
+        persisted, skipped = replace_diagram(project, data['classes'], data['relationships'])
+        for rel_data in skipped:
+            logger.warning("Relación ignorada debido a IDs de clase no encontrados: %s -> %s (%s)", rel_data.get('sourceClassId'), rel_data.get('targetClassId'), rel_data.get('id'))
 
+        # 2b. Historial y diagram_data a partir de lo que quedo en las filas (ids de fila, sin las
+        # relaciones ignoradas); el cuerpo recibido solo aporta el orden y las claves extra
+        revision = record_rows_revision(project, current_user_id, base=dict(data, **persisted))
+
+        # 2c. Los borrados dejan lapidas: se purgan las que ya caducaron
+        prune_tombstones(project.id)
 
         # 3. Hacer COMMIT explícito de toda la transacción
         db.session.commit()
@@ -241,12 +279,27 @@ def save_project_data(project_id):
         updated_at_str = project.updated_at.isoformat()
         db.session.remove()
 
+        # Aviso a todos los workers (sockets, caches) de que el proyecto cambio
+        pubsub.publish("project.saved", {
+            "projectId": str(project_id),
+            "userId": current_user_id,
+            "updatedAt": updated_at_str
+        })
+
         # 5. Respuesta exitosa
-        return jsonify({
+        response = {
             "message": "Proyecto guardado y sincronizado exitosamente.", 
-            "updatedAt": updated_at_str
-        }), HTTPStatus.OK
+            "updatedAt": updated_at_str,
+            "revision": revision
+        }
+        if issues:
+            response["issues"] = issues
+        return jsonify(response), HTTPStatus.OK
 
+    except PayloadError as e:
+        db.session.rollback()
+        db.session.remove()
+        return jsonify({"message": e.message, "errors": e.errors}), e.status
     except GenericError as e:
         db.session.rollback()
         db.session.remove() 
@@ -254,11 +307,112 @@ def save_project_data(project_id):
     except Exception as err:
         db.session.rollback()
         db.session.remove() 
-        print(f"Error inesperado en save_project_data: {err}")
+        logger.exception("Error inesperado en save_project_data")
         return jsonify({
             "message": "Error interno del servidor al intentar guardar el proyecto."
         }), HTTPStatus.INTERNAL_SERVER_ERROR
     
+@projects_bp.route('/<uuid:project_id>/edits', methods=['POST'])
+@jwt_required()
+def submit_project_edits(project_id):
+    """
+    Acepta ediciones granulares del diagrama sin reescribir el proyecto completo.
+
+    Las operaciones se anotan en el diario del autosave y se responden con 202 de inmediato;
+    las actualizaciones repetidas de una misma clase se coalescen y se vuelcan a la BD tras
+    el intervalo de debounce o al alcanzar el limite del buffer.
+    """
+    try:
+        current_user_id = get_jwt_identity()
+        data = request.json
+
+        project = Project.get_active().filter_by(id=project_id).one_or_none()
+
+        if not project:
+            raise GenericError(HTTPStatus.NOT_FOUND, HTTPStatus.NOT_FOUND.phrase, "Proyecto no encontrado o eliminado.")
+
+        if str(project.user_id) != current_user_id:
+            raise GenericError(HTTPStatus.FORBIDDEN, HTTPStatus.FORBIDDEN.phrase, "Acceso denegado. No tienes permiso para editar este proyecto.")
+
+        if not (data and isinstance(data.get('operations'), list)):
+            raise GenericError(HTTPStatus.BAD_REQUEST, HTTPStatus.BAD_REQUEST.phrase, "El cuerpo de la solicitud debe contener la lista 'operations'.")
+
+        # Se validan todas antes de aceptar ninguna: el lote entra completo o no entra
+        operations = [normalize_operation(operation) for operation in data['operations']]
+        pending = autosave_buffer.submit(project.id, operations)
+
+        return jsonify({
+            "message": "Ediciones aceptadas.",
+            "accepted": len(operations),
+            "pending": pending
+        }), HTTPStatus.ACCEPTED
+
+    except GenericError as e:
+        return jsonify({"message": e.message}), e.status
+    except Exception as err:
+        logger.exception("Error inesperado en submit_project_edits")
+        return jsonify({
+            "message": "Error interno del servidor al aceptar las ediciones."
+        }), HTTPStatus.INTERNAL_SERVER_ERROR
+    
+@projects_bp.route('/<uuid:project_id>/clone', methods=['POST'])
+@jwt_required()
+def clone_user_project(project_id):
+    """
+    Duplica un proyecto con todas sus clases y relaciones sin que el diagrama pase por el cliente.
+    Cuerpo JSON opcional: {"name": "..."}; por defecto se usa el nombre original con "(copia)".
+    """
+    try:
+        current_user_id = get_jwt_identity()
+        data = request.get_json(silent=True) or {}
+
+        name = data.get('name')
+        if name is not None and (not isinstance(name, str) or not name.strip()):
+            raise GenericError(HTTPStatus.BAD_REQUEST, HTTPStatus.BAD_REQUEST.phrase, "El campo 'name' debe ser un texto no vacio.")
+
+        project = Project.get_active().filter_by(id=project_id).one_or_none()
+
+        if not project:
+            raise GenericError(HTTPStatus.NOT_FOUND, HTTPStatus.NOT_FOUND.phrase, "Proyecto no encontrado o eliminado.")
+
+        if str(project.user_id) != current_user_id:
+            raise GenericError(HTTPStatus.FORBIDDEN, HTTPStatus.FORBIDDEN.phrase, "Acceso denegado. El proyecto no te pertenece.")
+
+        # La copia debe incluir las ediciones granulares aun no escritas
+        autosave_buffer.flush(project_id)
+
+        name = name.strip() if name else f"{project.name} (copia)"
+        new_project_id, classes_count, relationships_count = clone_project(project.id, current_user_id, name)
+        # La copia empieza su historial con las filas copiadas (sus ids ya no son los del original)
+        record_rows_revision(db.session.get(Project, new_project_id), current_user_id)
+        db.session.commit()
+        db.session.remove()
+
+        pubsub.publish("project.created", {
+            "projectId": str(new_project_id),
+            "userId": current_user_id
+        })
+
+        return jsonify({
+            "id": str(new_project_id),
+            "name": name,
+            "sourceProjectId": str(project_id),
+            "classes": classes_count,
+            "relationships": relationships_count
+        }), HTTPStatus.CREATED
+
+    except GenericError as e:
+        db.session.rollback()
+        db.session.remove()
+        return jsonify({"message": e.message}), e.status
+    except Exception as err:
+        db.session.rollback()
+        db.session.remove()
+        logger.exception("Error inesperado en clone_user_project")
+        return jsonify({
+            "message": "Error interno del servidor al clonar el proyecto."
+        }), HTTPStatus.INTERNAL_SERVER_ERROR
+
 # --- RUTA 5: ELIMINAR PROYECTO (DELETE /api/projects/{projectId}) ---
 @projects_bp.route('/projects/<uuid:project_id>', methods=['DELETE'])
 @jwt_required()
@@ -279,15 +433,24 @@ def delete_project(project_id):
         if str(project.user_id) != current_user_id:
             return jsonify({"message": "Acceso denegado."}), HTTPStatus.FORBIDDEN
             
-        # 3. Eliminar lógicamente
+        # 3. Eliminar lógicamente (y descartar sus ediciones pendientes del autosave)
+        autosave_buffer.discard(project.id)
         project.soft_delete()
         db.session.commit()
+
+        pubsub.publish("project.deleted", {
+            "projectId": str(project_id),
+            "userId": current_user_id
+        })
         
         return jsonify({"message": f"Proyecto '{project.name}' eliminado lógicamente."}), HTTPStatus.NO_CONTENT
 
+    except GenericError as e:
+        db.session.rollback()
+        return jsonify({"message": e.message}), e.status
     except Exception as err:
         db.session.rollback()
-        print(f"Error inesperado al eliminar proyecto: {err}")
+        logger.exception("Error inesperado al eliminar proyecto")
         return jsonify({
             "message": "Error interno del servidor al intentar eliminar el proyecto."
         }), HTTPStatus.INTERNAL_SERVER_ERROR
\ No newline at end of file
@@ -1,13 +1,18 @@
+import logging
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.database import db
 from app.models import Project, Relationship # Necesitamos Project para verificar la propiedad
 from app.schemas.project_schema import UMLRelationshipSchema 
 from app.errors.errors import GenericError
+from app.services.autosave import autosave_buffer
+from app.services.metrics import metrics
+from app.services.sync import load_columns, parse_fields, sync_page
 from http import HTTPStatus
 import uuid
 
 relationships_bp = Blueprint('relationships_bp', __name__)
+logger = logging.getLogger(__name__)
 
 @relationships_bp.route('/', methods=['GET'])
 @jwt_required()
@@ -15,6 +20,10 @@ def get_relationships_by_project():
     """
     Endpoint para obtener todas las relaciones de un proyecto específico.
     Requiere el query param 'projectId'. Verifica la propiedad del proyecto.
+
+    'fields=id,name,...' limita los campos devueltos. Con 'since' (cursor o fecha ISO) y/o 'limit'
+    la respuesta pasa a ser {items, deleted, cursor, hasMore}: las relaciones cambiadas despues del
+    cursor en orden de version, las ids borradas y el cursor para la siguiente peticion.
     """
     try:
         current_user_id = get_jwt_identity()
@@ -44,19 +53,31 @@ def get_relationships_by_project():
                 HTTPStatus.FORBIDDEN.phrase,
                 "Acceso denegado. El proyecto no te pertenece."
             )
+
+        # Las ediciones pendientes del autosave se vuelcan antes de leer
+        autosave_buffer.flush(project_id)
             
-        # 2. Obtener todas las relaciones del proyecto
-        relationships = Relationship.query.filter_by(project_id=project_id).all()
+        # Sincronizacion incremental / paginacion por cursor
+        if 'since' in request.args or 'limit' in request.args:
+            return jsonify(sync_page('relationship', UMLRelationshipSchema, project_id, request.args)), HTTPStatus.OK
+
+        # 2. Obtener todas las relaciones activas del proyecto (solo las columnas pedidas en 'fields')
+        fields = parse_fields(request.args.get('fields'), 'relationship')
+        query = Relationship.get_active().filter_by(project_id=project_id)
+        if fields:
+            query = query.options(load_columns('relationship', fields))
+        relationships = query.all()
         
         # 3. Serializar y devolver
-        relationships_data = UMLRelationshipSchema(many=True).dump(relationships)
+        with metrics.serialization_timer():
+            relationships_data = UMLRelationshipSchema(many=True, only=fields).dump(relationships)
         
         return jsonify(relationships_data), HTTPStatus.OK
 
     except GenericError as e:
         return jsonify({"message": e.message}), e.status
     except Exception as err:
-        print(f"Error en get_relationships_by_project: {err}")
+        logger.exception("Error en get_relationships_by_project")
         raise GenericError(
             HTTPStatus.INTERNAL_SERVER_ERROR,
             HTTPStatus.INTERNAL_SERVER_ERROR.phrase,
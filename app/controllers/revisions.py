@@ -0,0 +1,110 @@
+import logging
+from flask import Blueprint, current_app, jsonify, request
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.database import db
+from app.models import Project, ProjectRevision
+from app.errors.errors import GenericError
+from app.services.revisions import checkout_revision
+from http import HTTPStatus
+
+revisions_bp = Blueprint('revisions_bp', __name__)
+logger = logging.getLogger(__name__)
+
+
+def _get_owned_project(project_id, current_user_id):
+    project = Project.get_active().filter_by(id=project_id).one_or_none()
+
+    if not project:
+        raise GenericError(HTTPStatus.NOT_FOUND, HTTPStatus.NOT_FOUND.phrase, "Proyecto no encontrado o eliminado.")
+
+    if str(project.user_id) != current_user_id:
+        raise GenericError(HTTPStatus.FORBIDDEN, HTTPStatus.FORBIDDEN.phrase, "Acceso denegado. El proyecto no te pertenece.")
+
+    return project
+
+
+@revisions_bp.route('/<uuid:project_id>/revisions', methods=['GET'])
+@jwt_required()
+def list_project_revisions(project_id):
+    """
+    Lista las revisiones guardadas del proyecto, de la mas reciente a la mas antigua.
+    Query params opcionales: 'page' (desde 1) y 'per_page'.
+    """
+    try:
+        current_user_id = get_jwt_identity()
+        project = _get_owned_project(project_id, current_user_id)
+
+        page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('per_page', current_app.config['REVISION_PAGE_SIZE'], type=int)
+        if page < 1 or not (1 <= per_page <= 100):
+            raise GenericError(HTTPStatus.BAD_REQUEST, HTTPStatus.BAD_REQUEST.phrase, "'page' debe ser >= 1 y 'per_page' estar entre 1 y 100.")
+
+        # Sin la columna payload: el listado nunca descomprime nada
+        query = db.session.query(
+            ProjectRevision.number, ProjectRevision.kind, ProjectRevision.user_id,
+            ProjectRevision.raw_size, ProjectRevision.changes, ProjectRevision.created_at
+        ).filter_by(project_id=project.id)
+        total = query.count()
+        rows = query.order_by(ProjectRevision.number.desc()).limit(per_page).offset((page - 1) * per_page).all()
+
+        revisions = [
+            {
+                "number": row.number,
+                "kind": row.kind,
+                "userId": str(row.user_id) if row.user_id else None,
+                "sizeBytes": row.raw_size,
+                "changes": row.changes,
+                "createdAt": row.created_at.isoformat()
+            }
+            for row in rows
+        ]
+        db.session.remove()
+
+        return jsonify({"total": total, "page": page, "perPage": per_page, "revisions": revisions}), HTTPStatus.OK
+
+    except GenericError as e:
+        db.session.rollback()
+        db.session.remove()
+        return jsonify({"message": e.message}), e.status
+    except Exception as err:
+        db.session.rollback()
+        db.session.remove()
+        logger.exception("Error inesperado en list_project_revisions")
+        return jsonify({
+            "message": "Error interno del servidor al listar las revisiones."
+        }), HTTPStatus.INTERNAL_SERVER_ERROR
+
+
+@revisions_bp.route('/<uuid:project_id>/revisions/<int:number>', methods=['GET'])
+@jwt_required()
+def get_project_revision(project_id, number):
+    """
+    Devuelve el diagrama tal como quedo en la revision indicada (mismo formato que recibe
+    /save, asi el cliente puede restaurarlo guardandolo de nuevo).
+    """
+    try:
+        current_user_id = get_jwt_identity()
+        project = _get_owned_project(project_id, current_user_id)
+
+        revision, diagram, deltas_applied = checkout_revision(project.id, number)
+        db.session.remove()
+
+        return jsonify({
+            "number": revision.number,
+            "kind": revision.kind,
+            "createdAt": revision.created_at.isoformat(),
+            "deltasApplied": deltas_applied,
+            "diagram": diagram
+        }), HTTPStatus.OK
+
+    except GenericError as e:
+        db.session.rollback()
+        db.session.remove()
+        return jsonify({"message": e.message}), e.status
+    except Exception as err:
+        db.session.rollback()
+        db.session.remove()
+        logger.exception("Error inesperado en get_project_revision")
+        return jsonify({
+            "message": "Error interno del servidor al cargar la revision."
+        }), HTTPStatus.INTERNAL_SERVER_ERROR
@@ -0,0 +1,60 @@
+import logging
+from flask import Blueprint, current_app, jsonify, request
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.database import db
+from app.errors.errors import GenericError
+from app.services.search import SEARCH_KINDS, search
+from http import HTTPStatus
+
+search_bp = Blueprint('search_bp', __name__)
+logger = logging.getLogger(__name__)
+
+@search_bp.route('', methods=['GET'])
+@jwt_required()
+def search_user_content():
+    """
+    Busca en los proyectos del usuario autenticado: nombres y descripciones de proyectos,
+    nombres y estereotipos de clases, y nombres de atributos y metodos.
+
+    Query params: 'q' (texto), 'types' (project,class,member; por defecto todos),
+    'page' (desde 1) y 'per_page'. Los resultados vienen ordenados por relevancia.
+    """
+    try:
+        current_user_id = get_jwt_identity()
+
+        query = request.args.get('q', '').strip()
+        if not query:
+            raise GenericError(HTTPStatus.BAD_REQUEST, HTTPStatus.BAD_REQUEST.phrase, "El parametro 'q' es obligatorio.")
+
+        kinds = [kind.strip() for kind in request.args.get('types', ','.join(SEARCH_KINDS)).split(',') if kind.strip()]
+        invalid = [kind for kind in kinds if kind not in SEARCH_KINDS]
+        if not kinds or invalid:
+            raise GenericError(HTTPStatus.BAD_REQUEST, HTTPStatus.BAD_REQUEST.phrase, f"Tipos no soportados: {', '.join(invalid) or 'ninguno'}. Usa: {', '.join(SEARCH_KINDS)}.")
+
+        page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('per_page', current_app.config['SEARCH_PAGE_SIZE'], type=int)
+        if page < 1 or not (1 <= per_page <= current_app.config['SEARCH_MAX_PAGE_SIZE']):
+            raise GenericError(HTTPStatus.BAD_REQUEST, HTTPStatus.BAD_REQUEST.phrase, f"'page' debe ser >= 1 y 'per_page' estar entre 1 y {current_app.config['SEARCH_MAX_PAGE_SIZE']}.")
+
+        total, hits = search(current_user_id, query, sorted(set(kinds), key=SEARCH_KINDS.index), per_page, (page - 1) * per_page)
+        db.session.remove()
+
+        return jsonify({
+            "query": query,
+            "page": page,
+            "perPage": per_page,
+            "total": total,
+            "results": hits
+        }), HTTPStatus.OK
+
+    except GenericError as e:
+        db.session.rollback()
+        db.session.remove()
+        return jsonify({"message": e.message}), e.status
+    except Exception as err:
+        db.session.rollback()
+        db.session.remove()
+        logger.exception("Error inesperado en search_user_content")
+        return jsonify({
+            "message": "Error interno del servidor al realizar la busqueda."
+        }), HTTPStatus.INTERNAL_SERVER_ERROR
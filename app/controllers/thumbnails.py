@@ -0,0 +1,62 @@
+import logging
+import time
+from flask import Blueprint, Response, jsonify, request, send_file
+from app.database import db
+from app.models import Project
+from app.errors.errors import GenericError
+from app.services.thumbnails import thumbnail_service
+from sqlalchemy.orm import load_only
+from http import HTTPStatus
+
+thumbnails_bp = Blueprint('thumbnails_bp', __name__)
+logger = logging.getLogger(__name__)
+
+# Segundos que el navegador guarda el marcador antes de volver a pedir la miniatura
+PLACEHOLDER_MAX_AGE = 5
+
+@thumbnails_bp.route('/<uuid:project_id>/thumbnail/<int:version>.svg', methods=['GET'])
+def get_project_thumbnail(project_id, version):
+    """
+    Sirve la miniatura SVG de una version del proyecto. La URL (incluida en el listado de
+    proyectos) va firmada y con caducidad en lugar de pedir el JWT, para poder usarla en una
+    etiqueta <img>. El contenido de una version no cambia nunca, por eso se cachea como inmutable
+    hasta que la URL caduca. Si aun no se dibujo, responde 202 con un marcador y encola el trabajo.
+    """
+    try:
+        expires = thumbnail_service.verify(project_id, version, request.args.get('exp'), request.args.get('sig'))
+        if expires is None:
+            raise GenericError(HTTPStatus.FORBIDDEN, HTTPStatus.FORBIDDEN.phrase, "Firma de la miniatura invalida o caducada.")
+
+        path = thumbnail_service.lookup(project_id, version)
+        if not path:
+            # Aun no se genero (o su trabajo sigue en la cola): se encola si es la version actual,
+            # sin dibujar en la peticion (un panel en frio pediria todas a la vez)
+            project = Project.get_active().filter_by(id=project_id).options(
+                load_only(Project.id, Project.updated_at)
+            ).one_or_none()
+            if not project or project.version != version:
+                raise GenericError(HTTPStatus.NOT_FOUND, HTTPStatus.NOT_FOUND.phrase, "Miniatura no disponible para esta version.")
+            db.session.remove()
+            thumbnail_service.schedule(project_id)
+
+            response = Response(thumbnail_service.placeholder(), status=HTTPStatus.ACCEPTED, mimetype='image/svg+xml')
+            response.headers['Cache-Control'] = f'public, max-age={PLACEHOLDER_MAX_AGE}'
+            response.headers['Retry-After'] = str(PLACEHOLDER_MAX_AGE)
+            return response
+
+        response = send_file(path, mimetype='image/svg+xml', etag=f"{project_id}-{version}", conditional=True)
+        max_age = max(0, expires - int(time.time()))
+        response.headers['Cache-Control'] = f'public, max-age={max_age}, immutable'
+        return response
+
+    except GenericError as e:
+        db.session.rollback()
+        db.session.remove()
+        return jsonify({"message": e.message}), e.status
+    except Exception as err:
+        db.session.rollback()
+        db.session.remove()
+        logger.exception("Error inesperado en get_project_thumbnail")
+        return jsonify({
+            "message": "Error interno del servidor al cargar la miniatura."
+        }), HTTPStatus.INTERNAL_SERVER_ERROR
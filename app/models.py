@@ -1,6 +1,6 @@
 from datetime import datetime, timezone
-from sqlalchemy import JSON, UUID, Text, DateTime, ForeignKey, Boolean, text
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import JSON, UUID, Text, DateTime, ForeignKey, Boolean, Integer, Float, LargeBinary, UniqueConstraint, Computed, Index, BigInteger, FetchedValue, ForeignKeyConstraint, text, and_
+from sqlalchemy.orm import Mapped, mapped_column, relationship, deferred, foreign
 from app.database import db
 import uuid
 
@@ -45,6 +45,8 @@ class Users(BaseModel):
 # Modelo para la tabla 'bitacora_users'
 class BitacoraUsers(BaseModel):
     __tablename__ = 'bitacora_users'
+    # La BD añade created_xid (transaccion que inserto el evento, indexada): las pasadas de
+    # services/audit_rollup.py leen la bitacora por tramos de esa columna. No se mapea.
     ip: Mapped[str] = mapped_column(Text, nullable=False)
     tipo_accion: Mapped[str] = mapped_column(Text, nullable=False)
     # Se añade la clave foránea que apunta a la tabla 'users'
@@ -73,28 +75,50 @@ class Project(BaseModel):
     classes: Mapped[list["Class"]] = relationship("Class", back_populates="project", cascade="all, delete-orphan")
     relationships: Mapped[list["Relationship"]] = relationship(back_populates="project", cascade="all, delete-orphan")
 
+    @property
+    def version(self):
+        """Version del proyecto para claves de cache: cambia con cada guardado o edicion."""
+        return int(self.updated_at.timestamp() * 1_000_000)
+
     def __repr__(self):
         return f'<Project {self.name}>'
 
 # Modelo para la tabla 'classes'
 class Class(BaseModel):
     __tablename__ = 'classes'
-    project_id: Mapped[uuid.UUID] = mapped_column(ForeignKey('projects.id', ondelete='CASCADE'), nullable=False)
+    # Tabla particionada por HASH (project_id): la clave primaria es (project_id, id)
+    project_id: Mapped[uuid.UUID] = mapped_column(ForeignKey('projects.id', ondelete='CASCADE'), primary_key=True)
     name: Mapped[str] = mapped_column(Text, nullable=False)
     stereotype: Mapped[str] = mapped_column(Text, nullable=True)
     attributes: Mapped[list] = mapped_column(JSON, default=lambda: [])
     methods: Mapped[list] = mapped_column(JSON, default=lambda: [])
     position: Mapped[dict] = mapped_column(JSON, default=lambda: {"x": 0, "y": 0})
 
+    # Copia numerica de position.x / position.y que calcula PostgreSQL (columnas generadas), con
+    # indice (project_id, pos_x, pos_y) para las consultas por area visible. Diferidas: no se
+    # leen al cargar la clase y el ORM nunca las escribe.
+    pos_x: Mapped[float] = deferred(mapped_column(Float, Computed("CASE WHEN json_typeof(position -> 'x') = 'number' THEN (position ->> 'x')::double precision END", persisted=True), nullable=True))
+    pos_y: Mapped[float] = deferred(mapped_column(Float, Computed("CASE WHEN json_typeof(position -> 'y') = 'number' THEN (position ->> 'y')::double precision END", persisted=True), nullable=True))
+
+    # Version de sincronizacion: la asigna un trigger en cada INSERT/UPDATE (ver services/sync.py)
+    sync_version: Mapped[int] = deferred(mapped_column(BigInteger, server_default=FetchedValue(), server_onupdate=FetchedValue(), nullable=False))
+
+    __table_args__ = (
+        Index('ix_classes_project_position', 'project_id', 'pos_x', 'pos_y'),
+        Index('ix_classes_project_sync_version', 'project_id', 'sync_version'),
+        # Las particiones (classes_p0..) las crea la migracion segun DIAGRAM_PARTITIONS
+        {'postgresql_partition_by': 'HASH (project_id)'},
+    )
+
     # Relación con Project
     project: Mapped["Project"] = relationship("Project", back_populates="classes")
 
     # Relaciones para Source y Target Relationships
     source_relationships: Mapped[list["Relationship"]] = relationship(
-        "Relationship", foreign_keys="[Relationship.source_class_id]", back_populates="source_class", cascade="all, delete-orphan"
+        "Relationship", primaryjoin=lambda: _class_join(Relationship.source_class_id), back_populates="source_class", cascade="all, delete-orphan"
     )
     target_relationships: Mapped[list["Relationship"]] = relationship(
-        "Relationship", foreign_keys="[Relationship.target_class_id]", back_populates="target_class", cascade="all, delete-orphan"
+        "Relationship", primaryjoin=lambda: _class_join(Relationship.target_class_id), back_populates="target_class", cascade="all, delete-orphan"
     )
 
     def __repr__(self):
@@ -103,20 +127,85 @@ class Class(BaseModel):
 # Modelo para la tabla 'relationships'
 class Relationship(BaseModel):
     __tablename__ = 'relationships'
-    project_id: Mapped[uuid.UUID] = mapped_column(ForeignKey('projects.id', ondelete='CASCADE'), nullable=False)
-    source_class_id: Mapped[uuid.UUID] = mapped_column(ForeignKey('classes.id', ondelete='CASCADE'), nullable=False)
-    target_class_id: Mapped[uuid.UUID] = mapped_column(ForeignKey('classes.id', ondelete='CASCADE'), nullable=False)
+    # Tabla particionada por HASH (project_id), con el mismo numero de particiones que classes
+    project_id: Mapped[uuid.UUID] = mapped_column(ForeignKey('projects.id', ondelete='CASCADE'), primary_key=True)
+    source_class_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
+    target_class_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
     relationship_type: Mapped[str] = mapped_column(Text, nullable=False)
     source_multiplicity: Mapped[str] = mapped_column(Text, nullable=True)
     target_multiplicity: Mapped[str] = mapped_column(Text, nullable=True)
     label: Mapped[str] = mapped_column(Text, nullable=True)
 
+    # Version de sincronizacion: la asigna un trigger en cada INSERT/UPDATE (ver services/sync.py)
+    sync_version: Mapped[int] = deferred(mapped_column(BigInteger, server_default=FetchedValue(), server_onupdate=FetchedValue(), nullable=False))
+
+    __table_args__ = (
+        # Las clases se identifican por (project_id, id): la relacion y sus clases estan en el mismo proyecto
+        ForeignKeyConstraint(['project_id', 'source_class_id'], ['classes.project_id', 'classes.id'], ondelete='CASCADE', name='relationships_source_class_id_fkey'),
+        ForeignKeyConstraint(['project_id', 'target_class_id'], ['classes.project_id', 'classes.id'], ondelete='CASCADE', name='relationships_target_class_id_fkey'),
+        Index('ix_relationships_source_class_id', 'project_id', 'source_class_id'),
+        Index('ix_relationships_target_class_id', 'project_id', 'target_class_id'),
+        Index('ix_relationships_project_sync_version', 'project_id', 'sync_version'),
+        {'postgresql_partition_by': 'HASH (project_id)'},
+    )
+
     # Relación con Project
     project: Mapped["Project"] = relationship("Project", back_populates="relationships")
 
     # Relaciones con Class para source y target
-    source_class: Mapped["Class"] = relationship("Class", foreign_keys="[Relationship.source_class_id]", back_populates="source_relationships")
-    target_class: Mapped["Class"] = relationship("Class", foreign_keys="[Relationship.target_class_id]", back_populates="target_relationships")
+    source_class: Mapped["Class"] = relationship("Class", primaryjoin=lambda: _class_join(Relationship.source_class_id), back_populates="source_relationships")
+    target_class: Mapped["Class"] = relationship("Class", primaryjoin=lambda: _class_join(Relationship.target_class_id), back_populates="target_relationships")
+
+    def __repr__(self):
+        return f'<Relationship {self.relationship_type}>'
+
+
+def _class_join(class_id_column):
+    # project_id lo comparten la relacion, sus dos clases y el proyecto: solo la columna del id de
+    # la clase se marca como foranea, asi el ORM no intenta copiar project_id desde tres sitios
+    return and_(Class.project_id == Relationship.project_id, Class.id == foreign(class_id_column))
+
+# Modelo para la tabla 'project_revisions' (historial de guardados del diagrama)
+class ProjectRevision(BaseModel):
+    __tablename__ = 'project_revisions'
+    __table_args__ = (UniqueConstraint('project_id', 'number', name='uq_project_revisions_project_number'),)
+    project_id: Mapped[uuid.UUID] = mapped_column(ForeignKey('projects.id', ondelete='CASCADE'), nullable=False)
+    user_id: Mapped[uuid.UUID] = mapped_column(ForeignKey('users.id', ondelete='SET NULL'), nullable=True)
+    number: Mapped[int] = mapped_column(Integer, nullable=False)
+    # 'snapshot' guarda el diagrama completo; 'delta' solo los elementos que cambiaron desde la revision anterior
+    kind: Mapped[str] = mapped_column(Text, nullable=False)
+    payload: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    raw_size: Mapped[int] = mapped_column(Integer, nullable=False)
+    changes: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    def __repr__(self):
+        return f'<ProjectRevision {self.number} ({self.kind})>'
+# Modelo para la tabla 'jobs' (cola de trabajos en segundo plano, ver services/jobs.py)
+class Job(BaseModel):
+    __tablename__ = 'jobs'
+    job_type: Mapped[str] = mapped_column(Text, nullable=False)
+    # 'queued' -> 'running' -> 'succeeded' | 'failed' (o de vuelta a 'queued' para reintentar)
+    status: Mapped[str] = mapped_column(Text, nullable=False, default='queued')
+    payload: Mapped[dict] = mapped_column(JSON, nullable=False, default=lambda: {})
+    result: Mapped[dict] = mapped_column(JSON, nullable=True)
+    error: Mapped[str] = mapped_column(Text, nullable=True)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    max_attempts: Mapped[int] = mapped_column(Integer, nullable=False)
+    run_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
+    started_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=True)
+    finished_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=True)
+    # Proceso que lo esta ejecutando y hasta cuando: si deja de renovar la reserva, otro lo retoma
+    locked_by: Mapped[str] = mapped_column(Text, nullable=True)
+    locked_until: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=True)
+    # Evita encolar dos veces el mismo trabajo pendiente (p. ej. la miniatura de un proyecto)
+    dedupe_key: Mapped[str] = mapped_column(Text, nullable=True)
+    user_id: Mapped[uuid.UUID] = mapped_column(ForeignKey('users.id', ondelete='CASCADE'), nullable=True)
+    project_id: Mapped[uuid.UUID] = mapped_column(ForeignKey('projects.id', ondelete='CASCADE'), nullable=True)
+
+    __table_args__ = (
+        Index('ix_jobs_claim', 'job_type', 'status', 'run_at'),
+        Index('uq_jobs_queued_dedupe_key', 'dedupe_key', unique=True, postgresql_where=text("status = 'queued'")),
+    )
 
     def __repr__(self):
-        return f'<Relationship {self.relationship_type}>'
\ No newline at end of file
+        return f'<Job {self.job_type} ({self.status})>'
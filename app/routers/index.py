@@ -3,10 +3,28 @@ from app.controllers.auth import auth_bp
 from app.controllers.projects import projects_bp
 from app.controllers.classes import classes_bp
 from app.controllers.relationships import relationships_bp
+from app.controllers.exports import exports_bp
+from app.controllers.imports import imports_bp
+from app.controllers.analysis import analysis_bp
+from app.controllers.layout import layout_bp
+from app.controllers.search import search_bp
+from app.controllers.revisions import revisions_bp
+from app.controllers.thumbnails import thumbnails_bp
+from app.controllers.jobs import jobs_bp
+from app.controllers.audit import audit_bp
 
 api_bp = Blueprint('api', __name__)
 
 api_bp.register_blueprint(auth_bp, url_prefix='/auth')
 api_bp.register_blueprint(projects_bp, url_prefix='/projects')
 api_bp.register_blueprint(classes_bp, url_prefix='/classes')
-api_bp.register_blueprint(relationships_bp, url_prefix='/relationships')
\ No newline at end of file
+api_bp.register_blueprint(relationships_bp, url_prefix='/relationships')
+api_bp.register_blueprint(exports_bp, url_prefix='/projects')
+api_bp.register_blueprint(imports_bp, url_prefix='/projects')
+api_bp.register_blueprint(analysis_bp, url_prefix='/projects')
+api_bp.register_blueprint(layout_bp, url_prefix='/projects')
+api_bp.register_blueprint(search_bp, url_prefix='/search')
+api_bp.register_blueprint(revisions_bp, url_prefix='/projects')
+api_bp.register_blueprint(thumbnails_bp, url_prefix='/projects')
+api_bp.register_blueprint(jobs_bp, url_prefix='/jobs')
+api_bp.register_blueprint(audit_bp, url_prefix='/audit')
\ No newline at end of file
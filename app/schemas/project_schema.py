@@ -30,7 +30,7 @@ class UMLClassSchema(Schema):
     """Serializa el modelo Class a la interfaz UMLClass del frontend."""
     id = fields.UUID(dump_only=True)
     # Serializa 'project_id' a 'projectId'
-    projectId = fields.UUID(dump_only=True, data_key="projectId")
+    projectId = fields.UUID(attribute="project_id", dump_only=True, data_key="projectId")
     name = fields.Str()
     stereotype = fields.Str(allow_none=True)
     attributes = fields.List(fields.Nested(UMLAttributeSchema)) 
@@ -44,15 +44,15 @@ class UMLRelationshipSchema(Schema):
     """Serializa el modelo Relationship a la interfaz UMLRelationship del frontend."""
     id = fields.UUID(dump_only=True)
     # Serializa 'source_class_id' a 'sourceClassId'
-    sourceClassId = fields.UUID(data_key="sourceClassId")
+    sourceClassId = fields.UUID(attribute="source_class_id", data_key="sourceClassId")
     # Serializa 'target_class_id' a 'targetClassId'
-    targetClassId = fields.UUID(data_key="targetClassId")
+    targetClassId = fields.UUID(attribute="target_class_id", data_key="targetClassId")
     # Serializa 'relationship_type' a 'relationshipType'
-    relationshipType = fields.Str(data_key="relationshipType")
+    relationshipType = fields.Str(attribute="relationship_type", data_key="relationshipType")
     # Serializa 'source_multiplicity' a 'sourceMultiplicity'
-    sourceMultiplicity = fields.Str(data_key="sourceMultiplicity", allow_none=True)
+    sourceMultiplicity = fields.Str(attribute="source_multiplicity", data_key="sourceMultiplicity", allow_none=True)
     # Serializa 'target_multiplicity' a 'targetMultiplicity'
-    targetMultiplicity = fields.Str(data_key="targetMultiplicity", allow_none=True)
+    targetMultiplicity = fields.Str(attribute="target_multiplicity", data_key="targetMultiplicity", allow_none=True)
     label = fields.Str(allow_none=True)
 
 class ClassSchema(SQLAlchemyAutoSchema):
@@ -63,6 +63,8 @@ class ClassSchema(SQLAlchemyAutoSchema):
         # Campos que queremos incluir. 'id' es UUID, los demás son estándares.
         include_fk = True
         load_instance = True
+        # Columnas generadas por la BD para las consultas por area visible; no son parte del API
+        exclude = ("pos_x", "pos_y", "sync_version")
         
     # El ID es el identificador principal para el frontend
     id = fields.UUID(attribute="id", dump_only=True)
@@ -79,6 +81,9 @@ class RelationshipSchema(SQLAlchemyAutoSchema):
         # Incluir las FKs para saber qué nodos conecta
         include_fk = True
         load_instance = True
+        # Las FKs se exponen como sourceClassId/targetClassId (mas abajo); con ambos nombres marshmallow
+        # rechaza el esquema. sync_version es la version de sincronizacion interna (la asigna un trigger)
+        exclude = ("source_class_id", "target_class_id", "sync_version")
 
     # El ID es el identificador principal para el frontend
     id = fields.UUID(attribute="id", dump_only=True)
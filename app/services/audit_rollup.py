@@ -0,0 +1,184 @@
+import logging
+from datetime import timedelta
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import text
+
+from app.database import db
+from app.errors.errors import GenericError
+from app.services.jobs import job_runner
+from app.services.pubsub import pubsub
+from app.utils.enums.enums import Sesion
+
+logger = logging.getLogger(__name__)
+
+# Resumenes de la bitacora de sesiones (bitacora_users) para las consultas de administracion.
+#
+# Contar registros, inicios y cierres de sesion por dia sobre bitacora_users recorre todos los
+# eventos del rango. Estas tablas guardan un contador por (dia, accion) y por (usuario, dia,
+# accion), mas la ultima IP de cada usuario, asi una consulta lee como mucho una fila por dia y
+# accion. tipo_accion se guarda con el caracter de la bitacora y se traduce con Sesion al leer.
+#
+# Actualizacion incremental: cada evento guarda en created_xid el id de la transaccion que lo
+# inserto (lo asigna la BD, no depende del reloj de la app). El trabajo "audit_rollup" suma los
+# eventos con created_xid entre la marca de bitacora_rollup_state y el xmin del snapshot actual, y
+# avanza la marca, en una sola transaccion (si falla no se cuenta nada dos veces). Todas las
+# transacciones por debajo del xmin ya terminaron: ningun evento de ese tramo puede confirmarse
+# despues, por tarde que llegue el commit. Cada evento "bitacora.logged" encola el trabajo con
+# AUDIT_ROLLUP_INTERVAL_SECONDS de espera y una clave de deduplicacion, asi una rafaga de logins es
+# una sola pasada; si al terminar quedan eventos posteriores a la marca, se vuelve a encolar.
+#
+# Los dias son dias UTC. Los contadores por usuario y su ultima IP se borran con el usuario; los
+# totales por dia se conservan.
+
+ROLLUP_SQL = """
+    WITH events AS MATERIALIZED (
+        SELECT user_id, tipo_accion, ip, created_at, (created_at AT TIME ZONE 'UTC')::date AS day
+        FROM bitacora_users
+        WHERE created_xid >= CAST(:lower AS xid8) AND created_xid < CAST(:upper AS xid8)
+    ),
+    per_day AS (
+        INSERT INTO bitacora_daily_counts AS c (day, tipo_accion, count)
+        SELECT day, tipo_accion, count(*) FROM events GROUP BY day, tipo_accion
+        ON CONFLICT (day, tipo_accion) DO UPDATE SET count = c.count + EXCLUDED.count
+    ),
+    per_user AS (
+        INSERT INTO bitacora_user_daily_counts AS c (user_id, day, tipo_accion, count)
+        SELECT user_id, day, tipo_accion, count(*) FROM events GROUP BY user_id, day, tipo_accion
+        ON CONFLICT (user_id, day, tipo_accion) DO UPDATE SET count = c.count + EXCLUDED.count
+    ),
+    last_ip AS (
+        INSERT INTO bitacora_last_ips AS l (user_id, ip, seen_at)
+        SELECT DISTINCT ON (user_id) user_id, ip, created_at FROM events ORDER BY user_id, created_at DESC
+        ON CONFLICT (user_id) DO UPDATE SET ip = EXCLUDED.ip, seen_at = EXCLUDED.seen_at
+        WHERE EXCLUDED.seen_at >= l.seen_at
+    )
+    SELECT count(*) FROM events
+"""
+
+
+def _decode_action(char):
+    """(nombre, descripcion) de un caracter de tipo_accion; uno desconocido se devuelve tal cual."""
+    try:
+        action = Sesion.get_by_char(char)
+    except GenericError:
+        return char, None
+    return action.name, action.get_descripcion()
+
+
+class AuditRollup:
+    def __init__(self):
+        self.interval = 60.0
+
+    def init_app(self, app):
+        self.interval = app.config["AUDIT_ROLLUP_INTERVAL_SECONDS"]
+        app.cli.add_command(audit_cli)
+
+    # --- Actualizacion ---
+
+    def schedule(self):
+        job_runner.enqueue("audit_rollup", {}, dedupe_key="audit_rollup", delay=self.interval)
+
+    def refresh(self):
+        """Suma a los resumenes los eventos nuevos. Devuelve (eventos, marca, quedan_pendientes). No hace commit."""
+        # xid8 llega como texto: se compara como entero y se vuelve a pasar con CAST
+        lower = int(db.session.execute(text("SELECT watermark::text FROM bitacora_rollup_state WHERE id = 1 FOR UPDATE")).scalar())
+        upper = int(db.session.execute(text("SELECT pg_snapshot_xmin(pg_current_snapshot())::text")).scalar())
+        if upper <= lower:
+            # Una transaccion abierta desde antes de la marca la retiene; se reintenta mas tarde
+            return 0, lower, True
+        params = {"lower": str(lower), "upper": str(upper)}
+        events = db.session.execute(text(ROLLUP_SQL), params).scalar()
+        db.session.execute(
+            text("UPDATE bitacora_rollup_state SET watermark = CAST(:upper AS xid8), updated_at = now() WHERE id = 1"),
+            params
+        )
+        pending = db.session.execute(
+            text("SELECT EXISTS (SELECT 1 FROM bitacora_users WHERE created_xid >= CAST(:upper AS xid8))"), params
+        ).scalar()
+        return events, upper, pending
+
+    # --- Consultas ---
+
+    def refreshed_at(self):
+        """Hora (de la BD) de la ultima pasada: los eventos confirmados antes ya estan sumados."""
+        return db.session.execute(text("SELECT updated_at FROM bitacora_rollup_state WHERE id = 1")).scalar()
+
+    def daily_counts(self, start, end, user_id=None):
+        """Contadores por dia entre start y end (incluidos), con los dias sin eventos en cero."""
+        if user_id is None:
+            rows = db.session.execute(text(
+                "SELECT day, tipo_accion, count FROM bitacora_daily_counts WHERE day BETWEEN :start AND :end"
+            ), {"start": start, "end": end})
+        else:
+            rows = db.session.execute(text(
+                "SELECT day, tipo_accion, count FROM bitacora_user_daily_counts "
+                "WHERE user_id = :user_id AND day BETWEEN :start AND :end"
+            ), {"user_id": user_id, "start": start, "end": end})
+
+        days = {}
+        for row in rows:
+            name, _ = _decode_action(row.tipo_accion)
+            counts = days.setdefault(row.day, {})
+            counts[name] = counts.get(name, 0) + row.count
+
+        result = []
+        for offset in range((end - start).days + 1):
+            day = start + timedelta(days=offset)
+            counts = days.get(day, {})
+            result.append({"date": day.isoformat(), "total": sum(counts.values()), "actions": counts})
+        return result
+
+    def last_ip(self, user_id):
+        row = db.session.execute(
+            text("SELECT ip, seen_at FROM bitacora_last_ips WHERE user_id = :user_id"), {"user_id": user_id}
+        ).one_or_none()
+        return {"ip": row.ip, "seenAt": row.seen_at.isoformat()} if row else None
+
+    def last_ips(self, limit, offset):
+        """Ultima IP por usuario, de la actividad mas reciente a la mas antigua. Devuelve (total, filas)."""
+        total = db.session.execute(text("SELECT count(*) FROM bitacora_last_ips")).scalar()
+        rows = db.session.execute(text("""
+            SELECT l.user_id, u.username, u.email, l.ip, l.seen_at
+            FROM bitacora_last_ips l JOIN users u ON u.id = l.user_id
+            ORDER BY l.seen_at DESC, l.user_id
+            LIMIT :limit OFFSET :offset
+        """), {"limit": limit, "offset": offset})
+        return total, [
+            {"userId": str(row.user_id), "username": row.username, "email": row.email, "ip": row.ip, "seenAt": row.seen_at.isoformat()}
+            for row in rows
+        ]
+
+    @staticmethod
+    def actions():
+        """Leyenda nombre -> descripcion de las acciones de la bitacora."""
+        return {action.name: action.get_descripcion() for action in Sesion}
+
+
+audit_rollup = AuditRollup()
+
+audit_cli = AppGroup("audit", help="Resumenes de la bitacora de sesiones.")
+
+
+@job_runner.task("audit_rollup", concurrency=1, max_attempts=5)
+def _run_rollup(payload):
+    events, watermark, pending = audit_rollup.refresh()
+    db.session.commit()
+    if pending:
+        audit_rollup.schedule()
+    return {"events": events, "watermark": str(watermark)}
+
+
+# El trabajo se encola una sola vez, en el proceso que publico el evento
+@pubsub.subscribe("bitacora.logged", origin_only=True)
+def _on_bitacora_logged(data):
+    audit_rollup.schedule()
+
+
+@audit_cli.command("rollup")
+def rollup_command():
+    """Suma ahora los eventos pendientes (p. ej. para la primera carga de una bitacora grande)."""
+    events, watermark, _ = audit_rollup.refresh()
+    db.session.commit()
+    click.echo(f"{events} eventos sumados hasta la transaccion {watermark}")
@@ -0,0 +1,428 @@
+import atexit
+import fcntl
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from http import HTTPStatus
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.database import db
+from app.errors.errors import GenericError
+from app.models import Class, Project, Relationship
+from app.services.diagram_operations import apply_operation, normalize_operation, serialize_operation_data
+from app.services.pubsub import pubsub
+from app.services.revisions import record_rows_revision
+
+logger = logging.getLogger(__name__)
+
+# Buffer de escritura diferida (write-behind) para las ediciones granulares de un diagrama.
+# Las ediciones se aceptan en memoria y se anotan en un diario (journal) de solo-anexado;
+# se coalescen por elemento y se vuelcan a PostgreSQL cuando el proyecto deja de recibir
+# cambios durante el intervalo de debounce, cuando pasa el retraso maximo o cuando el
+# buffer alcanza su limite de tamaño.
+#
+# Cada worker de gunicorn tiene su propio buffer. El directorio de diarios es compartido: el
+# nombre de cada diario (<proyecto>.<pid>.<sufijo>.jsonl) dice que worker tiene ediciones
+# pendientes de que proyecto, y flush()/discard() piden por el bus a esos workers que las
+# vuelquen o descarten y esperan a que sus diarios desaparezcan.
+
+# Orden en que se vuelcan las operaciones coalescidas: primero las clases (para que existan
+# los extremos de las relaciones), luego las relaciones y al final los borrados.
+_FLUSH_PHASES = (
+    ("class", ("create", "update")),
+    ("relationship", ("create", "update")),
+    ("relationship", ("delete",)),
+    ("class", ("delete",)),
+)
+
+
+class _ProjectBuffer:
+    def __init__(self, project_id):
+        self.project_id = project_id
+        self.pending = OrderedDict()  # (entidad, id) -> [accion, data]
+        self.first_edit = None
+        self.last_edit = None
+        self.journal = None
+        # Segmentos del diario que todavia no se han volcado (se borran tras el commit)
+        self.segments = []
+
+    def add(self, op_type, data):
+        entity, action = op_type.split(".")
+        key = (entity, data["id"])
+        existing = self.pending.get(key)
+
+        if existing is None:
+            self.pending[key] = [action, dict(data)]
+        elif action == "update" and existing[0] in ("create", "update"):
+            # Arrastrar una clase produce decenas de updates: solo se conserva el ultimo valor de cada campo
+            existing[1].update(data)
+        else:
+            existing[0] = action
+            existing[1] = dict(data)
+
+        now = time.monotonic()
+        self.first_edit = self.first_edit or now
+        self.last_edit = now
+
+
+class AutosaveBuffer:
+    def __init__(self):
+        self._app = None
+        self._buffers = {}
+        self._lock = threading.RLock()
+        # Un solo volcado a la vez por proyecto; flush() espera al que este en curso.
+        # proyecto -> [candado, usuarios]; la entrada se borra cuando nadie la usa
+        self._write_locks = {}
+        self._wakeup = threading.Event()
+        self._flusher = None
+        self._flusher_pid = None
+
+    def init_app(self, app):
+        self._app = app
+        self.debounce = app.config["AUTOSAVE_DEBOUNCE_SECONDS"]
+        self.max_delay = app.config["AUTOSAVE_MAX_DELAY_SECONDS"]
+        self.max_pending = app.config["AUTOSAVE_MAX_PENDING_EDITS"]
+        self.journal_dir = app.config["AUTOSAVE_JOURNAL_DIR"]
+        self.fsync = app.config["AUTOSAVE_JOURNAL_FSYNC"]
+        self.settle_timeout = app.config["AUTOSAVE_SETTLE_TIMEOUT_SECONDS"]
+        self.recovery_interval = app.config["AUTOSAVE_RECOVERY_INTERVAL_SECONDS"]
+        os.makedirs(self.journal_dir, exist_ok=True)
+        atexit.register(self.flush_all)
+
+        try:
+            self.recover()
+        except Exception as err:
+            logger.exception("No se pudieron recuperar los diarios de autosave")
+
+    # --- API publica ---
+
+    def submit(self, project_id, operations):
+        """
+        Acepta una lista de operaciones ya normalizadas [(tipo, data), ...].
+        Cuando retorna, las ediciones estan en el diario y sobreviven a un reinicio del worker.
+        """
+        project_id = str(project_id)
+        with self._lock:
+            buffer = self._buffers.get(project_id)
+            if buffer is None:
+                buffer = self._buffers[project_id] = _ProjectBuffer(project_id)
+
+            self._journal(buffer, operations)
+            for op_type, data in operations:
+                buffer.add(op_type, data)
+            pending = len(buffer.pending)
+
+        self._ensure_flusher()
+        if pending >= self.max_pending:
+            self._wakeup.set()
+        return pending
+
+    def pending_count(self, project_id):
+        with self._lock:
+            buffer = self._buffers.get(str(project_id))
+            return len(buffer.pending) if buffer else 0
+
+    def flush(self, project_id):
+        """
+        Vuelca de inmediato las ediciones pendientes de un proyecto (lectura de lo propio escrito),
+        tambien las que esten en el buffer de otro worker.
+        """
+        project_id = str(project_id)
+        self._flush_local(project_id)
+        if not self._settle(project_id, "flush"):
+            logger.warning("Ediciones del proyecto %s sin volcar tras %.1f s, se lee sin ellas", project_id, self.settle_timeout)
+
+    def discard(self, project_id):
+        """Descarta lo pendiente, en todos los workers, cuando un guardado completo del diagrama lo reemplaza."""
+        project_id = str(project_id)
+        self._discard_local(project_id)
+        if not self._settle(project_id, "discard"):
+            raise GenericError(
+                HTTPStatus.SERVICE_UNAVAILABLE,
+                HTTPStatus.SERVICE_UNAVAILABLE.phrase,
+                "Hay ediciones del proyecto que todavia se estan guardando. Intenta de nuevo en unos segundos."
+            )
+
+    def flush_all(self):
+        with self._lock:
+            project_ids = list(self._buffers)
+        for project_id in project_ids:
+            self._flush_local(project_id)
+
+    def start(self):
+        # Los hilos no sobreviven al fork de gunicorn: cada worker arranca el suyo (post_fork)
+        self._ensure_flusher()
+
+    def on_settle(self, data):
+        """Atiende el pedido de otro worker de volcar o descartar las ediciones de un proyecto."""
+        project_id = data["projectId"]
+        with self._lock:
+            if project_id not in self._buffers:
+                return
+        # El volcado escribe en la BD: no se bloquea el hilo que escucha el bus
+        target = self._flush_local if data["action"] == "flush" else self._discard_local
+        threading.Thread(target=target, args=(project_id,), name="autosave-settle", daemon=True).start()
+
+    def recover(self):
+        """
+        Reaplica los diarios huerfanos de workers que terminaron sin volcar sus ediciones.
+        Un diario esta huerfano si nadie mantiene su candado exclusivo.
+        """
+        self._recover_journals(sorted(glob.glob(os.path.join(self.journal_dir, "*.jsonl"))), replay=True)
+
+        # Un .tmp solo queda si el worker murio entre crear su diario y renombrarlo: nunca tiene ediciones
+        cutoff = time.time() - 60
+        for path in glob.glob(os.path.join(self.journal_dir, "*.jsonl.tmp")):
+            try:
+                if os.stat(path).st_mtime < cutoff:
+                    os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+        if self._buffers:
+            self._ensure_flusher()
+
+    # --- Volcado y descarte en este worker ---
+
+    @contextmanager
+    def _write_lock(self, project_id):
+        with self._lock:
+            entry = self._write_locks.setdefault(project_id, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._write_locks[project_id]
+
+    def _flush_local(self, project_id):
+        with self._write_lock(project_id):
+            with self._lock:
+                buffer = self._buffers.pop(project_id, None)
+            if buffer is not None and buffer.pending:
+                self._write(buffer)
+            elif buffer is not None:
+                self._release(buffer)
+
+    def _discard_local(self, project_id):
+        # Espera al volcado en curso, para que no termine de escribir despues del guardado completo
+        with self._write_lock(project_id):
+            with self._lock:
+                buffer = self._buffers.pop(project_id, None)
+            if buffer is not None:
+                self._release(buffer)
+
+    # --- Coordinacion entre workers ---
+
+    def _settle(self, project_id, action):
+        """
+        Pide a los workers con diarios del proyecto que los vuelquen o descarten y espera a que
+        desaparezcan. Devuelve False si no lo hacen dentro de AUTOSAVE_SETTLE_TIMEOUT_SECONDS.
+        """
+        own = str(os.getpid())
+        paths = [
+            path for path in glob.glob(os.path.join(self.journal_dir, f"{project_id}.*.jsonl"))
+            if os.path.basename(path).split(".")[1] != own
+        ]
+        if not paths:
+            return True
+
+        pubsub.publish("autosave.settle", {"projectId": project_id, "action": action}, local=False)
+        deadline = time.monotonic() + self.settle_timeout
+        while True:
+            # Los diarios sin candado son de un worker que murio: se recuperan (o descartan) aqui mismo
+            self._recover_journals(paths, replay=action == "flush")
+            paths = [path for path in paths if os.path.exists(path)]
+            if not paths:
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+
+    def _recover_journals(self, paths, replay):
+        for path in paths:
+            try:
+                handle = open(path, "r+", encoding="utf-8")
+            except FileNotFoundError:
+                continue
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                # Si el dueño lo borro tras volcarlo, el candado se obtuvo sobre un archivo ya aplicado
+                if os.fstat(handle.fileno()).st_ino != os.stat(path).st_ino:
+                    raise FileNotFoundError(path)
+            except OSError:
+                handle.close()  # pertenece a un worker vivo o ya no existe
+                continue
+
+            buffer = _ProjectBuffer(os.path.basename(path).split(".")[0])
+            buffer.segments.append((path, handle))
+            if replay:
+                for line in handle:
+                    try:
+                        entry = json.loads(line)
+                        buffer.add(*normalize_operation(entry))
+                    except (ValueError, GenericError):
+                        # Una linea truncada al final del archivo corresponde a una edicion nunca confirmada
+                        continue
+            if buffer.pending:
+                self._write(buffer)
+            else:
+                self._release(buffer)
+
+    # --- Diario de solo-anexado ---
+
+    def _journal(self, buffer, operations):
+        if buffer.journal is None:
+            # Se bloquea con un nombre temporal y luego se renombra, asi recover() nunca ve un diario sin candado
+            path = os.path.join(self.journal_dir, f"{buffer.project_id}.{os.getpid()}.{uuid.uuid4().hex[:8]}.jsonl")
+            handle = open(path + ".tmp", "a", encoding="utf-8")
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            os.rename(path + ".tmp", path)
+            buffer.journal = (path, handle)
+            buffer.segments.append(buffer.journal)
+
+        handle = buffer.journal[1]
+        for op_type, data in operations:
+            handle.write(json.dumps({"type": op_type, "data": serialize_operation_data(data)}) + "\n")
+        handle.flush()
+        if self.fsync:
+            os.fsync(handle.fileno())
+
+    def _release(self, buffer):
+        for path, handle in buffer.segments:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            handle.close()
+        buffer.segments = []
+        buffer.journal = None
+
+    # --- Volcado a PostgreSQL ---
+
+    def _write(self, buffer):
+        event = None
+        with self._app.app_context():
+            try:
+                project = Project.get_active().filter_by(id=buffer.project_id).one_or_none()
+                if project is not None:
+                    for entity, actions in _FLUSH_PHASES:
+                        for (item_entity, _), (action, data) in buffer.pending.items():
+                            if item_entity == entity and action in actions:
+                                self._apply(project, entity, action, data)
+                    # El volcado es una revision del historial (sin autor: puede mezclar a varios editores)
+                    record_rows_revision(project)
+                db.session.commit()
+                if project is not None:
+                    event = {
+                        "projectId": str(project.id),
+                        "userId": str(project.user_id),
+                        "updatedAt": project.updated_at.isoformat()
+                    }
+            except Exception as err:
+                db.session.rollback()
+                logger.exception("Error al volcar el autosave del proyecto %s", buffer.project_id)
+                self._requeue(buffer)
+                return
+            finally:
+                db.session.remove()
+        self._release(buffer)
+        if event is not None:
+            pubsub.publish("project.saved", event)
+
+    def _apply(self, project, entity, action, data):
+        """
+        Aplica una operacion coalescida de forma idempotente: al reaplicar un diario tras una caida
+        puede que la operacion ya estuviera en la BD, por lo que create pasa a update y se ignoran
+        los update/delete de elementos inexistentes.
+        """
+        model = Class if entity == "class" else Relationship
+        exists = db.session.query(model.id).filter_by(id=data["id"], project_id=project.id).first() is not None
+        if action == "create" and exists:
+            action = "update"
+        elif action in ("update", "delete") and not exists:
+            return
+
+        savepoint = db.session.begin_nested()
+        try:
+            apply_operation(project, f"{entity}.{action}", data)
+            savepoint.commit()
+        except GenericError as e:
+            savepoint.rollback()
+            logger.warning("Edicion ignorada en el autosave (%s.%s): %s", entity, action, e.message)
+        except SQLAlchemyError as err:
+            # Una edicion que la BD rechaza se descarta sola: reencolarla bloquearia el proyecto entero
+            savepoint.rollback()
+            logger.warning("Edicion rechazada por la BD en el autosave (%s.%s %s): %s", entity, action, data["id"], err)
+
+    def _requeue(self, buffer):
+        # Si el volcado falla se devuelven las ediciones al buffer vivo (sin perder el diario)
+        with self._lock:
+            current = self._buffers.get(buffer.project_id)
+            if current is not None:
+                for key, (action, data) in current.pending.items():
+                    buffer.pending.pop(key, None)
+                    buffer.pending[key] = [action, data]
+                buffer.segments.extend(current.segments)
+                buffer.journal = current.journal
+            buffer.first_edit = buffer.last_edit = time.monotonic()
+            self._buffers[buffer.project_id] = buffer
+
+    # --- Hilo de volcado ---
+
+    def _ensure_flusher(self):
+        # Los hilos no sobreviven a un fork (gunicorn con preload), por eso se arranca bajo demanda
+        if self._flusher is not None and self._flusher_pid == os.getpid() and self._flusher.is_alive():
+            return
+        with self._lock:
+            if self._flusher is None or self._flusher_pid != os.getpid() or not self._flusher.is_alive():
+                self._flusher_pid = os.getpid()
+                self._flusher = threading.Thread(target=self._run, name="autosave-flusher", daemon=True)
+                self._flusher.start()
+
+    def _due(self):
+        now = time.monotonic()
+        with self._lock:
+            due = [
+                project_id
+                for project_id, buffer in self._buffers.items()
+                if buffer.pending and (
+                    now - buffer.last_edit >= self.debounce
+                    or now - buffer.first_edit >= self.max_delay
+                    or len(buffer.pending) >= self.max_pending
+                )
+            ]
+        return due
+
+    def _run(self):
+        # Ademas de volcar, cada worker recupera de vez en cuando los diarios de los workers caidos
+        next_recovery = time.monotonic() + self.recovery_interval
+        while True:
+            self._wakeup.wait(timeout=min(self.debounce, 0.5))
+            self._wakeup.clear()
+            for project_id in self._due():
+                self._flush_local(project_id)
+            if time.monotonic() >= next_recovery:
+                next_recovery = time.monotonic() + self.recovery_interval
+                try:
+                    self.recover()
+                except Exception as err:
+                    logger.exception("No se pudieron recuperar los diarios de autosave")
+
+
+autosave_buffer = AutosaveBuffer()
+
+
+@pubsub.subscribe("autosave.settle")
+def _on_settle(data):
+    autosave_buffer.on_settle(data)
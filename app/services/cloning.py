@@ -0,0 +1,66 @@
+import uuid
+
+from sqlalchemy import text
+
+from app.database import db
+
+# Clonado de proyectos dentro de PostgreSQL. Las filas se copian con INSERT ... SELECT y los
+# ids de clase nuevos se asignan en una tabla temporal (viejo -> nuevo) que sirve para
+# reescribir source_class_id/target_class_id de las relaciones. Ninguna fila pasa por Python.
+
+_CREATE_MAP = """
+    CREATE TEMP TABLE clone_class_map (
+        old_id uuid PRIMARY KEY,
+        new_id uuid NOT NULL
+    ) ON COMMIT DROP
+"""
+
+_COPY_PROJECT = """
+    INSERT INTO projects (id, name, description, user_id, diagram_data, created_at, updated_at, is_deleted)
+    SELECT :new_project_id, :name, description, :user_id, diagram_data, now(), now(), false
+    FROM projects
+    WHERE id = :source_project_id
+"""
+
+_FILL_MAP = """
+    INSERT INTO clone_class_map (old_id, new_id)
+    SELECT id, uuid_generate_v4()
+    FROM classes
+    WHERE project_id = :source_project_id AND is_deleted = false
+"""
+
+_COPY_CLASSES = """
+    INSERT INTO classes (id, project_id, name, stereotype, attributes, methods, position, created_at, updated_at, is_deleted)
+    SELECT m.new_id, :new_project_id, c.name, c.stereotype, c.attributes, c.methods, c.position, now(), now(), false
+    FROM classes c
+    JOIN clone_class_map m ON m.old_id = c.id
+    WHERE c.project_id = :source_project_id
+"""
+
+_COPY_RELATIONSHIPS = """
+    INSERT INTO relationships (id, project_id, source_class_id, target_class_id, relationship_type,
+                               source_multiplicity, target_multiplicity, label, created_at, updated_at, is_deleted)
+    SELECT uuid_generate_v4(), :new_project_id, source_map.new_id, target_map.new_id, r.relationship_type,
+           r.source_multiplicity, r.target_multiplicity, r.label, now(), now(), false
+    FROM relationships r
+    JOIN clone_class_map source_map ON source_map.old_id = r.source_class_id
+    JOIN clone_class_map target_map ON target_map.old_id = r.target_class_id
+    WHERE r.project_id = :source_project_id AND r.is_deleted = false
+"""
+
+
+def clone_project(source_project_id, user_id, name):
+    """Copia el proyecto con sus clases y relaciones en la transaccion actual. No hace commit."""
+    params = {
+        "source_project_id": source_project_id,
+        "new_project_id": uuid.uuid4(),
+        "user_id": user_id,
+        "name": name,
+    }
+    session = db.session
+    session.execute(text(_CREATE_MAP))
+    session.execute(text(_COPY_PROJECT), params)
+    session.execute(text(_FILL_MAP), params)
+    classes = session.execute(text(_COPY_CLASSES), params).rowcount
+    relationships = session.execute(text(_COPY_RELATIONSHIPS), params).rowcount
+    return params["new_project_id"], classes, relationships
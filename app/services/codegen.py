@@ -0,0 +1,483 @@
+import keyword
+import os
+import re
+import shutil
+import threading
+import uuid
+import zipfile
+
+from app.services.pubsub import pubsub
+
+# Motor de generacion de codigo a partir del diagrama de clases de un proyecto.
+#
+# El modelo se carga una sola vez en estructuras simples (sin sesiones de SQLAlchemy) y cada
+# generador produce archivos (nombre, texto). El zip se escribe en streaming: cada archivo se
+# comprime y se entrega en trozos sin armar el archivo completo en memoria, y a la vez se
+# guarda en disco para que las descargas siguientes de la misma version no cuesten nada.
+
+TARGETS = ("java", "python", "sql")
+
+INHERITANCE_TYPES = {"inheritance", "generalization", "herencia", "generalizacion"}
+REALIZATION_TYPES = {"realization", "implementation", "realizacion", "implementacion"}
+
+JAVA_TYPES = {
+    "int": "int", "integer": "Integer", "long": "long", "float": "float", "double": "double",
+    "decimal": "java.math.BigDecimal", "bool": "boolean", "boolean": "boolean", "string": "String",
+    "str": "String", "char": "char", "date": "java.time.LocalDate", "datetime": "java.time.LocalDateTime",
+    "void": "void",
+}
+
+PYTHON_TYPES = {
+    "int": "int", "integer": "int", "long": "int", "float": "float", "double": "float",
+    "decimal": "Decimal", "bool": "bool", "boolean": "bool", "string": "str", "str": "str",
+    "char": "str", "date": "date", "datetime": "datetime", "void": "None",
+}
+
+SQL_TYPES = {
+    "int": "INTEGER", "integer": "INTEGER", "long": "BIGINT", "float": "REAL", "double": "DOUBLE PRECISION",
+    "decimal": "NUMERIC", "bool": "BOOLEAN", "boolean": "BOOLEAN", "string": "TEXT", "str": "TEXT",
+    "char": "CHAR(1)", "date": "DATE", "datetime": "TIMESTAMP",
+}
+
+# Palabras reservadas de Java (incluidos los literales y las restringidas como var o record)
+JAVA_RESERVED = {
+    "abstract", "assert", "boolean", "break", "byte", "case", "catch", "char", "class", "const",
+    "continue", "default", "do", "double", "else", "enum", "extends", "final", "finally", "float",
+    "for", "goto", "if", "implements", "import", "instanceof", "int", "interface", "long", "native",
+    "new", "package", "private", "protected", "public", "return", "short", "static", "strictfp",
+    "super", "switch", "synchronized", "this", "throw", "throws", "transient", "try", "void",
+    "volatile", "while", "true", "false", "null", "var", "record", "yield", "sealed", "permits",
+}
+# Nombres que el codigo generado usa sin importar: una clase del diagrama que se llame asi los
+# ocultaria (o chocaria con el import en Python)
+JAVA_SHADOWED = {"Object", "String", "Integer", "Class", "List", "UnsupportedOperationException"}
+PYTHON_SHADOWED = {"object", "date", "datetime", "Decimal"}
+CLASS_RESERVED = JAVA_RESERVED | JAVA_SHADOWED | set(keyword.kwlist) | PYTHON_SHADOWED
+# _snake ya evita las palabras clave; self es el primer parametro de los metodos
+PYTHON_MEMBER_RESERVED = {"self"}
+
+JAVA_VISIBILITY = {"public": "public", "+": "public", "private": "private", "-": "private",
+                   "protected": "protected", "#": "protected", "package": "", "~": ""}
+
+
+def _identifier(name, fallback="Elemento"):
+    cleaned = re.sub(r"\W+", "_", str(name or "").strip()).strip("_")
+    if not cleaned:
+        cleaned = fallback
+    if cleaned[0].isdigit():
+        cleaned = f"_{cleaned}"
+    return cleaned
+
+
+def _snake(name):
+    snake = re.sub(r"(?<!^)(?=[A-Z])", "_", _identifier(name)).lower()
+    return f"{snake}_" if keyword.iskeyword(snake) else snake
+
+
+def _safe(name, reserved):
+    return f"{name}_" if name in reserved else name
+
+
+def _java_member(name, fallback, used):
+    return _unique(_safe(_identifier(name, fallback), JAVA_RESERVED), used)
+
+
+def _python_member(name, used):
+    return _unique(_safe(_snake(name), PYTHON_MEMBER_RESERVED), used)
+
+
+def _unique(name, used):
+    unique, suffix = name, 2
+    while unique in used:
+        unique, suffix = f"{name}_{suffix}", suffix + 1
+    used.add(unique)
+    return unique
+
+
+def _is_many(multiplicity):
+    return bool(multiplicity) and ("*" in multiplicity or "n" in multiplicity.lower())
+
+
+class DiagramModel:
+    """Vista en memoria de un proyecto: clases por id y relaciones clasificadas."""
+
+    def __init__(self, project_name, classes, relationships):
+        self.project_name = project_name
+        self.classes = {}
+        used_names, used_modules = set(), set()
+        for item in classes:
+            # Los nombres de archivo/tabla deben ser unicos aunque el diagrama repita nombres, sin
+            # distinguir mayusculas y tambien en snake_case (FooBar y foo_bar son el mismo modulo)
+            name = _safe(_identifier(item["name"], "Clase"), CLASS_RESERVED)
+            unique, suffix = name, 2
+            while unique.lower() in used_names or _snake(unique) in used_modules:
+                unique, suffix = f"{name}{suffix}", suffix + 1
+            used_names.add(unique.lower())
+            used_modules.add(_snake(unique))
+            self.classes[item["id"]] = dict(item, identifier=unique, module=_snake(unique))
+
+        self.parents = {}
+        self.interfaces = {}
+        self.associations = []
+        for rel in relationships:
+            source, target = rel["source_class_id"], rel["target_class_id"]
+            if source not in self.classes or target not in self.classes:
+                continue
+            kind = (rel["relationship_type"] or "").lower()
+            if kind in INHERITANCE_TYPES:
+                self.parents.setdefault(source, target)
+            elif kind in REALIZATION_TYPES:
+                self.interfaces.setdefault(source, []).append(target)
+            else:
+                self.associations.append(rel)
+
+    def name(self, class_id):
+        return self.classes[class_id]["identifier"]
+
+    def module(self, class_id):
+        return self.classes[class_id]["module"]
+
+    def outgoing(self, class_id):
+        """Asociaciones navegables desde la clase: (nombre_campo, clase_destino, es_coleccion)."""
+        for rel in self.associations:
+            if rel["source_class_id"] == class_id:
+                target = rel["target_class_id"]
+                field = rel.get("label") or self.name(target)
+                yield _identifier(field), target, _is_many(rel.get("target_multiplicity"))
+
+
+# --- Generadores ---
+
+def _java_type(raw):
+    raw = (raw or "Object").strip()
+    return JAVA_TYPES.get(raw.lower(), _safe(_identifier(raw, "Object"), JAVA_RESERVED))
+
+
+def _java_default(java_type):
+    if java_type == "boolean":
+        return "false"
+    if java_type == "char":
+        return "'\\0'"
+    if java_type in ("int", "long", "float", "double"):
+        return "0"
+    return "null"
+
+
+def generate_java(model):
+    for class_id, item in model.classes.items():
+        name = item["identifier"]
+        is_interface = (item.get("stereotype") or "").lower() in ("interface", "interfaz")
+        is_abstract = not is_interface and any(method.get("isAbstract") and not method.get("isStatic") for method in item.get("methods") or [])
+        kind = "interface" if is_interface else "abstract class" if is_abstract else "class"
+        header = f"public {kind} {name}"
+        if class_id in model.parents:
+            header += f" extends {model.name(model.parents[class_id])}"
+        if class_id in model.interfaces:
+            header += " implements " + ", ".join(model.name(target) for target in model.interfaces[class_id])
+
+        # Una interfaz no tiene estado: solo se emiten los atributos estaticos, como constantes
+        # inicializadas, y se omiten los atributos de instancia y los campos de asociacion.
+        associations = [] if is_interface else list(model.outgoing(class_id))
+        lines = []
+        if associations:
+            lines += ["import java.util.List;", ""]
+        lines.append(header + " {")
+
+        # Atributos y campos de asociacion comparten espacio de nombres: los repetidos llevan sufijo
+        fields = set()
+        for attr in item.get("attributes") or []:
+            attr_type = _java_type(attr.get("type"))
+            if is_interface and not attr.get("isStatic"):
+                continue
+            attr_name = _java_member(attr.get("name"), "atributo", fields)
+            if is_interface:
+                if attr.get("isStatic"):
+                    lines.append(f"    {attr_type} {attr_name} = {_java_default(attr_type)};")
+                continue
+            modifiers = [
+                JAVA_VISIBILITY.get((attr.get("visibility") or "private").lower(), "private"),
+                "static" if attr.get("isStatic") else "",
+                attr_type,
+                attr_name,
+            ]
+            lines.append("    " + " ".join(filter(None, modifiers)) + ";")
+        for field, target, many in associations:
+            field_type = f"List<{model.name(target)}>" if many else model.name(target)
+            lines.append(f"    private {field_type} {_java_member(field[0].lower() + field[1:], 'campo', fields)};")
+
+        for method in item.get("methods") or []:
+            is_static = bool(method.get("isStatic"))
+            # En una interfaz los metodos son publicos; solo los estaticos llevan cuerpo
+            declared_only = (is_interface and not is_static) or (not is_interface and not is_static and method.get("isAbstract"))
+            visibility = "public" if is_interface else JAVA_VISIBILITY.get((method.get("visibility") or "public").lower(), "public")
+            modifiers = " ".join(filter(None, [
+                visibility,
+                "static" if is_static else "",
+                "abstract" if declared_only and not is_interface else "",
+            ]))
+            param_names = set()
+            params = ", ".join(
+                f"{_java_type(param.get('type'))} {_java_member(param.get('name'), f'arg{index}', param_names)}"
+                for index, param in enumerate(method.get("parameters") or [])
+            )
+            return_type = _java_type(method.get("returnType") or "void")
+            method_name = _safe(_identifier(method.get("name"), "metodo"), JAVA_RESERVED)
+            signature = "    " + " ".join(filter(None, [modifiers, return_type, method_name])) + f"({params})"
+            if declared_only:
+                lines.append(f"{signature};")
+            else:
+                body = "" if return_type == "void" else "        throw new UnsupportedOperationException();\n"
+                lines.append(f"{signature} {{\n{body}    }}")
+
+        lines.append("}")
+        yield f"java/{name}.java", "\n".join(lines) + "\n"
+
+
+def _python_type(raw, model_names):
+    raw = (raw or "").strip()
+    if raw in model_names:
+        return f'"{raw}"'
+    return PYTHON_TYPES.get(raw.lower(), "object")
+
+
+def generate_python(model):
+    names = {item["identifier"] for item in model.classes.values()}
+    for class_id, item in model.classes.items():
+        name = item["identifier"]
+        base = model.name(model.parents[class_id]) if class_id in model.parents else None
+        lines = ["from __future__ import annotations", "", "from datetime import date, datetime", "from decimal import Decimal", ""]
+        if base:
+            lines += [f"from .{model.module(model.parents[class_id])} import {base}", ""]
+        lines += ["", f"class {name}({base or 'object'}):"]
+
+        # Atributos, campos de asociacion y metodos comparten los nombres de la clase: los
+        # repetidos llevan sufijo (un metodo con el nombre de un atributo lo ocultaria)
+        members = set()
+        statics, instance = [], []
+        for attr in item.get("attributes") or []:
+            entry = (_python_member(attr.get("name"), members), _python_type(attr.get("type"), names))
+            (statics if attr.get("isStatic") else instance).append(entry)
+        associations = [(_python_member(field, members), many) for field, _, many in model.outgoing(class_id)]
+        for attr_name, attr_type in statics:
+            lines.append(f"    {attr_name}: {attr_type} = None")
+
+        init_params = ["self"] + [f"{attr_name}: {attr_type} = None" for attr_name, attr_type in instance]
+        lines.append(f"    def __init__({', '.join(init_params)}):")
+        body = ["super().__init__()"] if base else []
+        body += [f"self.{attr_name} = {attr_name}" for attr_name, _ in instance]
+        body += [f"self.{field} = {'[]' if many else 'None'}" for field, many in associations]
+        lines += [f"        {statement}" for statement in body or ["pass"]]
+
+        for method in item.get("methods") or []:
+            param_names = {"self"}
+            params = [f"{_python_member(param.get('name') or f'arg{index}', param_names)}: {_python_type(param.get('type'), names)}"
+                      for index, param in enumerate(method.get("parameters") or [])]
+            returns = _python_type(method.get("returnType") or "void", names)
+            method_name = _python_member(method.get("name"), members)
+            lines.append("")
+            if method.get("isStatic"):
+                lines += ["    @staticmethod", f"    def {method_name}({', '.join(params)}) -> {returns}:"]
+            else:
+                lines.append(f"    def {method_name}({', '.join(['self'] + params)}) -> {returns}:")
+            lines.append("        raise NotImplementedError")
+
+        yield f"python/{item['module']}.py", "\n".join(lines) + "\n"
+
+    exports = "\n".join(f"from .{item['module']} import {item['identifier']}" for item in model.classes.values())
+    yield "python/__init__.py", exports + "\n"
+
+
+def _quote(identifier):
+    # Siempre entre comillas: los nombres de clase suelen ser palabras reservadas (user, order)
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def generate_sql(model):
+    project_name = " ".join(str(model.project_name or "").split())
+    statements = [f"-- Esquema generado para el proyecto {project_name}", ""]
+    # Las FKs de asociaciones se agregan al final con ALTER TABLE: asi el orden de creacion
+    # de las tablas no importa, aunque haya asociaciones circulares.
+    foreign_keys = []
+    join_tables = []
+    tables = {class_id: item["module"] for class_id, item in model.classes.items()}
+    table_names = set(tables.values())
+    columns = {}
+
+    for class_id, item in model.classes.items():
+        table = tables[class_id]
+        used = columns[table] = {"id"}
+        definitions = ["    id BIGSERIAL PRIMARY KEY"]
+        if class_id in model.parents:
+            # Herencia tabla-por-clase: el hijo comparte la clave primaria del padre
+            definitions[0] = "    id BIGINT PRIMARY KEY"
+            foreign_keys.append((table, "id", tables[model.parents[class_id]], "ON DELETE CASCADE", False))
+
+        for attr in item.get("attributes") or []:
+            column = _snake(attr.get("name"))
+            # Un atributo "id" lo cubre la clave primaria; los nombres repetidos se omiten
+            if attr.get("isStatic") or column in used:
+                continue
+            used.add(column)
+            definitions.append(f"    {_quote(column)} {SQL_TYPES.get((attr.get('type') or '').lower(), 'TEXT')}")
+
+        statements.append(f"CREATE TABLE {_quote(table)} (\n" + ",\n".join(definitions) + "\n);\n")
+
+    # Varias asociaciones entre las mismas dos clases producen una sola FK o tabla intermedia
+    links = set()
+    for rel in model.associations:
+        source = tables[rel["source_class_id"]]
+        target = tables[rel["target_class_id"]]
+        many_source = _is_many(rel.get("source_multiplicity"))
+        many_target = _is_many(rel.get("target_multiplicity"))
+        if many_source and many_target:
+            key = ("join",) + tuple(sorted((source, target)))
+        elif many_target:
+            # Uno a muchos: la FK va en la tabla del lado "muchos"
+            key = ("fk", target, source)
+        else:
+            key = ("fk", source, target)
+        if key in links:
+            continue
+        links.add(key)
+
+        if key[0] == "join":
+            join_tables.append((source, target))
+        else:
+            _, table, referenced = key
+            column = _unique(f"{referenced}_id", columns[table])
+            foreign_keys.append((table, column, referenced, "", True))
+
+    for left, right in join_tables:
+        table = _unique(f"{left}_{right}", table_names)
+        if left == right:
+            left_column, right_column = "source_id", "target_id"
+        else:
+            left_column, right_column = f"{left}_id", f"{right}_id"
+        statements.append(
+            f"CREATE TABLE {_quote(table)} (\n"
+            f"    {_quote(left_column)} BIGINT NOT NULL,\n"
+            f"    {_quote(right_column)} BIGINT NOT NULL,\n"
+            f"    PRIMARY KEY ({_quote(left_column)}, {_quote(right_column)})\n);\n"
+        )
+        foreign_keys.append((table, left_column, left, "ON DELETE CASCADE", False))
+        foreign_keys.append((table, right_column, right, "ON DELETE CASCADE", False))
+
+    for table, column, referenced, action, add_column in foreign_keys:
+        if add_column:
+            statements.append(f"ALTER TABLE {_quote(table)} ADD COLUMN {_quote(column)} BIGINT;")
+        statements.append(
+            f"ALTER TABLE {_quote(table)} ADD FOREIGN KEY ({_quote(column)}) REFERENCES {_quote(referenced)} (id) {action}".rstrip() + ";"
+        )
+
+    yield "sql/schema.sql", "\n".join(statements) + "\n"
+
+
+GENERATORS = {"java": generate_java, "python": generate_python, "sql": generate_sql}
+
+
+# --- Zip en streaming con cache en disco ---
+
+class _ChunkWriter:
+    """Destino no posicionable para zipfile: acumula lo escrito hasta que se drena."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_zip(files, chunk_size=64 * 1024):
+    """Genera los bytes de un zip a partir de un iterable de (nombre, texto)."""
+    writer = _ChunkWriter()
+    with zipfile.ZipFile(writer, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in files:
+            data = content.encode("utf-8")
+            with archive.open(name, mode="w") as entry:
+                for start in range(0, len(data), chunk_size):
+                    entry.write(data[start:start + chunk_size])
+                    chunk = writer.drain()
+                    if chunk:
+                        yield chunk
+            chunk = writer.drain()
+            if chunk:
+                yield chunk
+    chunk = writer.drain()
+    if chunk:
+        yield chunk
+
+
+class ExportCache:
+    """Archivos generados en disco, uno por (proyecto, version, objetivos)."""
+
+    def __init__(self):
+        self.directory = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.directory = app.config["CODEGEN_CACHE_DIR"]
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path(self, project_id, version, targets):
+        return os.path.join(self.directory, str(project_id), f"{version}-{'-'.join(targets)}.zip")
+
+    def lookup(self, project_id, version, targets):
+        path = self.path(project_id, version, targets)
+        return path if os.path.exists(path) else None
+
+    def stream_and_store(self, project_id, version, targets, chunks):
+        """
+        Entrega los trozos del zip al cliente y los escribe a un temporal; solo si el zip se
+        completa se publica en la cache (rename atomico) y se borran las versiones anteriores.
+        """
+        final_path = self.path(project_id, version, targets)
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        temp_path = f"{final_path}.{uuid.uuid4().hex}.tmp"
+        completed = False
+        try:
+            with open(temp_path, "wb") as handle:
+                for chunk in chunks:
+                    handle.write(chunk)
+                    yield chunk
+            os.replace(temp_path, final_path)
+            completed = True
+            self._prune(project_id, keep=os.path.basename(final_path), version=version)
+        finally:
+            if not completed and os.path.exists(temp_path):
+                os.unlink(temp_path)
+
+    def _prune(self, project_id, keep, version):
+        directory = os.path.join(self.directory, str(project_id))
+        with self._lock:
+            for name in os.listdir(directory):
+                if name.endswith(".zip") and name != keep and not name.startswith(f"{version}-"):
+                    try:
+                        os.unlink(os.path.join(directory, name))
+                    except FileNotFoundError:
+                        pass
+
+    def invalidate(self, project_id):
+        shutil.rmtree(os.path.join(self.directory, str(project_id)), ignore_errors=True)
+
+
+export_cache = ExportCache()
+
+
+@pubsub.subscribe("project.deleted")
+def _on_project_deleted(data):
+    if export_cache.directory:
+        export_cache.invalidate(data["projectId"])
+
+
+def build_files(model, targets):
+    for target in targets:
+        yield from GENERATORS[target](model)
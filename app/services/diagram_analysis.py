@@ -0,0 +1,226 @@
+import threading
+from collections import OrderedDict, defaultdict
+
+from app.services.pubsub import pubsub
+
+# Analisis estructural del diagrama: indice de adyacencia, ciclos de herencia, aristas
+# colgantes o duplicadas, clases huerfanas y metricas (profundidad de herencia, acoplamiento).
+# Todo se calcula en O(V+E) a partir de tuplas simples, asi sirve igual para las filas de la
+# BD que para el cuerpo que llega a save_project_data antes de escribirlo.
+
+# Aristas hijo -> padre; se recorren para los ciclos y la profundidad de herencia
+HIERARCHY_TYPES = {"inheritance", "generalization", "extends", "realization", "implementation", "implements"}
+
+VALIDATION_MODES = ("off", "warn", "strict")
+
+SEVERITY_ERROR = "error"
+SEVERITY_WARNING = "warning"
+SEVERITY_INFO = "info"
+
+
+class DiagramIndex:
+    """Indice de adyacencia construido en una sola pasada sobre las relaciones."""
+
+    def __init__(self, classes, relationships):
+        self.names = {}
+        for class_id, name in classes:
+            self.names[str(class_id)] = name
+        self.outgoing = defaultdict(list)
+        self.incoming = defaultdict(list)
+        self.parents = defaultdict(list)
+        self.children = defaultdict(list)
+        self.dangling = []
+        self.duplicates = []
+        self.edges = 0
+
+        seen = {}
+        for rel_id, source, target, rel_type in relationships:
+            self.edges += 1
+            rel_id, source, target = str(rel_id), str(source), str(target)
+            rel_type = (rel_type or "association").lower()
+            missing = [end for end, ref in (("source", source), ("target", target)) if ref not in self.names]
+            if missing:
+                self.dangling.append((rel_id, source, target, rel_type, missing))
+                continue
+            key = (source, target, rel_type)
+            if key in seen:
+                self.duplicates.append((rel_id, seen[key], source, target, rel_type))
+                continue
+            seen[key] = rel_id
+            self.outgoing[source].append((target, rel_type, rel_id))
+            self.incoming[target].append((source, rel_type, rel_id))
+            if rel_type in HIERARCHY_TYPES:
+                self.parents[source].append(target)
+                self.children[target].append(source)
+
+    def name(self, class_id):
+        return self.names.get(class_id, class_id)
+
+
+def find_hierarchy_cycles(index):
+    """DFS iterativa con tres colores sobre las aristas de herencia; devuelve cada ciclo una vez."""
+    white, gray, black = 0, 1, 2
+    color = dict.fromkeys(index.names, white)
+    cycles = []
+
+    for root in index.names:
+        if color[root] != white:
+            continue
+        color[root] = gray
+        path = [root]
+        stack = [iter(index.parents.get(root, ()))]
+        while stack:
+            parent = next(stack[-1], None)
+            if parent is None:
+                color[path.pop()] = black
+                stack.pop()
+                continue
+            if color[parent] == gray:
+                cycles.append(path[path.index(parent):] + [parent])
+            elif color[parent] == white:
+                color[parent] = gray
+                path.append(parent)
+                stack.append(iter(index.parents.get(parent, ())))
+    return cycles
+
+
+def inheritance_depths(index, cyclic):
+    """Profundidad de herencia (DIT) de cada clase; las clases dentro de un ciclo quedan en None."""
+    depths = {}
+    for start in index.names:
+        if start in depths:
+            continue
+        # Orden posterior iterativo: la profundidad de una clase es 1 + la de su padre mas profundo
+        stack = [(start, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if node in depths:
+                continue
+            if node in cyclic:
+                depths[node] = None
+                continue
+            parents = index.parents.get(node, ())
+            if expanded:
+                parent_depths = [depths.get(parent) for parent in parents]
+                depths[node] = None if None in parent_depths else 1 + max(parent_depths, default=-1)
+                continue
+            stack.append((node, True))
+            stack.extend((parent, False) for parent in parents if parent not in depths)
+    return depths
+
+
+def analyze(classes, relationships):
+    """
+    classes: iterable de (id, nombre); relationships: iterable de (id, origen, destino, tipo).
+    Devuelve un dict serializable con los problemas encontrados y las metricas.
+    """
+    index = DiagramIndex(classes, relationships)
+    issues = []
+
+    cycles = find_hierarchy_cycles(index)
+    cyclic = {node for cycle in cycles for node in cycle}
+    for cycle in cycles:
+        issues.append({
+            "type": "inheritance_cycle",
+            "severity": SEVERITY_ERROR,
+            "classIds": cycle[:-1],
+            "message": "Ciclo de herencia: " + " -> ".join(index.name(node) for node in cycle),
+        })
+
+    for rel_id, source, target, rel_type, missing in index.dangling:
+        issues.append({
+            "type": "dangling_relationship",
+            "severity": SEVERITY_ERROR,
+            "relationshipId": rel_id,
+            "missing": missing,
+            "message": f"La relacion {rel_type} {rel_id} apunta a clases inexistentes ({', '.join(missing)}).",
+        })
+
+    for rel_id, original_id, source, target, rel_type in index.duplicates:
+        issues.append({
+            "type": "duplicate_relationship",
+            "severity": SEVERITY_WARNING,
+            "relationshipId": rel_id,
+            "duplicateOf": original_id,
+            "message": f"Relacion {rel_type} duplicada entre {index.name(source)} y {index.name(target)}.",
+        })
+
+    depths = inheritance_depths(index, cyclic)
+    metrics = {}
+    for class_id in index.names:
+        outgoing = {target for target, _, _ in index.outgoing.get(class_id, ()) if target != class_id}
+        incoming = {source for source, _, _ in index.incoming.get(class_id, ()) if source != class_id}
+        if not outgoing and not incoming:
+            issues.append({
+                "type": "orphan_class",
+                "severity": SEVERITY_INFO,
+                "classId": class_id,
+                "message": f"La clase {index.name(class_id)} no participa en ninguna relacion.",
+            })
+        metrics[class_id] = {
+            "name": index.name(class_id),
+            "depthOfInheritance": depths.get(class_id),
+            "children": len(index.children.get(class_id, ())),
+            "fanIn": len(incoming),
+            "fanOut": len(outgoing),
+            "coupling": len(outgoing | incoming),
+        }
+
+    known_depths = [metric["depthOfInheritance"] for metric in metrics.values() if metric["depthOfInheritance"] is not None]
+    couplings = [metric["coupling"] for metric in metrics.values()]
+    return {
+        "valid": not any(issue["severity"] == SEVERITY_ERROR for issue in issues),
+        "summary": {
+            "classes": len(index.names),
+            "relationships": index.edges,
+            "errors": sum(issue["severity"] == SEVERITY_ERROR for issue in issues),
+            "warnings": sum(issue["severity"] == SEVERITY_WARNING for issue in issues),
+            "maxDepthOfInheritance": max(known_depths, default=0),
+            "averageCoupling": round(sum(couplings) / len(couplings), 3) if couplings else 0,
+            "maxCoupling": max(couplings, default=0),
+        },
+        "issues": issues,
+        "metrics": metrics,
+    }
+
+
+class AnalysisCache:
+    """Resultados por (proyecto, version) en memoria del worker, con expulsion LRU."""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.max_entries = app.config["ANALYSIS_CACHE_SIZE"]
+
+    def get(self, project_id, version):
+        with self._lock:
+            key = (str(project_id), version)
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+            return result
+
+    def put(self, project_id, version, result):
+        with self._lock:
+            # Una version nueva deja obsoletas las anteriores del mismo proyecto
+            for key in [key for key in self._entries if key[0] == str(project_id)]:
+                del self._entries[key]
+            self._entries[(str(project_id), version)] = result
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, project_id):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == str(project_id)]:
+                del self._entries[key]
+
+
+analysis_cache = AnalysisCache()
+
+
+@pubsub.subscribe("project.deleted")
+def _on_project_deleted(data):
+    analysis_cache.invalidate(data["projectId"])
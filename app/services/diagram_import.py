@@ -0,0 +1,534 @@
+import io
+import re
+import time
+import uuid
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from http import HTTPStatus
+
+from sqlalchemy import insert, select, update
+
+from app.database import db
+from app.errors.errors import GenericError
+from app.models import Class, Relationship
+
+# Importacion en streaming de diagramas de clases (XMI de UML 2.x y PlantUML).
+#
+# Los parsers recorren la entrada de forma incremental y producen eventos ("class", ...) y
+# ("relationship", ...). El importador inserta las clases por lotes a medida que llegan; de
+# cada clase solo conserva el mapeo referencia-externa -> UUID, y las relaciones (tuplas
+# pequeñas) se insertan al final porque pueden apuntar a clases que aparecen despues. Asi la
+# memoria depende del numero de elementos, no del tamaño del documento.
+
+IMPORT_FORMATS = ("xmi", "plantuml")
+
+# Distribucion inicial en rejilla (el endpoint de layout puede recalcularla despues)
+GRID_COLUMNS = 20
+GRID_WIDTH = 260
+GRID_HEIGHT = 200
+
+VISIBILITY_SYMBOLS = {"+": "public", "-": "private", "#": "protected", "~": "package"}
+
+
+def _bad_request(message):
+    return GenericError(HTTPStatus.BAD_REQUEST, HTTPStatus.BAD_REQUEST.phrase, message)
+
+
+# --- XMI ---
+
+def _local(tag):
+    return tag.rsplit("}", 1)[-1] if isinstance(tag, str) else ""
+
+
+def _attr(elem, name):
+    """Atributo sin importar el prefijo de espacio de nombres (xmi:id, {ns}id, id)."""
+    if name in elem.attrib:
+        return elem.attrib[name]
+    suffix = "}" + name
+    for key, value in elem.attrib.items():
+        if key.endswith(suffix):
+            return value
+    return None
+
+
+def _uml_type(elem):
+    value = _attr(elem, "type") or ""
+    return value.split(":", 1)[-1] if ":" in value else value
+
+
+def _bound(elem, child_name):
+    for child in elem:
+        if _local(child.tag) == child_name:
+            value = _attr(child, "value")
+            if value in ("-1", "*"):
+                return "*"
+            return value if value is not None else ("0" if child_name == "lowerValue" else None)
+    return None
+
+
+def _multiplicity(elem):
+    lower, upper = _bound(elem, "lowerValue"), _bound(elem, "upperValue")
+    if lower is None and upper is None:
+        return None
+    if lower == upper or lower is None:
+        return upper
+    if upper is None:
+        return lower
+    return f"{lower}..{upper}"
+
+
+def _type_ref(elem):
+    """Devuelve (idref, nombre) del tipo de una propiedad o parametro."""
+    ref = elem.attrib.get("type")
+    if ref:
+        return ref, None
+    for child in elem:
+        if _local(child.tag) == "type":
+            href = child.attrib.get("href") or _attr(child, "idref")
+            if href and "#" in href:
+                return None, href.rsplit("#", 1)[-1]
+            return href, None
+    return None, None
+
+
+def _type_value(type_id, type_name, type_names):
+    # Un idref que aun no se conoce (clase declarada mas adelante) lo resuelve el importador
+    if type_name or type_id is None:
+        return type_name
+    return type_names.get(type_id) or {"$ref": type_id}
+
+
+CLASSIFIER_TYPES = {"Class", "Interface", "Enumeration", "AssociationClass"}
+DATATYPE_TYPES = {"PrimitiveType", "DataType"}
+CONTAINER_TAGS = {"packagedElement", "ownedMember", "nestedClassifier"}
+
+
+def parse_xmi(stream):
+    """Genera eventos a partir de un documento XMI leyendolo con iterparse."""
+    type_names = {}
+    property_types = {}  # propiedad que es extremo de asociacion -> (dueño, tipo, multiplicidad, agregacion)
+    associations = []
+    stack = []
+
+    for event, elem in ET.iterparse(stream, events=("start", "end")):
+        if event == "start":
+            stack.append(elem)
+            continue
+
+        stack.pop()
+        tag = _local(elem.tag)
+        kind = _uml_type(elem)
+        handled = False
+
+        if tag in CONTAINER_TAGS and kind in CLASSIFIER_TYPES:
+            yield ("class", _parse_xmi_class(elem, kind, type_names, property_types))
+            for event_item in _parse_xmi_class_relations(elem):
+                yield event_item
+            handled = True
+        elif tag in CONTAINER_TAGS and kind in DATATYPE_TYPES:
+            type_names[_attr(elem, "id")] = elem.attrib.get("name")
+            handled = True
+        elif tag in CONTAINER_TAGS and kind == "Association":
+            ends = {}
+            for child in elem:
+                if _local(child.tag) == "ownedEnd":
+                    ends[_attr(child, "id")] = (None, child.attrib.get("type") or _type_ref(child)[0],
+                                                _multiplicity(child), child.attrib.get("aggregation"))
+            member_ends = (elem.attrib.get("memberEnd") or "").split()
+            associations.append((member_ends or list(ends), ends, elem.attrib.get("name")))
+            handled = True
+        elif tag in CONTAINER_TAGS and kind in ("Dependency", "Usage", "Realization", "InterfaceRealization"):
+            client, supplier = elem.attrib.get("client"), elem.attrib.get("supplier")
+            if client and supplier:
+                relation = "realization" if "Realization" in kind else "dependency"
+                yield ("relationship", {"source": client, "target": supplier, "type": relation, "label": elem.attrib.get("name")})
+            handled = True
+
+        if handled:
+            # Se libera el subarbol ya procesado para que la memoria no crezca con el documento
+            elem.clear()
+            if stack:
+                stack[-1].remove(elem)
+
+    yield ("types", type_names)
+
+    for member_ends, owned, name in associations:
+        resolved = [owned.get(end) or property_types.get(end) for end in member_ends[:2]]
+        if len(resolved) < 2 or None in resolved:
+            yield ("relationship", {"source": None, "target": None, "type": "association"})
+            continue
+        (_, first_type, first_mult, first_aggregation), (_, second_type, second_mult, second_aggregation) = resolved
+        aggregation = first_aggregation if first_aggregation not in (None, "none") else second_aggregation
+        relation = {"composite": "composition", "shared": "aggregation"}.get(aggregation, "association")
+        yield ("relationship", {
+            # El extremo con agregacion es la parte; la relacion va del todo a la parte
+            "source": second_type if first_aggregation in ("composite", "shared") else first_type,
+            "target": first_type if first_aggregation in ("composite", "shared") else second_type,
+            "type": relation,
+            "sourceMultiplicity": second_mult if first_aggregation in ("composite", "shared") else first_mult,
+            "targetMultiplicity": first_mult if first_aggregation in ("composite", "shared") else second_mult,
+            "label": name,
+        })
+
+
+def _parse_xmi_class(elem, kind, type_names, property_types):
+    class_id = _attr(elem, "id")
+    attributes, methods = [], []
+
+    for child in elem:
+        child_tag = _local(child.tag)
+        if child_tag == "ownedAttribute":
+            type_id, type_name = _type_ref(child)
+            if child.attrib.get("association"):
+                property_types[_attr(child, "id")] = (class_id, type_id, _multiplicity(child), child.attrib.get("aggregation"))
+                continue
+            attributes.append({
+                "name": child.attrib.get("name", ""),
+                "type": _type_value(type_id, type_name, type_names),
+                "visibility": child.attrib.get("visibility", "private"),
+                "isStatic": child.attrib.get("isStatic") == "true",
+            })
+        elif child_tag == "ownedOperation":
+            return_type, parameters = "void", []
+            for param in child:
+                if _local(param.tag) != "ownedParameter":
+                    continue
+                type_id, type_name = _type_ref(param)
+                resolved = _type_value(type_id, type_name, type_names)
+                if param.attrib.get("direction") == "return":
+                    return_type = resolved or "void"
+                else:
+                    parameters.append({"name": param.attrib.get("name", ""), "type": resolved})
+            methods.append({
+                "name": child.attrib.get("name", ""),
+                "returnType": return_type,
+                "parameters": parameters,
+                "visibility": child.attrib.get("visibility", "public"),
+                "isStatic": child.attrib.get("isStatic") == "true",
+                "isAbstract": child.attrib.get("isAbstract") == "true",
+            })
+        elif child_tag == "ownedLiteral":
+            attributes.append({"name": child.attrib.get("name", ""), "type": None, "visibility": "public", "isStatic": True})
+
+    stereotype = {"Interface": "interface", "Enumeration": "enumeration"}.get(kind)
+    if elem.attrib.get("isAbstract") == "true" and not stereotype:
+        stereotype = "abstract"
+    return {"ref": class_id, "name": elem.attrib.get("name") or "ClaseSinNombre",
+            "stereotype": stereotype, "attributes": attributes, "methods": methods}
+
+
+def _parse_xmi_class_relations(elem):
+    class_id = _attr(elem, "id")
+    for child in elem:
+        child_tag = _local(child.tag)
+        if child_tag == "generalization" and child.attrib.get("general"):
+            yield ("relationship", {"source": class_id, "target": child.attrib["general"], "type": "inheritance"})
+        elif child_tag == "interfaceRealization":
+            target = child.attrib.get("contract") or child.attrib.get("supplier")
+            if target:
+                yield ("relationship", {"source": class_id, "target": target, "type": "realization"})
+
+
+# --- PlantUML ---
+
+PLANTUML_CLASS = re.compile(
+    r'^(?P<kind>abstract\s+class|abstract|class|interface|enum|entity)\s+'
+    r'(?:"(?P<quoted>[^"]+)"|(?P<name>[\w.$]+))(?:<[^>]*>)?'
+    r'(?:\s+as\s+(?P<alias>[\w.$]+))?\s*(?:<<\s*(?P<stereotype>[^>]+?)\s*>>)?\s*(?P<brace>\{)?\s*(?P<close>\})?\s*$'
+)
+PLANTUML_RELATION = re.compile(
+    r'^(?:"(?P<lq>[^"]+)"|(?P<left>[\w.$]+))\s*(?:"(?P<lmult>[^"]*)")?\s*'
+    r'(?P<arrow>[<|o*#x+}]*[-.]+(?:(?:up|down|left|right|u|d|l|r)[-.]+)?[>|o*#x+{]*)\s*'
+    r'(?:"(?P<rmult>[^"]*)")?\s*(?:"(?P<rq>[^"]+)"|(?P<right>[\w.$]+))\s*(?::\s*(?P<label>.*))?$'
+)
+PLANTUML_MEMBER_MODIFIERS = re.compile(r"\{(static|classifier|abstract)\}\s*")
+
+
+def _plantuml_member(line):
+    modifiers = set(PLANTUML_MEMBER_MODIFIERS.findall(line))
+    line = PLANTUML_MEMBER_MODIFIERS.sub("", line).strip()
+    visibility = None
+    if line and line[0] in VISIBILITY_SYMBOLS:
+        visibility, line = VISIBILITY_SYMBOLS[line[0]], line[1:].strip()
+    is_static = bool(modifiers & {"static", "classifier"})
+
+    if "(" in line and ")" in line:
+        head, rest = line.split("(", 1)
+        params_text, tail = rest.rsplit(")", 1)
+        head = head.strip().split()
+        name = head[-1] if head else ""
+        return_type = tail.strip().lstrip(":").strip() or (head[-2] if len(head) > 1 else "void")
+        parameters = []
+        for raw in filter(None, (part.strip() for part in params_text.split(","))):
+            if ":" in raw:
+                param_name, param_type = (piece.strip() for piece in raw.split(":", 1))
+            else:
+                pieces = raw.split()
+                param_type, param_name = (pieces[0], pieces[-1]) if len(pieces) > 1 else (None, pieces[0])
+            parameters.append({"name": param_name, "type": param_type})
+        return "method", {"name": name, "returnType": return_type, "parameters": parameters,
+                          "visibility": visibility or "public", "isStatic": is_static,
+                          "isAbstract": "abstract" in modifiers}
+
+    if ":" in line:
+        name, attr_type = (piece.strip() for piece in line.split(":", 1))
+    else:
+        pieces = line.split()
+        attr_type, name = (pieces[0], pieces[-1]) if len(pieces) > 1 else (None, line)
+    return "attribute", {"name": name, "type": attr_type, "visibility": visibility or "private", "isStatic": is_static}
+
+
+def _plantuml_relation(match):
+    left = match.group("lq") or match.group("left")
+    right = match.group("rq") or match.group("right")
+    arrow = re.sub(r"(up|down|left|right|u|d|l|r)", "", match.group("arrow"))
+    dotted = "." in arrow
+    lmult, rmult = match.group("lmult"), match.group("rmult")
+    # Los marcadores "<" y ">" de la etiqueta solo indican el sentido de lectura
+    label = (match.group("label") or "").strip().strip("<>").strip() or None
+
+    def relation(source, target, kind, source_mult, target_mult):
+        return {"source": source, "target": target, "type": kind, "label": label,
+                "sourceMultiplicity": source_mult, "targetMultiplicity": target_mult}
+
+    if arrow.startswith("<|"):
+        return relation(right, left, "realization" if dotted else "inheritance", rmult, lmult)
+    if arrow.endswith("|>"):
+        return relation(left, right, "realization" if dotted else "inheritance", lmult, rmult)
+    for symbol, kind in (("*", "composition"), ("o", "aggregation")):
+        if arrow.startswith(symbol):
+            return relation(left, right, kind, lmult, rmult)
+        if arrow.endswith(symbol):
+            return relation(right, left, kind, rmult, lmult)
+    kind = "dependency" if dotted else "association"
+    if arrow.startswith("<") and not arrow.endswith(">"):
+        return relation(right, left, kind, rmult, lmult)
+    return relation(left, right, kind, lmult, rmult)
+
+
+def parse_plantuml(lines):
+    """Genera eventos a partir de un diagrama PlantUML leido linea por linea."""
+    declared = set()
+    current = None
+    in_note = False
+
+    for raw_line in lines:
+        line = raw_line.strip()
+        if in_note:
+            in_note = not line.startswith("end note")
+            continue
+        if line.startswith("note"):
+            # Las notas de varias lineas terminan en "end note"; las de una linea llevan ":"
+            in_note = ":" not in line
+            continue
+        if not line or line.startswith(("'", "@", "skinparam", "hide ", "show ", "package", "namespace", "together")) \
+                or (line == "}" and current is None):
+            continue
+
+        if current is not None:
+            if line.startswith("}"):
+                yield ("class", current)
+                current = None
+            elif not line.startswith(("--", "..", "==", "__")):
+                member_kind, member = _plantuml_member(line)
+                if member["name"]:
+                    current["attributes" if member_kind == "attribute" else "methods"].append(member)
+            continue
+
+        match = PLANTUML_CLASS.match(line)
+        if match:
+            name = match.group("quoted") or match.group("name")
+            ref = match.group("alias") or name
+            kind = match.group("kind").split()[0]
+            stereotype = match.group("stereotype") or {"abstract": "abstract", "interface": "interface", "enum": "enumeration"}.get(kind)
+            item = {"ref": ref, "name": name.split(".")[-1], "stereotype": stereotype, "attributes": [], "methods": []}
+            declared.add(ref)
+            if match.group("brace") and not match.group("close"):
+                current = item
+            else:
+                yield ("class", item)
+            continue
+
+        match = PLANTUML_RELATION.match(line)
+        if match:
+            relation = _plantuml_relation(match)
+            # PlantUML crea implicitamente las clases que solo aparecen en relaciones
+            for ref in (relation["source"], relation["target"]):
+                if ref not in declared:
+                    declared.add(ref)
+                    yield ("class", {"ref": ref, "name": ref.split(".")[-1], "stereotype": None, "attributes": [], "methods": []})
+            yield ("relationship", relation)
+
+    if current is not None:
+        yield ("class", current)
+
+
+# --- Escritura por lotes ---
+
+class DiagramImporter:
+    """Inserta los eventos de un parser en lotes dentro de la transaccion actual."""
+
+    def __init__(self, project, batch_size):
+        self.project = project
+        self.batch_size = batch_size
+        self.class_ids = {}
+        self.names = {}
+        self.pending_classes = []
+        self.relationships = []
+        self.unresolved_rows = set()
+        self.classes_count = 0
+        self.relationships_count = 0
+        self.skipped_relationships = 0
+        self.insert_seconds = 0.0
+        self.timestamp = datetime.now(timezone.utc)
+
+    def run(self, events):
+        started = time.perf_counter()
+        for kind, payload in events:
+            if kind == "class":
+                self._add_class(payload)
+            elif kind == "relationship":
+                self.relationships.append(payload)
+            elif kind == "types":
+                self.names.update({ref: name for ref, name in payload.items() if ref not in self.names})
+        self._flush_classes()
+        self._insert_relationships()
+        self._fix_type_references()
+        total = time.perf_counter() - started
+        return {
+            "classes": self.classes_count,
+            "relationships": self.relationships_count,
+            "skippedRelationships": self.skipped_relationships,
+            "parseSeconds": round(total - self.insert_seconds, 4),
+            "insertSeconds": round(self.insert_seconds, 4),
+            "totalSeconds": round(total, 4),
+            "classesPerSecond": round(self.classes_count / total) if total else None,
+        }
+
+    def _add_class(self, payload):
+        if payload["ref"] in self.class_ids:
+            return
+        class_id = uuid.uuid4()
+        self.class_ids[payload["ref"]] = class_id
+        self.names[payload["ref"]] = payload["name"]
+        index = self.classes_count
+        self.classes_count += 1
+        self.pending_classes.append({
+            "id": class_id,
+            "project_id": self.project.id,
+            "name": payload["name"],
+            "stereotype": payload.get("stereotype"),
+            "attributes": payload.get("attributes", []),
+            "methods": payload.get("methods", []),
+            "position": {"x": (index % GRID_COLUMNS) * GRID_WIDTH, "y": (index // GRID_COLUMNS) * GRID_HEIGHT},
+            "created_at": self.timestamp,
+            "updated_at": self.timestamp,
+            "is_deleted": False,
+        })
+        if len(self.pending_classes) >= self.batch_size:
+            self._flush_classes()
+
+    def _flush_classes(self):
+        if not self.pending_classes:
+            return
+        for row in self.pending_classes:
+            if not _resolve_members(row, self.names, final=False):
+                self.unresolved_rows.add(row["id"])
+        started = time.perf_counter()
+        db.session.execute(insert(Class), self.pending_classes)
+        self.insert_seconds += time.perf_counter() - started
+        self.pending_classes = []
+
+    def _fix_type_references(self):
+        """Resuelve los tipos que apuntaban a clases declaradas despues de su lote."""
+        if not self.unresolved_rows:
+            return
+        started = time.perf_counter()
+        ids = list(self.unresolved_rows)
+        for offset in range(0, len(ids), self.batch_size):
+            chunk = ids[offset:offset + self.batch_size]
+            rows = db.session.execute(
+                select(Class.id, Class.attributes, Class.methods)
+                .where(Class.project_id == self.project.id, Class.id.in_(chunk))
+            ).all()
+            changes = []
+            for row in rows:
+                item = {"project_id": self.project.id, "id": row.id, "attributes": row.attributes, "methods": row.methods}
+                _resolve_members(item, self.names, final=True)
+                changes.append(item)
+            db.session.execute(update(Class), changes)
+        self.insert_seconds += time.perf_counter() - started
+
+    def _insert_relationships(self):
+        batch = []
+        for payload in self.relationships:
+            source = self.class_ids.get(payload.get("source"))
+            target = self.class_ids.get(payload.get("target"))
+            if not (source and target):
+                self.skipped_relationships += 1
+                continue
+            batch.append({
+                "id": uuid.uuid4(),
+                "project_id": self.project.id,
+                "source_class_id": source,
+                "target_class_id": target,
+                "relationship_type": payload["type"],
+                "source_multiplicity": payload.get("sourceMultiplicity"),
+                "target_multiplicity": payload.get("targetMultiplicity"),
+                "label": payload.get("label"),
+                "created_at": self.timestamp,
+                "updated_at": self.timestamp,
+                "is_deleted": False,
+            })
+            if len(batch) >= self.batch_size:
+                self._insert_relationship_batch(batch)
+                batch = []
+        self._insert_relationship_batch(batch)
+        self.relationships = []
+
+    def _insert_relationship_batch(self, batch):
+        if not batch:
+            return
+        started = time.perf_counter()
+        db.session.execute(insert(Relationship), batch)
+        self.insert_seconds += time.perf_counter() - started
+        self.relationships_count += len(batch)
+
+
+def _resolve_type(value, names, final):
+    """Los tipos sin resolver llegan como {"$ref": id}; devuelve (valor, resuelto)."""
+    if not isinstance(value, dict) or "$ref" not in value:
+        return value, True
+    ref = value["$ref"]
+    if ref in names:
+        return names[ref], True
+    return (ref, True) if final else (value, False)
+
+
+def _resolve_members(row, names, final):
+    resolved = True
+    for attr in row["attributes"] or []:
+        attr["type"], ok = _resolve_type(attr.get("type"), names, final)
+        resolved = resolved and ok
+    for method in row["methods"] or []:
+        method["returnType"], ok = _resolve_type(method.get("returnType"), names, final)
+        resolved = resolved and ok
+        for param in method.get("parameters", []):
+            param["type"], ok = _resolve_type(param.get("type"), names, final)
+            resolved = resolved and ok
+    return resolved
+
+
+def import_diagram(project, stream, import_format, batch_size):
+    """Parsea la entrada en streaming y la inserta en el proyecto. No hace commit."""
+    if import_format == "xmi":
+        events = parse_xmi(stream)
+    elif import_format == "plantuml":
+        events = parse_plantuml(io.TextIOWrapper(stream, encoding="utf-8", errors="replace"))
+    else:
+        raise _bad_request(f"Formato no soportado: {import_format}. Usa: {', '.join(IMPORT_FORMATS)}.")
+
+    try:
+        return DiagramImporter(project, batch_size).run(events)
+    except ET.ParseError as err:
+        raise _bad_request(f"XMI mal formado: {err}")
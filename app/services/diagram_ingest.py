@@ -0,0 +1,207 @@
+import json
+from http import HTTPStatus
+
+from app.errors.errors import GenericError
+
+try:
+    import orjson
+except ImportError:  # el decodificador de la biblioteca estandar sigue funcionando, solo es mas lento
+    orjson = None
+
+# Ingesta del cuerpo de save_project_data, por etapas de coste creciente:
+#   1. tamaño: Content-Length (o lo leido, si llega por trozos) contra SAVE_MAX_BYTES, sin parsear
+#   2. cota de elementos: cada objeto JSON abre con '{', asi que contar ese byte (en C, sin
+#      parsear) acota el numero de objetos; las llaves dentro de textos solo la hacen mas estricta
+#   3. parseo con orjson (o json si no esta instalado) directamente desde los bytes
+#   4. validacion de una pasada contra el esquema compilado abajo; los errores se reportan por
+#      indice ("classes[12].position.x") y se para al llegar a MAX_REPORTED_ERRORS
+# Un cuerpo malo cuesta en proporcion a lo lejos que llega antes de fallar.
+
+MAX_REPORTED_ERRORS = 20
+
+_MISSING = object()
+
+_TEXT = (str,)
+_ID = (str, int)
+_NUMBER = (int, float)
+_LIST = (list,)
+_OBJECT = (dict,)
+_OPTIONAL_TEXT = (str, type(None))
+_OPTIONAL_MULTIPLICITY = (str, int, type(None))
+_OPTIONAL_LIST = (list, type(None))
+
+TYPE_NAMES = {
+    _TEXT: "texto",
+    _ID: "texto o numero",
+    _NUMBER: "numero",
+    _LIST: "lista",
+    _OBJECT: "objeto",
+    _OPTIONAL_TEXT: "texto o null",
+    _OPTIONAL_MULTIPLICITY: "texto, numero o null",
+    _OPTIONAL_LIST: "lista o null",
+}
+
+# campo -> (tipos aceptados, obligatorio). Los campos que no aparecen se conservan sin validar
+# en diagram_data, como hasta ahora. Las columnas NOT NULL no aceptan null: si el campo falta,
+# replace_diagram usa su valor por defecto (name "ClaseSinNombre", listas vacias, posicion 0,0),
+# salvo relationshipType, que no tiene uno razonable y es obligatorio.
+CLASS_SCHEMA = {
+    "id": (_ID, True),
+    "name": (_TEXT, False),
+    "stereotype": (_OPTIONAL_TEXT, False),
+    "attributes": (_LIST, False),
+    "methods": (_LIST, False),
+    "position": (_OBJECT, False),
+}
+
+RELATIONSHIP_SCHEMA = {
+    "id": (_ID, False),
+    "sourceClassId": (_ID, True),
+    "targetClassId": (_ID, True),
+    "relationshipType": (_TEXT, True),
+    "sourceMultiplicity": (_OPTIONAL_MULTIPLICITY, False),
+    "targetMultiplicity": (_OPTIONAL_MULTIPLICITY, False),
+    "label": (_OPTIONAL_TEXT, False),
+}
+
+MEMBER_SCHEMA = {
+    "name": (_OPTIONAL_TEXT, False),
+    "type": (_OPTIONAL_TEXT, False),
+    "returnType": (_OPTIONAL_TEXT, False),
+    "visibility": (_OPTIONAL_TEXT, False),
+    "parameters": (_OPTIONAL_LIST, False),
+}
+
+
+def _compile(schema):
+    # Lista de tuplas en lugar de dict: el bucle caliente solo desempaqueta, sin busquedas extra
+    return tuple((field, types, required, TYPE_NAMES[types]) for field, (types, required) in schema.items())
+
+
+_CLASS_FIELDS = _compile(CLASS_SCHEMA)
+_RELATIONSHIP_FIELDS = _compile(RELATIONSHIP_SCHEMA)
+_MEMBER_FIELDS = _compile(MEMBER_SCHEMA)
+
+
+class PayloadError(GenericError):
+    """Error de ingesta con la lista de problemas por posicion."""
+
+    def __init__(self, status, message, errors=None):
+        super().__init__(status, status.phrase, message)
+        self.errors = errors or []
+
+
+class _TooManyErrors(Exception):
+    pass
+
+
+class _Collector:
+    def __init__(self):
+        self.errors = []
+
+    def add(self, path, message):
+        self.errors.append({"path": path, "message": message})
+        if len(self.errors) >= MAX_REPORTED_ERRORS:
+            raise _TooManyErrors()
+
+
+def _object_errors(item, fields):
+    """Problemas de un objeto como [(campo, mensaje)]; vacio si es valido (el caso comun, sin asignar nada)."""
+    if not isinstance(item, dict):
+        return [(None, "debe ser un objeto")]
+    problems = None
+    for field, types, required, type_name in fields:
+        value = item.get(field, _MISSING)
+        if value is _MISSING:
+            if required:
+                problems = problems or []
+                problems.append((field, "es obligatorio"))
+        elif not isinstance(value, types) or value is True or value is False:
+            # bool es subclase de int: true/false no cuentan como numero ni como id
+            problems = problems or []
+            problems.append((field, f"debe ser {type_name}"))
+    return problems or ()
+
+
+def _report(errors, path, problems):
+    # Las rutas ("classes[3].methods[1]") solo se construyen cuando hay un error
+    for field, message in problems:
+        errors.add(path() if field is None else f"{path()}.{field}", message)
+
+
+def _check_members(members, path, errors):
+    for index, member in enumerate(members):
+        problems = _object_errors(member, _MEMBER_FIELDS)
+        if problems:
+            _report(errors, lambda: f"{path()}[{index}]", problems)
+            continue
+        for param_index, param in enumerate(member.get("parameters") or ()):
+            problems = _object_errors(param, _MEMBER_FIELDS)
+            if problems:
+                _report(errors, lambda: f"{path()}[{index}].parameters[{param_index}]", problems)
+
+
+def _check_class(item, index, errors):
+    path = lambda: f"classes[{index}]"  # noqa: E731
+    problems = _object_errors(item, _CLASS_FIELDS)
+    if problems:
+        _report(errors, path, problems)
+        return
+    position = item.get("position")
+    if position is not None:
+        for axis in ("x", "y"):
+            value = position.get(axis, 0)
+            if not isinstance(value, _NUMBER) or value is True or value is False:
+                errors.add(f"{path()}.position.{axis}", "debe ser numero")
+    for key in ("attributes", "methods"):
+        members = item.get(key)
+        if members:
+            _check_members(members, lambda: f"{path()}.{key}", errors)
+
+
+def read_body(request, max_bytes):
+    """Lee el cuerpo sin pasar de max_bytes (aunque el cliente no envie Content-Length)."""
+    if request.content_length is not None and request.content_length > max_bytes:
+        raise PayloadError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"El diagrama supera el limite de {max_bytes} bytes.")
+    body = request.stream.read(max_bytes + 1)
+    if len(body) > max_bytes:
+        raise PayloadError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"El diagrama supera el limite de {max_bytes} bytes.")
+    return body
+
+
+def parse_save_payload(body, max_classes, max_relationships, max_objects):
+    """Devuelve el diagrama ya validado o lanza PayloadError en la primera etapa que falle."""
+    if not body:
+        raise PayloadError(HTTPStatus.BAD_REQUEST, "El cuerpo de la solicitud esta vacio.")
+
+    if body.count(b"{") > max_objects:
+        raise PayloadError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"El diagrama tiene demasiados elementos (limite {max_objects} objetos).")
+
+    try:
+        data = orjson.loads(body) if orjson is not None else json.loads(body)
+    except ValueError as err:
+        raise PayloadError(HTTPStatus.BAD_REQUEST, f"JSON invalido: {err}")
+
+    if not (isinstance(data, dict) and isinstance(data.get("classes"), list) and isinstance(data.get("relationships"), list)):
+        raise PayloadError(HTTPStatus.BAD_REQUEST, "El cuerpo de la solicitud debe contener las listas 'classes' y 'relationships'.")
+
+    classes, relationships = data["classes"], data["relationships"]
+    if len(classes) > max_classes or len(relationships) > max_relationships:
+        raise PayloadError(
+            HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+            f"El diagrama supera el limite de {max_classes} clases o {max_relationships} relaciones.",
+        )
+
+    errors = _Collector()
+    try:
+        for index, item in enumerate(classes):
+            _check_class(item, index, errors)
+        for index, item in enumerate(relationships):
+            problems = _object_errors(item, _RELATIONSHIP_FIELDS)
+            if problems:
+                _report(errors, lambda: f"relationships[{index}]", problems)
+    except _TooManyErrors:
+        pass
+    if errors.errors:
+        raise PayloadError(HTTPStatus.BAD_REQUEST, "El diagrama tiene campos con tipos invalidos.", errors.errors)
+    return data
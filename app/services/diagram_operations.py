@@ -0,0 +1,280 @@
+import uuid
+from datetime import datetime, timezone
+from http import HTTPStatus
+
+from app.database import db
+from app.errors.errors import GenericError
+from app.models import Class, Relationship
+
+# Operaciones granulares que un cliente puede aplicar sobre un diagrama sin reenviar
+# el proyecto completo. Cada operacion es {"type": "<entidad>.<accion>", "data": {...}}
+# y usa los mismos nombres camelCase que el frontend envia a save_project_data.
+
+CLASS_FIELDS = {
+    "name": "name",
+    "stereotype": "stereotype",
+    "attributes": "attributes",
+    "methods": "methods",
+    "position": "position",
+}
+
+RELATIONSHIP_FIELDS = {
+    "sourceClassId": "source_class_id",
+    "targetClassId": "target_class_id",
+    "relationshipType": "relationship_type",
+    "sourceMultiplicity": "source_multiplicity",
+    "targetMultiplicity": "target_multiplicity",
+    "label": "label",
+}
+
+# campo -> (tipos aceptados, descripcion). name, relationshipType, attributes, methods y
+# position son columnas NOT NULL: un null se rechaza aqui con 400 y no al volcar a la BD.
+_NULL = type(None)
+FIELD_TYPES = {
+    "name": ((str,), "texto"),
+    "stereotype": ((str, _NULL), "texto o null"),
+    "attributes": ((list,), "lista"),
+    "methods": ((list,), "lista"),
+    "position": ((dict,), "objeto"),
+    "relationshipType": ((str,), "texto"),
+    "sourceMultiplicity": ((str, int, _NULL), "texto, numero o null"),
+    "targetMultiplicity": ((str, int, _NULL), "texto, numero o null"),
+    "label": ((str, _NULL), "texto o null"),
+}
+
+OPERATION_TYPES = (
+    "class.create",
+    "class.update",
+    "class.delete",
+    "relationship.create",
+    "relationship.update",
+    "relationship.delete",
+)
+
+
+def _bad_request(message):
+    return GenericError(HTTPStatus.BAD_REQUEST, HTTPStatus.BAD_REQUEST.phrase, message)
+
+
+def _parse_uuid(value, field):
+    try:
+        return uuid.UUID(str(value))
+    except (TypeError, ValueError):
+        raise _bad_request(f"El campo '{field}' debe ser un UUID valido.")
+
+
+def _check_types(data):
+    for key, value in data.items():
+        if key not in FIELD_TYPES:
+            continue
+        types, type_name = FIELD_TYPES[key]
+        # bool es subclase de int: true/false no cuentan como numero
+        if not isinstance(value, types) or isinstance(value, bool):
+            raise _bad_request(f"El campo '{key}' debe ser {type_name}.")
+    position = data.get("position")
+    if position is not None:
+        for axis in ("x", "y"):
+            value = position.get(axis, 0)
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                raise _bad_request(f"El campo 'position.{axis}' debe ser numero.")
+
+
+def normalize_operation(operation):
+    """Valida la forma de una operacion y devuelve (tipo, data) listos para aplicar."""
+    if not isinstance(operation, dict):
+        raise _bad_request("La operacion debe ser un objeto JSON.")
+
+    op_type = operation.get("type")
+    if op_type not in OPERATION_TYPES:
+        raise _bad_request(f"Tipo de operacion no soportado: {op_type}")
+
+    data = operation.get("data")
+    if not isinstance(data, dict):
+        raise _bad_request("La operacion debe incluir un objeto 'data'.")
+
+    entity, action = op_type.split(".")
+    fields = CLASS_FIELDS if entity == "class" else RELATIONSHIP_FIELDS
+
+    normalized = {key: value for key, value in data.items() if key in fields}
+    _check_types(normalized)
+    if action == "create":
+        # El cliente puede proponer el ID (para referenciarlo en operaciones siguientes)
+        normalized["id"] = _parse_uuid(data["id"], "id") if data.get("id") else uuid.uuid4()
+    else:
+        if "id" not in data:
+            raise _bad_request("La operacion debe indicar el 'id' del elemento.")
+        normalized["id"] = _parse_uuid(data["id"], "id")
+
+    for key in ("sourceClassId", "targetClassId"):
+        if key in normalized:
+            normalized[key] = _parse_uuid(normalized[key], key)
+
+    if entity == "relationship" and action == "create":
+        for key in ("sourceClassId", "targetClassId", "relationshipType"):
+            if not normalized.get(key):
+                raise _bad_request(f"El campo '{key}' es obligatorio para crear una relacion.")
+
+    return op_type, normalized
+
+
+def _get_class(project_id, class_id):
+    obj = Class.query.filter_by(id=class_id, project_id=project_id, is_deleted=False).one_or_none()
+    if not obj:
+        raise GenericError(HTTPStatus.NOT_FOUND, HTTPStatus.NOT_FOUND.phrase, f"Clase {class_id} no encontrada en el proyecto.")
+    return obj
+
+
+def _get_relationship(project_id, relationship_id):
+    obj = Relationship.query.filter_by(id=relationship_id, project_id=project_id, is_deleted=False).one_or_none()
+    if not obj:
+        raise GenericError(HTTPStatus.NOT_FOUND, HTTPStatus.NOT_FOUND.phrase, f"Relacion {relationship_id} no encontrada en el proyecto.")
+    return obj
+
+
+def _check_endpoints(project_id, data):
+    for key in ("sourceClassId", "targetClassId"):
+        if key in data:
+            _get_class(project_id, data[key])
+
+
+def apply_operation(project, op_type, data):
+    """
+    Aplica una operacion ya normalizada sobre las tablas relacionales del proyecto.
+    No hace commit: el llamador decide el limite de la transaccion.
+    """
+    entity, action = op_type.split(".")
+
+    if entity == "class":
+        if action == "create":
+            obj = Class(
+                id=data["id"],
+                project_id=project.id,
+                name=data.get("name", "ClaseSinNombre"),
+                stereotype=data.get("stereotype"),
+                attributes=data.get("attributes", []),
+                methods=data.get("methods", []),
+                position=data.get("position", {"x": 0, "y": 0}),
+            )
+            db.session.add(obj)
+        elif action == "update":
+            obj = _get_class(project.id, data["id"])
+            for key, column in CLASS_FIELDS.items():
+                if key in data:
+                    setattr(obj, column, data[key])
+        else:
+            obj = _get_class(project.id, data["id"])
+            # Las relaciones que apuntan a la clase se borran por la cascada del modelo
+            db.session.delete(obj)
+    else:
+        if action == "create":
+            _check_endpoints(project.id, data)
+            obj = Relationship(
+                id=data["id"],
+                project_id=project.id,
+                source_class_id=data["sourceClassId"],
+                target_class_id=data["targetClassId"],
+                relationship_type=data["relationshipType"],
+                source_multiplicity=data.get("sourceMultiplicity"),
+                target_multiplicity=data.get("targetMultiplicity"),
+                label=data.get("label"),
+            )
+            db.session.add(obj)
+        elif action == "update":
+            obj = _get_relationship(project.id, data["id"])
+            _check_endpoints(project.id, data)
+            for key, column in RELATIONSHIP_FIELDS.items():
+                if key in data:
+                    setattr(obj, column, data[key])
+        else:
+            obj = _get_relationship(project.id, data["id"])
+            db.session.delete(obj)
+
+    # Cualquier cambio granular cuenta como una nueva version del proyecto
+    project.updated_at = datetime.now(timezone.utc)
+    db.session.flush()
+
+
+def serialize_operation_data(data):
+    """Convierte los UUID de una operacion normalizada a texto para emitirla por JSON."""
+    return {key: str(value) if isinstance(value, uuid.UUID) else value for key, value in data.items()}
+
+
+def _row_id(value, taken):
+    """Id de la fila para un elemento del guardado completo: el del cliente si es un UUID libre."""
+    try:
+        row_id = value if isinstance(value, uuid.UUID) else uuid.UUID(str(value))
+    except (TypeError, ValueError, AttributeError):
+        return uuid.uuid4()
+    return uuid.uuid4() if row_id in taken else row_id
+
+
+def _upsert(model, existing, row_id, project_id, values):
+    obj = existing.get(row_id)
+    if obj is None:
+        db.session.add(model(id=row_id, project_id=project_id, **values))
+        return
+    # Solo se escribe lo que cambio: cada UPDATE toma una version de sincronizacion nueva
+    for column, value in dict(values, is_deleted=False).items():
+        if getattr(obj, column) != value:
+            setattr(obj, column, value)
+
+
+def replace_diagram(project, classes, relationships):
+    """
+    Reemplaza las clases y relaciones del proyecto por las de un guardado completo, emparejando
+    por id: las que siguen se actualizan en su lugar (solo si cambiaron), las nuevas se insertan
+    y el resto se borra. Asi el guardado solo deja lapidas y versiones nuevas en lo que de verdad
+    cambio. Devuelve (persistido, ignoradas): las clases y relaciones tal como quedaron, con los
+    ids de las filas, y las relaciones ignoradas por apuntar a clases que no estan. No hace commit.
+    """
+    existing_classes = {obj.id: obj for obj in Class.query.filter_by(project_id=project.id)}
+    existing_relationships = {obj.id: obj for obj in Relationship.query.filter_by(project_id=project.id)}
+
+    # ID del cliente -> ID de la fila, para resolver los extremos de las relaciones
+    class_ids, kept_classes = {}, set()
+    persisted = {"classes": [], "relationships": []}
+    for class_data in classes:
+        row_id = _row_id(class_data.get("id"), kept_classes)
+        kept_classes.add(row_id)
+        class_ids[str(class_data.get("id"))] = row_id
+        persisted["classes"].append(dict(class_data, id=str(row_id)))
+        _upsert(Class, existing_classes, row_id, project.id, {
+            "name": class_data.get("name", "ClaseSinNombre"),
+            "stereotype": class_data.get("stereotype"),
+            "attributes": class_data.get("attributes", []),
+            "methods": class_data.get("methods", []),
+            "position": class_data.get("position", {"x": 0, "y": 0}),
+        })
+    # Las clases nuevas deben existir antes que las relaciones que las referencian
+    db.session.flush()
+
+    relationship_ids, skipped = set(), []
+    for rel_data in relationships:
+        source_id = class_ids.get(str(rel_data.get("sourceClassId")))
+        target_id = class_ids.get(str(rel_data.get("targetClassId")))
+        if source_id is None or target_id is None:
+            skipped.append(rel_data)
+            continue
+        row_id = _row_id(rel_data.get("id"), relationship_ids)
+        relationship_ids.add(row_id)
+        persisted["relationships"].append(
+            dict(rel_data, id=str(row_id), sourceClassId=str(source_id), targetClassId=str(target_id))
+        )
+        _upsert(Relationship, existing_relationships, row_id, project.id, {
+            "source_class_id": source_id,
+            "target_class_id": target_id,
+            "relationship_type": rel_data.get("relationshipType"),
+            "source_multiplicity": rel_data.get("sourceMultiplicity"),
+            "target_multiplicity": rel_data.get("targetMultiplicity"),
+            "label": rel_data.get("label"),
+        })
+    db.session.flush()
+
+    # Lo que ya no esta en el diagrama se borra (cada borrado deja su lapida)
+    Relationship.query.filter(
+        Relationship.project_id == project.id, Relationship.id.notin_(relationship_ids)
+    ).delete(synchronize_session=False)
+    Class.query.filter(
+        Class.project_id == project.id, Class.id.notin_(kept_classes)
+    ).delete(synchronize_session=False)
+    return persisted, skipped
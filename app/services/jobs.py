@@ -0,0 +1,420 @@
+import logging
+import os
+import random
+import signal
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from http import HTTPStatus
+
+import click
+from flask import jsonify
+from flask.cli import AppGroup
+from sqlalchemy import delete, select, text, update
+from sqlalchemy.dialects.postgresql import insert
+
+from app.database import db
+from app.errors.errors import GenericError
+from app.models import Job
+from app.services.pubsub import pubsub
+
+logger = logging.getLogger(__name__)
+
+# Trabajos en segundo plano para lo que no cabe en una peticion (layout, importaciones, exportaciones,
+# miniaturas).
+#
+# La cola es la tabla 'jobs' de PostgreSQL, asi sobrevive a reinicios y la comparten todos los
+# procesos. Los modulos registran sus tipos con @job_runner.task(nombre, concurrency=...) y los
+# controladores encolan con job_runner.enqueue(...) y responden 202 con la URL de /api/jobs/<id>.
+#
+# Quien ejecuta:
+#   - JOB_EXECUTOR=thread: cada worker de gunicorn arranca un despachador con su primera peticion
+#     y ejecuta hasta JOB_WORKERS trabajos a la vez en hilos propios
+#   - JOB_EXECUTOR=off: la app solo encola; los ejecuta "flask --app wsgi jobs worker", que puede
+#     correr en otra maquina contra la misma base de datos (los archivos de importacion se dejan
+#     en JOB_SPOOL_DIR, que entonces tiene que ser compartido)
+#
+# Reserva: un proceso toma trabajos con FOR UPDATE SKIP LOCKED y los marca 'running' con una
+# reserva de JOB_LEASE_SECONDS que renueva mientras los ejecuta; si muere, al caducar la reserva
+# otro proceso los retoma. La concurrencia por tipo es global: se cuenta y se reserva con un
+# bloqueo consultivo por tipo. Un fallo inesperado se reintenta con espera exponencial hasta
+# max_attempts; un GenericError (proyecto borrado, archivo mal formado) falla sin reintentar.
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+MAX_BACKOFF_SECONDS = 3600
+CLEANUP_INTERVAL_SECONDS = 3600
+
+JobType = namedtuple("JobType", "name handler concurrency max_attempts backoff on_failure")
+ClaimedJob = namedtuple("ClaimedJob", "id job_type payload attempts max_attempts")
+
+
+def _parse_concurrency(value):
+    """'layout=2,import=1' -> {'layout': 2, 'import': 1}"""
+    limits = {}
+    for item in (value or "").split(","):
+        if "=" in item:
+            name, _, limit = item.partition("=")
+            limits[name.strip()] = int(limit)
+    return limits
+
+
+def serialize_job(job):
+    return {
+        "id": str(job.id),
+        "type": job.job_type,
+        "status": job.status,
+        "projectId": str(job.project_id) if job.project_id else None,
+        "attempts": job.attempts,
+        "maxAttempts": job.max_attempts,
+        "createdAt": job.created_at.isoformat(),
+        "runAt": job.run_at.isoformat(),
+        "startedAt": job.started_at.isoformat() if job.started_at else None,
+        "finishedAt": job.finished_at.isoformat() if job.finished_at else None,
+        "result": job.result,
+        "error": job.error,
+    }
+
+
+def job_accepted(job_id):
+    """Respuesta 202 de un endpoint que encolo un trabajo."""
+    status_url = f"/api/jobs/{job_id}"
+    return jsonify({"jobId": str(job_id), "status": QUEUED, "statusUrl": status_url}), HTTPStatus.ACCEPTED, {"Location": status_url}
+
+
+class JobRunner:
+    def __init__(self):
+        self.app = None
+        self.executor = "thread"
+        self.workers = 4
+        self.poll_interval = 1.0
+        self.lease = 120.0
+        self.shutdown_timeout = 10.0
+        self.retention = timedelta(days=7)
+        self.spool_dir = None
+        self._types = {}
+        self._limits = {}
+        self._only_types = None
+        self._running = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._pid = None
+        self._last_cleanup = 0.0
+
+    def init_app(self, app):
+        self.app = app
+        self.executor = app.config["JOB_EXECUTOR"]
+        self.workers = app.config["JOB_WORKERS"]
+        self.poll_interval = app.config["JOB_POLL_INTERVAL_SECONDS"]
+        self.lease = app.config["JOB_LEASE_SECONDS"]
+        self.shutdown_timeout = app.config["JOB_SHUTDOWN_TIMEOUT_SECONDS"]
+        self.retention = timedelta(days=app.config["JOB_RETENTION_DAYS"])
+        self.spool_dir = app.config["JOB_SPOOL_DIR"]
+        self._limits = _parse_concurrency(app.config["JOB_CONCURRENCY"])
+        os.makedirs(self.spool_dir, exist_ok=True)
+        app.cli.add_command(jobs_cli)
+
+    @property
+    def worker_id(self):
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    # --- Registro y encolado ---
+
+    def task(self, name, concurrency=1, max_attempts=3, backoff=5.0, on_failure=None):
+        """
+        Registra handler(payload) -> dict JSON con el resultado. on_failure(payload) se llama
+        cuando el trabajo falla definitivamente (p. ej. para borrar archivos temporales).
+        """
+        def decorator(func):
+            self._types[name] = JobType(name, func, concurrency, max_attempts, backoff, on_failure)
+            return func
+        return decorator
+
+    def concurrency(self, name):
+        return self._limits.get(name, self._types[name].concurrency)
+
+    def enqueue(self, job_type, payload, user_id=None, project_id=None, dedupe_key=None, delay=0):
+        """
+        Inserta el trabajo en su propia transaccion (no depende del commit de quien llama) y
+        devuelve su id. Con dedupe_key, si ya hay uno igual pendiente devuelve el existente.
+        Con delay (segundos) no se reserva antes de ese tiempo.
+        """
+        spec = self._types[job_type]
+        now = datetime.now(timezone.utc)
+        statement = insert(Job.__table__).values(
+            id=uuid.uuid4(), job_type=job_type, status=QUEUED, payload=payload, attempts=0,
+            max_attempts=spec.max_attempts, run_at=now + timedelta(seconds=delay), dedupe_key=dedupe_key,
+            user_id=user_id, project_id=project_id, created_at=now, updated_at=now, is_deleted=False,
+        ).returning(Job.__table__.c.id)
+        if dedupe_key is not None:
+            statement = statement.on_conflict_do_nothing(index_elements=["dedupe_key"], index_where=text("status = 'queued'"))
+
+        with self._transaction() as conn:
+            job_id = conn.execute(statement).scalar()
+            if job_id is not None:
+                inserted = True
+            else:
+                inserted = False
+                job_id = conn.execute(
+                    select(Job.__table__.c.id).where(Job.__table__.c.dedupe_key == dedupe_key, Job.__table__.c.status == QUEUED)
+                ).scalar()
+        if job_id is None:
+            # El pendiente se reservo entre el INSERT y la consulta: se encola otro
+            return self.enqueue(job_type, payload, user_id, project_id, dedupe_key, delay)
+
+        if inserted:
+            # Despierta a los despachadores de todos los workers sin esperar a su siguiente sondeo
+            pubsub.publish("job.enqueued", {"jobType": job_type})
+        return job_id
+
+    def spool(self, stream, max_bytes, chunk_size=1024 * 1024):
+        """Copia un cuerpo en streaming a JOB_SPOOL_DIR (sin pasar de max_bytes) y devuelve la ruta."""
+        fd, path = tempfile.mkstemp(dir=self.spool_dir, suffix=".upload")
+        written = 0
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                while True:
+                    chunk = stream.read(chunk_size)
+                    if not chunk:
+                        break
+                    written += len(chunk)
+                    if written > max_bytes:
+                        raise GenericError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, HTTPStatus.REQUEST_ENTITY_TOO_LARGE.phrase, f"El archivo supera el limite de {max_bytes} bytes.")
+                    handle.write(chunk)
+        except BaseException:
+            os.unlink(path)
+            raise
+        return path
+
+    # --- Ejecucion ---
+
+    def start(self):
+        """Arranca el despachador en el proceso actual (los hilos no sobreviven al fork de gunicorn)."""
+        if self.executor != "thread" or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._running = {}
+            self._stop = threading.Event()
+            threading.Thread(target=self._dispatch_loop, name="jobs-dispatcher", daemon=True).start()
+
+    def run(self, types=None, workers=None):
+        """Bucle del worker independiente: ejecuta trabajos hasta request_stop() y luego drena."""
+        unknown = set(types or ()) - set(self._types)
+        if unknown:
+            raise click.BadParameter(f"Tipos desconocidos: {', '.join(sorted(unknown))}. Disponibles: {', '.join(sorted(self._types))}.")
+        self._only_types = set(types) if types else None
+        self.workers = workers or self.workers
+        self._pid = os.getpid()
+        self._dispatch_loop()
+        self.stop(self.shutdown_timeout)
+
+    def wake(self):
+        """Adelanta el siguiente sondeo del despachador (hay trabajo nuevo o un hueco libre)."""
+        self._wake.set()
+
+    def request_stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def stop(self, timeout=None):
+        """
+        Deja de tomar trabajos y espera a los que estan en curso; los que no terminan a tiempo
+        vuelven a la cola sin gastar un intento (el proceso va a salir y sus hilos con el).
+        """
+        if self._pid != os.getpid():
+            return
+        self.request_stop()
+        deadline = time.monotonic() + (self.shutdown_timeout if timeout is None else timeout)
+        while self._running and time.monotonic() < deadline:
+            time.sleep(0.05)
+        with self._lock:
+            unfinished = list(self._running)
+        if unfinished:
+            with self._transaction() as conn:
+                conn.execute(
+                    update(Job.__table__)
+                    .where(Job.__table__.c.id.in_(unfinished), Job.__table__.c.locked_by == self.worker_id)
+                    .values(status=QUEUED, attempts=Job.__table__.c.attempts - 1, locked_by=None, locked_until=None,
+                            updated_at=datetime.now(timezone.utc))
+                )
+            logger.warning("%d trabajos sin terminar vuelven a la cola al parar el proceso", len(unfinished))
+
+    def _dispatch_loop(self):
+        last_heartbeat = 0.0
+        while not self._stop.is_set():
+            try:
+                now = time.monotonic()
+                if now - last_heartbeat >= self.lease / 3:
+                    self._heartbeat()
+                    last_heartbeat = now
+                if now - self._last_cleanup >= CLEANUP_INTERVAL_SECONDS:
+                    self._cleanup()
+                    self._last_cleanup = now
+                for job in self._claim():
+                    self._launch(job)
+            except Exception as err:
+                logger.exception("Error en el despachador de trabajos")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def _claim(self):
+        claimed = []
+        for name in self._types:
+            free = self.workers - len(self._running) - len(claimed)
+            if free <= 0:
+                break
+            if self._only_types is not None and name not in self._only_types:
+                continue
+            with self._transaction() as conn:
+                # Bloqueo por tipo hasta el commit: contar los que estan en curso y reservar es atomico entre procesos
+                conn.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": f"jobs:{name}"})
+                running = conn.execute(text(
+                    "SELECT count(*) FROM jobs WHERE job_type = :type AND status = 'running' AND locked_until > now()"
+                ), {"type": name}).scalar()
+                take = min(free, self.concurrency(name) - running)
+                if take <= 0:
+                    continue
+                # Los pendientes cuya hora llego y los que un proceso muerto dejo con la reserva caducada.
+                # La clave de deduplicacion se suelta: mientras este corre se puede encolar el siguiente.
+                rows = conn.execute(text("""
+                    UPDATE jobs SET status = 'running', attempts = attempts + 1, locked_by = :worker,
+                        locked_until = now() + make_interval(secs => :lease), started_at = now(),
+                        dedupe_key = NULL, updated_at = now()
+                    WHERE id IN (
+                        SELECT id FROM jobs
+                        WHERE job_type = :type
+                          AND ((status = 'queued' AND run_at <= now()) OR (status = 'running' AND locked_until <= now()))
+                        ORDER BY run_at
+                        LIMIT :take
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    RETURNING id, job_type, payload, attempts, max_attempts
+                """), {"type": name, "take": take, "worker": self.worker_id, "lease": self.lease}).all()
+            claimed.extend(ClaimedJob(*row) for row in rows)
+        return claimed
+
+    def _launch(self, job):
+        with self._lock:
+            self._running[job.id] = job.job_type
+        threading.Thread(target=self._execute, args=(job,), name=f"job-{job.job_type}", daemon=True).start()
+
+    def _execute(self, job):
+        spec = self._types[job.job_type]
+        started = time.perf_counter()
+        try:
+            if job.attempts > job.max_attempts:
+                self._fail(job, spec, "El proceso que ejecutaba el trabajo dejo de responder.")
+                return
+            with self.app.app_context():
+                try:
+                    result = spec.handler(job.payload)
+                except GenericError as err:
+                    db.session.rollback()
+                    self._fail(job, spec, err.message)
+                    return
+                except Exception as err:
+                    db.session.rollback()
+                    logger.exception("Error en el trabajo %s (%s), intento %d de %d", job.id, job.job_type, job.attempts, job.max_attempts)
+                    if job.attempts < job.max_attempts:
+                        self._retry(job, spec, err)
+                    else:
+                        self._fail(job, spec, f"{type(err).__name__}: {err}")
+                    return
+                finally:
+                    db.session.remove()
+            self._finish(job, status=SUCCEEDED, result=result, error=None)
+            logger.info("Trabajo %s (%s) terminado en %.3f s", job.id, job.job_type, time.perf_counter() - started)
+        except Exception as err:
+            logger.exception("No se pudo registrar el estado del trabajo %s", job.id)
+        finally:
+            with self._lock:
+                self._running.pop(job.id, None)
+            self._wake.set()
+
+    def _retry(self, job, spec, err):
+        delay = min(spec.backoff * 2 ** (job.attempts - 1), MAX_BACKOFF_SECONDS) * random.uniform(0.5, 1.0)
+        self._finish(job, status=QUEUED, error=f"{type(err).__name__}: {err}",
+                     run_at=datetime.now(timezone.utc) + timedelta(seconds=delay), finished_at=None)
+
+    def _fail(self, job, spec, message):
+        logger.warning("Trabajo %s (%s) fallido: %s", job.id, job.job_type, message)
+        self._finish(job, status=FAILED, error=message)
+        if spec.on_failure is not None:
+            try:
+                with self.app.app_context():
+                    spec.on_failure(job.payload)
+            except Exception as err:
+                logger.exception("Error al limpiar el trabajo fallido %s", job.id)
+
+    def _finish(self, job, **values):
+        now = datetime.now(timezone.utc)
+        values.setdefault("finished_at", now)
+        with self._transaction() as conn:
+            # Solo si la reserva sigue siendo nuestra: si caduco, otro proceso ya lo retomo
+            conn.execute(
+                update(Job.__table__)
+                .where(Job.__table__.c.id == job.id, Job.__table__.c.locked_by == self.worker_id)
+                .values(locked_by=None, locked_until=None, updated_at=now, **values)
+            )
+
+    def _heartbeat(self):
+        with self._lock:
+            job_ids = list(self._running)
+        if not job_ids:
+            return
+        with self._transaction() as conn:
+            conn.execute(text(
+                "UPDATE jobs SET locked_until = now() + make_interval(secs => :lease) "
+                "WHERE id = ANY(:ids) AND locked_by = :worker"
+            ), {"ids": job_ids, "lease": self.lease, "worker": self.worker_id})
+
+    def _cleanup(self):
+        cutoff = datetime.now(timezone.utc) - self.retention
+        with self._transaction() as conn:
+            conn.execute(delete(Job.__table__).where(
+                Job.__table__.c.status.in_((SUCCEEDED, FAILED)), Job.__table__.c.finished_at < cutoff
+            ))
+
+    @contextmanager
+    def _transaction(self):
+        # Conexion propia: el estado de la cola no se mezcla con la sesion de la peticion o del trabajo
+        with self.app.app_context():
+            with db.engine.begin() as conn:
+                yield conn
+
+
+job_runner = JobRunner()
+
+
+@pubsub.subscribe("job.enqueued")
+def _on_job_enqueued(data):
+    job_runner.wake()
+
+
+jobs_cli = AppGroup("jobs", help="Cola de trabajos en segundo plano.")
+
+
+@jobs_cli.command("worker")
+@click.option("--types", default="", help="Tipos a ejecutar separados por comas (por defecto todos).")
+@click.option("--workers", type=int, default=None, help="Trabajos a la vez (por defecto JOB_WORKERS).")
+def worker_command(types, workers):
+    """Ejecuta trabajos de la cola hasta recibir SIGINT o SIGTERM."""
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: job_runner.request_stop())
+    # Los avisos de trabajos nuevos llegan por el bus de eventos, como a los workers web
+    pubsub.start()
+    types = [item.strip() for item in types.split(",") if item.strip()]
+    logger.info("Worker de trabajos %s: tipos %s, %d a la vez", job_runner.worker_id, ", ".join(types) or "todos", workers or job_runner.workers)
+    job_runner.run(types, workers)
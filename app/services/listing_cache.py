@@ -0,0 +1,116 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from app.services.pubsub import pubsub
+
+# Cache por usuario de la respuesta de GET /api/projects/list.
+#
+# El listado es lo primero que pide cada carga del panel y solo cambia cuando el usuario crea,
+# guarda o elimina un proyecto. Se guarda el cuerpo JSON ya serializado junto con su ETag y la
+# fecha de ultima modificacion, asi un acierto no toca la base de datos ni vuelve a serializar, y
+# si el navegador ya tiene esa version se responde 304 sin cuerpo.
+#
+# Invalidacion: los eventos project.created / project.saved / project.deleted del bus llevan el
+# userId y borran su entrada en todos los workers (en el que publica, de forma sincrona antes de
+# responder). Una peticion que leyo la base de datos antes de una invalidacion no puede guardar su
+# resultado despues: cada lectura pide un testigo con begin() y put() solo lo acepta si nadie
+# invalido al usuario entre medias. Ademas, cada entrada caduca a los
+# PROJECT_LIST_CACHE_TTL_SECONDS y el total de cuerpos guardados no pasa de
+# PROJECT_LIST_CACHE_MAX_BYTES (expulsion LRU).
+
+# Testigos de lecturas en curso que se conservan como mucho; al pasar se descartan todos (solo
+# se pierde la oportunidad de guardar esas lecturas)
+MAX_PENDING_READS = 10000
+
+
+class ListingEntry:
+    __slots__ = ("body", "etag", "last_modified", "stored_at")
+
+    def __init__(self, body, last_modified, stored_at):
+        self.body = body
+        self.etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+        self.last_modified = last_modified
+        self.stored_at = stored_at
+
+
+class ListingCache:
+    """Respuestas del listado de proyectos por usuario en memoria del worker, con TTL y limite en bytes."""
+
+    def __init__(self, ttl=300.0, max_bytes=32 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.ttl = app.config["PROJECT_LIST_CACHE_TTL_SECONDS"]
+        self.max_bytes = app.config["PROJECT_LIST_CACHE_MAX_BYTES"]
+
+    @property
+    def enabled(self):
+        return self.ttl > 0 and self.max_bytes > 0
+
+    def get(self, user_id):
+        with self._lock:
+            key = str(user_id)
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry.stored_at >= self.ttl:
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def begin(self, user_id):
+        """Testigo que hay que pedir antes de leer la base de datos y pasar luego a put()."""
+        token = object()
+        with self._lock:
+            if len(self._pending) >= MAX_PENDING_READS:
+                self._pending.clear()
+            self._pending[str(user_id)] = token
+        return token
+
+    def put(self, user_id, token, body, last_modified):
+        entry = ListingEntry(body, last_modified, time.monotonic())
+        with self._lock:
+            key = str(user_id)
+            # Si hubo una invalidacion (o una lectura mas reciente) desde begin(), el cuerpo puede
+            # estar desactualizado: se devuelve al cliente pero no se guarda
+            if self._pending.get(key) is not token:
+                return entry
+            del self._pending[key]
+            if len(body) > self.max_bytes:
+                return entry
+            self._remove(key)
+            self._entries[key] = entry
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+        return entry
+
+    def invalidate(self, user_id):
+        with self._lock:
+            key = str(user_id)
+            self._pending.pop(key, None)
+            self._remove(key)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry.body)
+
+
+listing_cache = ListingCache()
+
+
+@pubsub.subscribe("project.created")
+@pubsub.subscribe("project.saved")
+@pubsub.subscribe("project.deleted")
+def _on_project_changed(data):
+    if data.get("userId"):
+        listing_cache.invalidate(data["userId"])
@@ -0,0 +1,239 @@
+import hmac
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, g, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.database import db
+
+# Instrumentacion por peticion y endpoint /metrics en formato de texto de Prometheus.
+#
+# Cada peticion acumula en flask.g sus sentencias SQL (contadas desde los eventos del Engine),
+# el tiempo de serializacion JSON y los tamaños de entrada/salida; al terminar se vuelcan en
+# histogramas por blueprint y ruta (la regla, no la URL, para no crear una serie por proyecto).
+# Los contadores son del proceso: con varios workers cada uno expone los suyos.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250, 1000)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+MAX_RECORDED_QUERIES = 200
+
+
+class Histogram:
+    """Histograma acumulativo con etiquetas; observe() es seguro entre hilos."""
+
+    def __init__(self, name, help_text, buckets, label_names):
+        self.name = name
+        self.help = help_text
+        self.buckets = buckets
+        self.label_names = label_names
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0, 0.0]
+            counts = series[0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            series[1] += 1
+            series[2] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(labels, list(counts), total, value) for labels, (counts, total, value) in self._series.items()]
+        for labels, counts, total, value in sorted(snapshot):
+            base = _labels(self.label_names, labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{base},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{base},le="+Inf"}} {total}')
+            lines.append(f"{self.name}_sum{{{base}}} {value:.6f}")
+            lines.append(f"{self.name}_count{{{base}}} {total}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help = help_text
+        self.label_names = label_names
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            snapshot = sorted(self._values.items())
+        for labels, value in snapshot:
+            lines.append(f"{self.name}{{{_labels(self.label_names, labels)}}} {value}")
+        return lines
+
+
+def _labels(names, values):
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """El proveedor JSON de Flask, midiendo cuanto tarda cada jsonify() en la peticion actual."""
+
+    def dumps(self, obj, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            if has_request_context() and "metrics" in g:
+                g.metrics["serialization"] += time.perf_counter() - started
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.app = None
+        self.slow_request_seconds = 1.0
+        self.token = None
+        # Lo fija wsgi.py: segundos entre el primer import y la app ya construida
+        self.cold_start_seconds = None
+        labels = ("blueprint", "route", "method")
+        self.latency = Histogram("http_request_duration_seconds", "Duracion de la peticion.", LATENCY_BUCKETS, labels)
+        self.requests = Counter("http_requests_total", "Peticiones atendidas por codigo de estado.", labels + ("status",))
+        self.query_count = Histogram("db_queries_per_request", "Sentencias SQL por peticion.", QUERY_BUCKETS, labels)
+        self.query_time = Histogram("db_query_duration_seconds_per_request", "Tiempo total en SQL por peticion.", LATENCY_BUCKETS, labels)
+        self.serialization = Histogram("http_serialization_duration_seconds", "Tiempo de serializacion (marshmallow y JSON) por peticion.", LATENCY_BUCKETS, labels)
+        self.request_size = Histogram("http_request_size_bytes", "Tamaño del cuerpo de la peticion.", SIZE_BUCKETS, labels)
+        self.response_size = Histogram("http_response_size_bytes", "Tamaño del cuerpo de la respuesta.", SIZE_BUCKETS, labels)
+        self.slow_requests = Counter("http_slow_requests_total", "Peticiones por encima de SLOW_REQUEST_MS.", labels)
+
+    def init_app(self, app):
+        self.app = app
+        self.slow_request_seconds = app.config["SLOW_REQUEST_MS"] / 1000
+        self.token = app.config["METRICS_TOKEN"]
+        app.json = TimedJSONProvider(app)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.add_url_rule("/metrics", "metrics", self.export)
+
+        # Se escucha la clase Engine: no hace falta contexto de aplicacion y cubre cualquier motor
+        if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+            event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+    @contextmanager
+    def serialization_timer(self):
+        """Para medir los dump() de marshmallow, que ocurren antes de jsonify()."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            if "metrics" in g:
+                g.metrics["serialization"] += time.perf_counter() - started
+
+    def _before_request(self):
+        g.metrics = {"started": time.perf_counter(), "queries": [], "query_count": 0, "query_time": 0.0, "serialization": 0.0}
+
+    def _after_request(self, response):
+        state = g.pop("metrics", None)
+        if state is None or request.endpoint == "metrics":
+            return response
+        elapsed = time.perf_counter() - state["started"]
+        labels = (
+            request.blueprint or "",
+            request.url_rule.rule if request.url_rule else "unmatched",
+            request.method,
+        )
+        self.latency.observe(labels, elapsed)
+        self.requests.inc(labels + (str(response.status_code),))
+        self.query_count.observe(labels, state["query_count"])
+        self.query_time.observe(labels, state["query_time"])
+        self.serialization.observe(labels, state["serialization"])
+        self.request_size.observe(labels, request.content_length or 0)
+        # Las respuestas en streaming (zips) no tienen tamaño conocido aqui
+        if response.content_length is not None:
+            self.response_size.observe(labels, response.content_length)
+
+        if elapsed >= self.slow_request_seconds:
+            self.slow_requests.inc(labels)
+            queries = "\n".join(f"  {duration * 1000:8.1f} ms  {statement}" for statement, duration in state["queries"])
+            self.app.logger.warning(
+                "Peticion lenta %s %s: %.0f ms, %d consultas (%.0f ms en SQL), serializacion %.0f ms, estado %s\n%s",
+                request.method, request.path, elapsed * 1000, state["query_count"], state["query_time"] * 1000,
+                state["serialization"] * 1000, response.status_code, queries,
+            )
+        return response
+
+    def pool_lines(self):
+        pool = db.engine.pool
+        lines = []
+        # Solo QueuePool (el de PostgreSQL) tiene estas estadisticas
+        for name, getter, help_text in (
+            ("db_pool_size", "size", "Tamaño configurado del pool de conexiones."),
+            ("db_pool_checked_out", "checkedout", "Conexiones prestadas en este momento."),
+            ("db_pool_checked_in", "checkedin", "Conexiones libres en el pool."),
+            ("db_pool_overflow", "overflow", "Conexiones abiertas por encima del tamaño del pool."),
+        ):
+            if hasattr(pool, getter):
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {getattr(pool, getter)()}"]
+        return lines
+
+    def export(self):
+        # Rutas, estado del pool y trafico no son publicos: sin METRICS_TOKEN el endpoint no existe
+        if not self.token:
+            return Response("not found\n", status=404, mimetype="text/plain")
+        if not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {self.token}"):
+            return Response("unauthorized\n", status=401, mimetype="text/plain")
+        lines = []
+        for metric in (self.latency, self.requests, self.query_count, self.query_time, self.serialization,
+                       self.request_size, self.response_size, self.slow_requests):
+            lines += metric.render()
+        lines += self.pool_lines()
+        if self.cold_start_seconds is not None:
+            lines += [
+                "# HELP app_cold_start_seconds Tiempo de importacion y construccion de la app.",
+                "# TYPE app_cold_start_seconds gauge",
+                f"app_cold_start_seconds {self.cold_start_seconds:.6f}",
+            ]
+        return Response("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_metrics_started", None)
+    # Las consultas de hilos de fondo (miniaturas, autosave) no pertenecen a ninguna peticion
+    if started is None or not has_request_context() or "metrics" not in g:
+        return
+    elapsed = time.perf_counter() - started
+    state = g.metrics
+    state["query_count"] += 1
+    state["query_time"] += elapsed
+    if len(state["queries"]) < MAX_RECORDED_QUERIES:
+        state["queries"].append((" ".join(statement.split())[:500], elapsed))
+    # Resumen completo por sentencia, solo cuando la peticion se esta perfilando (app.services.profiling)
+    summary = state.get("sql_summary")
+    if summary is not None:
+        count, total, longest = summary.get(statement, (0, 0.0, 0.0))
+        summary[statement] = (count + 1, total + elapsed, max(longest, elapsed))
+
+
+metrics = RequestMetrics()
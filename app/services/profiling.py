@@ -0,0 +1,201 @@
+import cProfile
+import hmac
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+from flask import g, request
+
+# Perfilado bajo demanda de una peticion concreta, para ver en produccion por que tarda un proyecto.
+#
+# Se activa de dos formas: con la cabecera X-Profile: <PROFILING_TOKEN> (solo quien administra
+# el servidor conoce el token) o, si PROFILE_PATHS tiene una expresion regular, con una fraccion
+# PROFILE_SAMPLE_RATE de las peticiones cuya ruta coincide. En ambos casos hay un limite de
+# PROFILE_MAX_PER_MINUTE perfiles por worker y como mucho uno a la vez. Con el modo apagado el
+# coste es una consulta de cabecera por peticion.
+#
+# Modos (cabecera X-Profile-Mode o PROFILE_MODE):
+#   - cprofile: perfil determinista (.prof, se abre con pstats o snakeviz)
+#   - sample: muestreo de la pila del hilo de la peticion cada PROFILE_SAMPLE_INTERVAL_MS,
+#     en formato de pilas colapsadas (.folded, para flamegraph.pl o speedscope)
+# Junto a cada perfil se escribe <id>.sql.json con las sentencias agrupadas por tiempo total.
+
+PROFILE_HEADER = "X-Profile"
+MODES = ("cprofile", "sample")
+
+
+class StackSampler:
+    """Muestrea la pila de un solo hilo desde otro hilo; no instrumenta nada en el hilo perfilado."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as handle:
+            for stack, count in self.stacks.most_common():
+                handle.write(f"{stack} {count}\n")
+
+
+class RequestProfiler:
+    def __init__(self):
+        self.directory = None
+        self.token = None
+        self.path_pattern = None
+        self.sample_rate = 0.0
+        self.max_per_minute = 10
+        self.mode = "cprofile"
+        self.sample_interval = 0.005
+        # cProfile no admite dos perfiles activos a la vez en el mismo interprete
+        self._active = threading.Lock()
+        self._budget_lock = threading.Lock()
+        self._window_start = 0.0
+        self._window_count = 0
+
+    def init_app(self, app):
+        self.directory = app.config["PROFILE_DIR"]
+        self.token = app.config["PROFILING_TOKEN"]
+        self.path_pattern = re.compile(app.config["PROFILE_PATHS"]) if app.config["PROFILE_PATHS"] else None
+        self.sample_rate = app.config["PROFILE_SAMPLE_RATE"]
+        self.max_per_minute = app.config["PROFILE_MAX_PER_MINUTE"]
+        self.mode = app.config["PROFILE_MODE"]
+        self.sample_interval = app.config["PROFILE_SAMPLE_INTERVAL_MS"] / 1000
+        if not self.token and not self.path_pattern:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        # Se registra despues de las metricas: su before_request ya creo g.metrics, y su after_request
+        # (los after_request corren en orden inverso) todavia no lo ha retirado cuando termina el perfil
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+
+    # --- Activacion ---
+
+    def _requested(self):
+        header = request.headers.get(PROFILE_HEADER)
+        if header is not None:
+            return bool(self.token) and hmac.compare_digest(header, self.token)
+        if self.path_pattern is not None and self.path_pattern.search(request.path):
+            return random.random() < self.sample_rate
+        return False
+
+    def _take_budget(self):
+        with self._budget_lock:
+            now = time.monotonic()
+            if now - self._window_start >= 60:
+                self._window_start, self._window_count = now, 0
+            if self._window_count >= self.max_per_minute:
+                return False
+            self._window_count += 1
+            return True
+
+    def _before_request(self):
+        if not self._requested():
+            return
+        if not self._take_budget() or not self._active.acquire(blocking=False):
+            g.profile_skipped = True
+            return
+
+        mode = request.headers.get("X-Profile-Mode", self.mode)
+        mode = mode if mode in MODES else self.mode
+        if "metrics" in g:
+            g.metrics["sql_summary"] = {}
+        if mode == "sample":
+            profiler = StackSampler(threading.get_ident(), self.sample_interval)
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        g.profile = {"mode": mode, "profiler": profiler, "started": time.perf_counter()}
+
+    # --- Resultado ---
+
+    def _after_request(self, response):
+        state = g.pop("profile", None)
+        if state is None:
+            if g.pop("profile_skipped", False):
+                response.headers["X-Profile-Id"] = "skipped"
+            return response
+        try:
+            profile_id = self._finish(state, response.status_code)
+            response.headers["X-Profile-Id"] = profile_id
+        finally:
+            self._active.release()
+        return response
+
+    def _teardown_request(self, exc):
+        # Si la peticion fallo antes de after_request, el perfil se detiene sin escribir nada
+        state = g.pop("profile", None)
+        if state is not None:
+            self._stop(state)
+            self._active.release()
+
+    @staticmethod
+    def _stop(state):
+        if state["mode"] == "sample":
+            state["profiler"].stop()
+        else:
+            state["profiler"].disable()
+
+    def _finish(self, state, status):
+        self._stop(state)
+        elapsed = time.perf_counter() - state["started"]
+        route = request.url_rule.rule if request.url_rule else request.path
+        slug = re.sub(r"[^A-Za-z0-9]+", "-", route).strip("-")[:60] or "root"
+        profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{request.method.lower()}-{slug}-{g.get('request_id') or os.getpid()}"
+        base = os.path.join(self.directory, profile_id)
+
+        if state["mode"] == "sample":
+            state["profiler"].write(f"{base}.folded")
+        else:
+            state["profiler"].dump_stats(f"{base}.prof")
+
+        summary = g.metrics.get("sql_summary", {}) if "metrics" in g else {}
+        statements = sorted(
+            ({"statement": statement, "count": count, "total_ms": round(total * 1000, 3), "max_ms": round(longest * 1000, 3)}
+             for statement, (count, total, longest) in summary.items()),
+            key=lambda item: item["total_ms"],
+            reverse=True,
+        )
+        with open(f"{base}.sql.json", "w", encoding="utf-8") as handle:
+            json.dump({
+                "method": request.method,
+                "path": request.full_path.rstrip("?"),
+                "route": route,
+                "status": status,
+                "mode": state["mode"],
+                "duration_ms": round(elapsed * 1000, 3),
+                "query_count": sum(item["count"] for item in statements),
+                "query_ms": round(sum(item["total_ms"] for item in statements), 3),
+                "statements": statements,
+            }, handle, indent=2, ensure_ascii=False)
+        return profile_id
+
+
+request_profiler = RequestProfiler()
@@ -0,0 +1,246 @@
+import atexit
+import base64
+import errno
+import fcntl
+import json
+import logging
+import os
+import socket
+import threading
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+# Bus de eventos publicar/suscribir entre los workers de gunicorn.
+#
+# Los controladores publican eventos ("project.saved", "project.deleted", ...) y cualquier
+# modulo se suscribe para reaccionar (difundir por Socket.IO, invalidar caches, ...). El
+# transporte es intercambiable:
+#   - inprocess: solo el proceso actual (desarrollo, un unico worker)
+#   - unix: cada worker escucha en un socket de datagramas Unix dentro de PUBSUB_SOCKET_DIR
+#     y los mensajes se envian a todos los sockets del directorio, sin broker externo.
+
+
+def _encode(value):
+    if isinstance(value, (bytes, bytearray)):
+        return {"$b64": base64.b64encode(value).decode("ascii")}
+    raise TypeError(f"Tipo no serializable en el bus de eventos: {type(value).__name__}")
+
+
+def _decode(obj):
+    if len(obj) == 1 and "$b64" in obj:
+        return base64.b64decode(obj["$b64"])
+    return obj
+
+
+def dumps(message):
+    return json.dumps(message, default=_encode, separators=(",", ":")).encode("utf-8")
+
+
+def loads(payload):
+    return json.loads(payload, object_hook=_decode)
+
+
+class InProcessBackend:
+    """Entrega los mensajes solo a los suscriptores del proceso actual."""
+
+    def __init__(self, dispatch):
+        self._dispatch = dispatch
+        self._counters = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def publish(self, channel, data, local=True):
+        if local:
+            self._dispatch(channel, data, origin=True)
+        return True
+
+    def increment(self, key):
+        with self._lock:
+            self._counters[key] += 1
+            return self._counters[key]
+
+    def current(self, key):
+        return self._counters[key]
+
+
+class UnixSocketBackend:
+    """
+    Difunde los mensajes a todos los procesos que comparten el directorio de sockets.
+    Cada proceso enlaza <pid>.sock la primera vez que lo necesita (despues del fork de gunicorn).
+    """
+
+    # Limite practico de un datagrama Unix en Linux con la configuracion por defecto
+    MAX_DATAGRAM = 200 * 1024
+
+    def __init__(self, dispatch, directory):
+        self._dispatch = dispatch
+        self._directory = directory
+        self._counters_dir = os.path.join(directory, "counters")
+        self._sock = None
+        self._pid = None
+        self._lock = threading.Lock()
+        os.makedirs(self._counters_dir, mode=0o700, exist_ok=True)
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            path = os.path.join(self._directory, f"{os.getpid()}.sock")
+            if os.path.exists(path):
+                os.unlink(path)
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            sock.bind(path)
+            os.chmod(path, 0o600)
+            self._sock = sock
+            self._pid = os.getpid()
+            atexit.register(self._cleanup, path)
+            threading.Thread(target=self._listen, name="pubsub-listener", daemon=True).start()
+
+    def start(self):
+        self._ensure_started()
+
+    @staticmethod
+    def _cleanup(path):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+    def _peers(self):
+        own = f"{os.getpid()}.sock"
+        return [
+            os.path.join(self._directory, name)
+            for name in os.listdir(self._directory)
+            if name.endswith(".sock") and name != own
+        ]
+
+    def publish(self, channel, data, local=True):
+        self._ensure_started()
+        if local:
+            self._dispatch(channel, data, origin=True)
+
+        payload = dumps({"channel": channel, "data": data})
+        if len(payload) > self.MAX_DATAGRAM:
+            logger.warning("Evento '%s' demasiado grande para el bus (%d bytes), no se difunde.", channel, len(payload))
+            return False
+
+        delivered = True
+        sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sender.setblocking(False)
+        try:
+            for peer in self._peers():
+                try:
+                    sender.sendto(payload, peer)
+                except (ConnectionRefusedError, FileNotFoundError):
+                    # El worker termino sin limpiar su socket
+                    try:
+                        os.unlink(peer)
+                    except FileNotFoundError:
+                        pass
+                except OSError as err:
+                    if err.errno in (errno.EAGAIN, errno.ENOBUFS):
+                        logger.warning("El worker %s no consume eventos, se descarta '%s'.", peer, channel)
+                        delivered = False
+                    else:
+                        raise
+        finally:
+            sender.close()
+        return delivered
+
+    def _listen(self):
+        sock = self._sock
+        while True:
+            payload = sock.recv(self.MAX_DATAGRAM)
+            try:
+                message = loads(payload)
+                self._dispatch(message["channel"], message["data"])
+            except Exception as err:
+                logger.exception("Error al procesar un evento del bus")
+
+    def increment(self, key):
+        # El contador vive en un archivo bloqueado con flock, compartido por todos los workers
+        with open(os.path.join(self._counters_dir, key), "a+") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            handle.seek(0)
+            value = int(handle.read() or 0) + 1
+            handle.seek(0)
+            handle.truncate()
+            handle.write(str(value))
+            return value
+
+    def current(self, key):
+        try:
+            with open(os.path.join(self._counters_dir, key)) as handle:
+                fcntl.flock(handle, fcntl.LOCK_SH)
+                return int(handle.read() or 0)
+        except FileNotFoundError:
+            return 0
+
+
+class PubSub:
+    def __init__(self):
+        self._handlers = defaultdict(list)
+        # Manejadores que solo corren en el proceso que publico el evento (p. ej. encolar un trabajo una vez)
+        self._origin_handlers = defaultdict(list)
+        self._backend = InProcessBackend(self._dispatch)
+
+    def init_app(self, app):
+        backend = app.config["PUBSUB_BACKEND"]
+        if backend == "unix":
+            os.makedirs(app.config["PUBSUB_SOCKET_DIR"], mode=0o700, exist_ok=True)
+            self._backend = UnixSocketBackend(self._dispatch, app.config["PUBSUB_SOCKET_DIR"])
+        elif backend == "inprocess":
+            self._backend = InProcessBackend(self._dispatch)
+        else:
+            raise ValueError(f"PUBSUB_BACKEND no soportado: {backend}")
+
+    @property
+    def is_distributed(self):
+        return not isinstance(self._backend, InProcessBackend)
+
+    def subscribe(self, channel, handler=None, origin_only=False):
+        """
+        Registra un manejador handler(data) para el canal; se puede usar como decorador. Con
+        origin_only=True solo se llama en el proceso que publica, no en el resto de workers.
+        """
+        handlers = self._origin_handlers if origin_only else self._handlers
+        if handler is None:
+            def decorator(func):
+                handlers[channel].append(func)
+                return func
+            return decorator
+        handlers[channel].append(handler)
+        return handler
+
+    def publish(self, channel, data, local=True):
+        """
+        Publica en todos los workers; con local=False no se entrega en el proceso actual. Devuelve
+        False si algun worker no lo recibio (evento demasiado grande o su cola de recepcion llena).
+        """
+        return self._backend.publish(channel, data, local=local)
+
+    def start(self):
+        # Empieza a escuchar sin esperar a la primera publicacion (solo aplica a backends distribuidos)
+        if hasattr(self._backend, "start"):
+            self._backend.start()
+
+    def next_sequence(self, key):
+        return self._backend.increment(key)
+
+    def current_sequence(self, key):
+        return self._backend.current(key)
+
+    def _dispatch(self, channel, data, origin=False):
+        handlers = list(self._handlers.get(channel, ()))
+        if origin:
+            handlers += self._origin_handlers.get(channel, ())
+        for handler in handlers:
+            try:
+                handler(data)
+            except Exception as err:
+                logger.exception("Error en el suscriptor de '%s'", channel)
+
+
+pubsub = PubSub()
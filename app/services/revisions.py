@@ -0,0 +1,210 @@
+import json
+import uuid
+import zlib
+from http import HTTPStatus
+
+from flask import current_app
+from sqlalchemy import func
+
+from app.database import db
+from app.errors.errors import GenericError
+from app.models import Class, Project, ProjectRevision, Relationship
+from app.services.diagram_operations import CLASS_FIELDS, RELATIONSHIP_FIELDS
+
+# Historial de cambios de los diagramas.
+#
+# Cada guardado produce una revision numerada: los de save_project_data con el cuerpo recibido, y
+# los demas caminos que escriben filas (volcados del autosave, importacion, layout, clonado) con
+# el diagrama reconstruido desde las filas, que ademas pasa a ser project.diagram_data. La mayoria son deltas: solo los elementos
+# (clases, relaciones, claves de primer nivel) que cambiaron respecto del guardado anterior,
+# asi el almacenamiento crece con el tamaño de la edicion y no con el del diagrama. Cada
+# REVISION_SNAPSHOT_INTERVAL revisiones se guarda una copia completa, de modo que reconstruir
+# cualquier revision aplica como mucho ese numero de deltas. Todo se guarda comprimido con zlib.
+
+SNAPSHOT = "snapshot"
+DELTA = "delta"
+SECTIONS = ("classes", "relationships")
+
+_MISSING = object()
+
+
+def _compress(value):
+    raw = json.dumps(value, separators=(",", ":")).encode("utf-8")
+    return zlib.compress(raw, current_app.config["REVISION_COMPRESSION_LEVEL"]), len(raw)
+
+
+def _decompress(payload):
+    return json.loads(zlib.decompress(payload))
+
+
+def _element_key(item, index):
+    element_id = item.get("id") if isinstance(item, dict) else None
+    return str(element_id) if element_id is not None else f"#{index}"
+
+
+def diagram_state(data):
+    """Convierte el cuerpo guardado en diccionarios por id, que es sobre lo que se calculan los deltas."""
+    data = data if isinstance(data, dict) else {}
+    state = {"meta": {key: value for key, value in data.items() if key not in SECTIONS}}
+    for section in SECTIONS:
+        items = data.get(section) if isinstance(data.get(section), list) else []
+        state[section] = {_element_key(item, index): item for index, item in enumerate(items)}
+    return state
+
+
+def state_to_diagram(state):
+    diagram = dict(state["meta"])
+    for section in SECTIONS:
+        diagram[section] = list(state[section].values())
+    return diagram
+
+
+def diff_states(old, new):
+    """Delta minimo entre dos estados; devuelve (delta, numero de elementos cambiados)."""
+    delta = {}
+    changes = 0
+    for section in (*SECTIONS, "meta"):
+        before, after = old[section], new[section]
+        changed = {key: value for key, value in after.items() if before.get(key, _MISSING) != value}
+        removed = [key for key in before if key not in after]
+        part = {}
+        if changed:
+            part["set"] = changed
+        if removed:
+            part["del"] = removed
+        if section != "meta":
+            # El orden solo se guarda si no es el que resulta de aplicar el delta (conservar + añadir al final)
+            expected = [key for key in before if key in after] + [key for key in after if key not in before]
+            if expected != list(after):
+                part["order"] = list(after)
+                changes += 1
+        if part:
+            delta[section] = part
+            changes += len(changed) + len(removed)
+    return delta, changes
+
+
+def apply_delta(state, delta):
+    for section in (*SECTIONS, "meta"):
+        part = delta.get(section)
+        if not part:
+            continue
+        items = state[section]
+        for key in part.get("del", ()):
+            items.pop(key, None)
+        items.update(part.get("set", {}))
+        if "order" in part:
+            state[section] = {key: items[key] for key in part["order"]}
+    return state
+
+
+def record_revision(project, new_data, user_id):
+    """
+    Registra la revision de un guardado. Debe llamarse antes de sobrescribir project.diagram_data,
+    dentro de la transaccion del guardado. Devuelve el numero de revision o None si no hubo cambios.
+    """
+    # Bloqueo de la fila del proyecto: dos guardados simultaneos no pueden tomar el mismo numero
+    project = Project.query.filter_by(id=project.id).with_for_update().populate_existing().one()
+
+    last_number, last_snapshot = db.session.query(
+        func.max(ProjectRevision.number),
+        func.max(ProjectRevision.number).filter(ProjectRevision.kind == SNAPSHOT)
+    ).filter_by(project_id=project.id).one()
+
+    new_state = diagram_state(new_data)
+    number = (last_number or 0) + 1
+    interval = current_app.config["REVISION_SNAPSHOT_INTERVAL"]
+
+    kind, body, changes = SNAPSHOT, new_state, sum(len(new_state[section]) for section in SECTIONS)
+    if last_snapshot is not None and number - last_snapshot < interval:
+        delta, changes = diff_states(diagram_state(project.diagram_data), new_state)
+        if not delta:
+            return None
+        kind, body = DELTA, delta
+
+    payload, raw_size = _compress(body)
+    if kind == DELTA:
+        snapshot_payload, snapshot_size = _compress(new_state)
+        # Si la edicion reescribe casi todo, una copia completa ocupa lo mismo y acorta la cadena
+        if len(payload) * 2 >= len(snapshot_payload):
+            kind, payload, raw_size = SNAPSHOT, snapshot_payload, snapshot_size
+
+    db.session.add(ProjectRevision(
+        project_id=project.id,
+        user_id=user_id,
+        number=number,
+        kind=kind,
+        payload=payload,
+        raw_size=raw_size,
+        changes=changes
+    ))
+    return number
+
+
+def diagram_from_rows(project, base=None):
+    """
+    Diagrama en el formato de /save a partir de las filas del proyecto. Los elementos que ya estaban
+    en base (por defecto project.diagram_data) conservan su posicion y las claves que las filas no
+    guardan (el delta contra el guardado anterior solo incluye lo que cambio en la BD).
+    """
+    previous = diagram_state(project.diagram_data if base is None else base)
+    diagram = dict(previous["meta"])
+    for section, model, fields in (("classes", Class, CLASS_FIELDS), ("relationships", Relationship, RELATIONSHIP_FIELDS)):
+        before = previous[section]
+        position = {key: index for index, key in enumerate(before)}
+        # Solo las columnas del formato de /save, sin materializar objetos ORM
+        rows = db.session.query(model.id, *(getattr(model, column) for column in fields.values())).filter(
+            model.project_id == project.id, model.is_deleted.is_(False)
+        ).order_by(model.created_at, model.id)
+        items = []
+        for row_id, *values in rows:
+            key = str(row_id)
+            item = dict(before.get(key) or {}, id=key)
+            for field, value in zip(fields, values):
+                item[field] = str(value) if isinstance(value, uuid.UUID) else value
+            items.append((position.get(key, len(position)), item))
+        # sorted es estable: los elementos nuevos quedan al final en orden de creacion
+        diagram[section] = [item for _, item in sorted(items, key=lambda entry: entry[0])]
+    return diagram
+
+
+def record_rows_revision(project, user_id=None, base=None):
+    """
+    Registra como revision el estado actual de las filas del proyecto y lo deja en
+    project.diagram_data, que es la base del delta siguiente. Se llama despues de escribir las
+    filas, dentro de la misma transaccion. base es el diagrama recibido con los ids de las filas,
+    si lo hay (guardado completo): de el salen el orden y las claves que las filas no guardan.
+    Devuelve el numero de revision o None. No hace commit.
+    """
+    db.session.flush()
+    # El bloqueo se toma antes de leer diagram_data, igual que en record_revision
+    project = Project.query.filter_by(id=project.id).with_for_update().populate_existing().one()
+    diagram = diagram_from_rows(project, base)
+    number = record_revision(project, diagram, user_id)
+    project.diagram_data = diagram
+    return number
+
+
+def checkout_revision(project_id, number):
+    """Reconstruye el diagrama de una revision desde la copia completa mas cercana."""
+    snapshot_number = db.session.query(func.max(ProjectRevision.number)).filter(
+        ProjectRevision.project_id == project_id,
+        ProjectRevision.kind == SNAPSHOT,
+        ProjectRevision.number <= number
+    ).scalar()
+
+    if snapshot_number is None:
+        raise GenericError(HTTPStatus.NOT_FOUND, HTTPStatus.NOT_FOUND.phrase, "Revision no encontrada.")
+
+    rows = db.session.query(ProjectRevision.number, ProjectRevision.kind, ProjectRevision.payload, ProjectRevision.created_at).filter(
+        ProjectRevision.project_id == project_id,
+        ProjectRevision.number.between(snapshot_number, number)
+    ).order_by(ProjectRevision.number).all()
+
+    if rows[-1].number != number:
+        raise GenericError(HTTPStatus.NOT_FOUND, HTTPStatus.NOT_FOUND.phrase, "Revision no encontrada.")
+
+    state = _decompress(rows[0].payload)
+    for row in rows[1:]:
+        state = apply_delta(state, _decompress(row.payload))
+    return rows[-1], state_to_diagram(state), len(rows) - 1
@@ -0,0 +1,118 @@
+import re
+
+from sqlalchemy import text
+
+from app.database import db
+
+# Busqueda de texto completo sobre las columnas tsvector que mantienen los triggers de la
+# migracion b7d41c2e9f10. Esas columnas no estan mapeadas en el ORM, por eso las consultas
+# son SQL directo. Todas filtran por el dueño del proyecto antes de devolver nada.
+
+SEARCH_KINDS = ("project", "class", "member")
+MAX_TERMS = 8
+
+_TERM = re.compile(r"[^\W_]+", re.UNICODE)
+
+_BRANCHES = {
+    "project": """
+        SELECT 'project' AS kind, p.id AS project_id, p.name AS project_name,
+               NULL::uuid AS class_id, NULL::text AS class_name, NULL::text AS stereotype,
+               ts_rank(p.search_vector, q.query) AS rank, p.updated_at
+        FROM projects p, q
+        WHERE p.user_id = :user_id AND p.is_deleted = false AND p.search_vector @@ q.query
+    """,
+    "class": """
+        SELECT 'class' AS kind, p.id AS project_id, p.name AS project_name,
+               c.id AS class_id, c.name AS class_name, c.stereotype,
+               ts_rank(c.search_vector, q.query) AS rank, c.updated_at
+        FROM classes c JOIN projects p ON p.id = c.project_id, q
+        WHERE p.user_id = :user_id AND p.is_deleted = false AND c.is_deleted = false
+          AND c.search_vector @@ q.query
+    """,
+    "member": """
+        SELECT 'member' AS kind, p.id AS project_id, p.name AS project_name,
+               c.id AS class_id, c.name AS class_name, c.stereotype,
+               ts_rank(c.members_vector, q.query) AS rank, c.updated_at
+        FROM classes c JOIN projects p ON p.id = c.project_id, q
+        WHERE p.user_id = :user_id AND p.is_deleted = false AND c.is_deleted = false
+          AND c.members_vector @@ q.query
+    """,
+}
+
+
+def parse_terms(query):
+    """Terminos en minusculas, solo letras y digitos (asi el tsquery nunca lleva operadores del usuario)."""
+    terms = []
+    for term in _TERM.findall(query or ""):
+        term = term.lower()
+        if term not in terms:
+            terms.append(term)
+    return terms[:MAX_TERMS]
+
+
+def build_tsquery(terms):
+    # Busqueda por prefijo de cada termino: "usu nom" encuentra "usuarioNombre"
+    return " & ".join(f"{term}:*" for term in terms)
+
+
+def _matching_members(members, terms):
+    matches = []
+    for member in members or []:
+        name = (member or {}).get("name") or ""
+        words = {word.lower() for word in re.findall(r"[A-Z]?[a-z0-9]+|[A-Z]+(?![a-z])", name)} | {name.lower()}
+        if all(any(word.startswith(term) for word in words) for term in terms):
+            matches.append(name)
+    return matches
+
+
+def search(user_id, query, kinds, limit, offset):
+    """Devuelve (total, hits) ordenados por relevancia."""
+    terms = parse_terms(query)
+    if not terms:
+        return 0, []
+
+    sql = (
+        "WITH q AS (SELECT to_tsquery('simple', :tsquery) AS query) "
+        "SELECT *, count(*) OVER () AS total FROM ("
+        + " UNION ALL ".join(_BRANCHES[kind] for kind in kinds)
+        + ") AS hits ORDER BY rank DESC, updated_at DESC LIMIT :limit OFFSET :offset"
+    )
+    rows = db.session.execute(text(sql), {
+        "tsquery": build_tsquery(terms),
+        "user_id": user_id,
+        "limit": limit,
+        "offset": offset,
+    }).all()
+
+    total = rows[0].total if rows else 0
+    # Los miembros que coinciden se extraen solo de las filas de la pagina
+    member_rows = [row for row in rows if row.kind == "member"]
+    members = {}
+    if member_rows:
+        # Con project_id la consulta solo visita las particiones de esos proyectos
+        members = {
+            row.id: row
+            for row in db.session.execute(
+                text("SELECT id, attributes, methods FROM classes WHERE project_id = ANY(:project_ids) AND id = ANY(:ids)"),
+                {"project_ids": list({row.project_id for row in member_rows}), "ids": [row.class_id for row in member_rows]}
+            )
+        }
+
+    hits = []
+    for row in rows:
+        hit = {
+            "kind": row.kind,
+            "projectId": str(row.project_id),
+            "projectName": row.project_name,
+            "rank": round(float(row.rank), 6),
+        }
+        if row.class_id:
+            hit["classId"] = str(row.class_id)
+            hit["className"] = row.class_name
+            hit["stereotype"] = row.stereotype
+        if row.kind == "member" and row.class_id in members:
+            detail = members[row.class_id]
+            hit["attributes"] = _matching_members(detail.attributes, terms)
+            hit["methods"] = _matching_members(detail.methods, terms)
+        hits.append(hit)
+    return total, hits
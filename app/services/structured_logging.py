@@ -0,0 +1,184 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import re
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import g, has_request_context, request
+
+# Registro estructurado (una linea JSON por evento) sin E/S en los hilos de las peticiones.
+#
+# Los modulos usan logging.getLogger(__name__) como siempre. El manejador de la raiz solo mete el
+# registro en una cola acotada (si esta llena, el evento se descarta y se cuenta) y un hilo por
+# worker lo formatea y lo escribe. Cada registro lleva el id de correlacion de su peticion, que
+# llega en X-Request-ID o se genera, y se devuelve en la respuesta. Las advertencias repetidas
+# (mismo logger y plantilla de mensaje) se muestrean: unas pocas por intervalo y el resto se
+# resumen en el campo "suppressed" del siguiente registro que pasa.
+
+REQUEST_ID_HEADER = "X-Request-ID"
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+# Atributos propios de LogRecord; el resto son campos extra (logger.info(..., extra={...}))
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id", "suppressed"}
+
+
+def current_request_id():
+    if has_request_context():
+        return g.get("request_id")
+    return None
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        if getattr(record, "suppressed", 0):
+            entry["suppressed"] = record.suppressed
+        for key, value in vars(record).items():
+            if key not in _RESERVED:
+                entry[key] = value
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Formato legible para desarrollo local (LOG_FORMAT=text)."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s")
+
+    def format(self, record):
+        if not hasattr(record, "request_id"):
+            record.request_id = "-"
+        return super().format(record)
+
+
+class WarningSampler(logging.Filter):
+    """Deja pasar 'burst' advertencias por plantilla y por intervalo; las demas se descartan y se cuentan."""
+
+    def __init__(self, burst, interval):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        # Solo se muestrean las advertencias: errores y mensajes informativos pasan siempre
+        if record.levelno != logging.WARNING or self.burst <= 0:
+            return True
+        key = (record.name, record.msg if isinstance(record.msg, str) else repr(type(record.msg)))
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                suppressed = window[2] if window else 0
+                self._windows[key] = [now, 1, 0]
+                if len(self._windows) > 10000:
+                    self._windows = {key: self._windows[key]}
+            elif window[1] < self.burst:
+                window[1] += 1
+                suppressed = 0
+            else:
+                window[2] += 1
+                return False
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Encola sin bloquear y arranca el hilo escritor bajo demanda en cada proceso
+    (los hilos no sobreviven al fork de gunicorn).
+    """
+
+    def __init__(self, capacity, target):
+        super().__init__(queue.Queue(capacity))
+        self.target = target
+        self.dropped = 0
+        self._listener = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_listener(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # La cola heredada del padre puede tener un mutex tomado: cada proceso usa la suya
+            self.queue = queue.Queue(self.queue.maxsize)
+            self._listener = QueueListener(self.queue, self.target, respect_handler_level=True)
+            self._listener.start()
+            self._pid = os.getpid()
+            atexit.register(self._listener.stop)
+
+    def prepare(self, record):
+        # Lo minimo en el hilo que registra: resolver el mensaje y la traza (el registro original
+        # guarda referencias a objetos que pueden cambiar antes de que el escritor lo formatee)
+        record.message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        record.stack_info = None
+        if not hasattr(record, "request_id"):
+            record.request_id = current_request_id()
+        return record
+
+    def enqueue(self, record):
+        self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def init_logging(app):
+    """Configura el registrador raiz con la cola y los ids de correlacion por peticion."""
+    target = logging.StreamHandler(sys.stdout)
+    target.setFormatter(TextFormatter() if app.config["LOG_FORMAT"] == "text" else JsonFormatter())
+
+    handler = NonBlockingQueueHandler(app.config["LOG_QUEUE_SIZE"], target)
+    handler.addFilter(WarningSampler(app.config["LOG_SAMPLE_BURST"], app.config["LOG_SAMPLE_INTERVAL_SECONDS"]))
+
+    root = logging.getLogger()
+    for existing in [item for item in root.handlers if isinstance(item, NonBlockingQueueHandler)]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(app.config["LOG_LEVEL"])
+
+    # app.logger propaga a la raiz; sin esto Flask le añade su propio manejador a stderr
+    from flask.logging import default_handler
+    app.logger.removeHandler(default_handler)
+
+    app.before_request(_assign_request_id)
+    app.after_request(_expose_request_id)
+    return handler
+
+
+def _assign_request_id():
+    incoming = request.headers.get(REQUEST_ID_HEADER, "")
+    g.request_id = incoming if _VALID_REQUEST_ID.match(incoming) else uuid.uuid4().hex
+
+
+def _expose_request_id(response):
+    if "request_id" in g:
+        response.headers[REQUEST_ID_HEADER] = g.request_id
+    return response
@@ -0,0 +1,179 @@
+from datetime import datetime, timedelta, timezone
+from http import HTTPStatus
+
+from flask import current_app
+from sqlalchemy import func, text
+from sqlalchemy.orm import load_only, undefer
+
+from app.database import db
+from app.errors.errors import GenericError
+from app.models import Class, Relationship
+from app.services.diagram_operations import CLASS_FIELDS, RELATIONSHIP_FIELDS
+
+# Sincronizacion incremental de los listados de clases y relaciones.
+#
+# Cada escritura en classes/relationships recibe un numero creciente (sync_version) de una
+# secuencia global y cada borrado fisico deja una lapida en sync_tombstones (triggers de la
+# migracion e4b7c1d9a3f6). Ese numero sirve a la vez de cursor de sincronizacion y de clave de
+# paginacion: el cliente pide "lo que cambio despues de N" y recibe las filas en orden de
+# version, las ids borradas y el cursor con el que seguir.
+
+ENTITIES = {
+    "class": (Class, {"id": "id", "projectId": "project_id", **CLASS_FIELDS}),
+    "relationship": (Relationship, {"id": "id", **RELATIONSHIP_FIELDS}),
+}
+
+
+def _bad_request(message):
+    return GenericError(HTTPStatus.BAD_REQUEST, HTTPStatus.BAD_REQUEST.phrase, message)
+
+
+def parse_fields(value, entity):
+    """Campos pedidos con 'fields=id,name,position' (el id siempre se incluye). None = todos."""
+    if not value:
+        return None
+    allowed = ENTITIES[entity][1]
+    fields = ["id"]
+    for field in (item.strip() for item in value.split(",")):
+        if field and field not in fields:
+            if field not in allowed:
+                raise _bad_request(f"Campo no soportado: {field}. Usa: {', '.join(allowed)}.")
+            fields.append(field)
+    return tuple(fields)
+
+
+def parse_since(value):
+    """'since' acepta un cursor (entero) o una fecha ISO 8601; devuelve (version, fecha)."""
+    if value is None or value == "":
+        return 0, None
+    if value.isdigit():
+        return int(value), None
+    try:
+        since_time = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise _bad_request("El parametro 'since' debe ser un cursor numerico o una fecha ISO 8601.")
+    if since_time.tzinfo is None:
+        since_time = since_time.replace(tzinfo=timezone.utc)
+    return 0, since_time
+
+
+def parse_limit(value):
+    max_size = current_app.config["SYNC_MAX_PAGE_SIZE"]
+    if value is None:
+        return current_app.config["SYNC_PAGE_SIZE"]
+    if not value.isdigit() or not (1 <= int(value) <= max_size):
+        raise _bad_request(f"El parametro 'limit' debe estar entre 1 y {max_size}.")
+    return int(value)
+
+
+def load_columns(entity, fields, *extra):
+    """Opcion load_only para leer de la BD solo las columnas de los campos pedidos."""
+    model, columns = ENTITIES[entity]
+    return load_only(*(getattr(model, columns[field]) for field in fields), *extra)
+
+
+def _check_floor(project_id, since_version, since_time):
+    floor = db.session.execute(text("SELECT sync_floor FROM projects WHERE id = :id"), {"id": project_id}).scalar() or 0
+    if floor == 0:
+        return
+    retention = timedelta(days=current_app.config["SYNC_TOMBSTONE_RETENTION_DAYS"])
+    if (since_version and since_version < floor) or (since_time and since_time < datetime.now(timezone.utc) - retention):
+        raise GenericError(
+            HTTPStatus.GONE,
+            HTTPStatus.GONE.phrase,
+            "El cursor es demasiado antiguo: los borrados de esa epoca ya se purgaron. Vuelve a sincronizar sin 'since'."
+        )
+
+
+def list_changes(entity, project_id, since_version, since_time, limit, fields):
+    """
+    Devuelve (filas, ids borradas, cursor, hay_mas). Sin 'since' es el listado completo paginado
+    (solo filas activas); con 'since' se incluyen las lapidas y las filas marcadas is_deleted.
+    """
+    model, _ = ENTITIES[entity]
+    include_deleted = bool(since_version or since_time)
+    if include_deleted:
+        _check_floor(project_id, since_version, since_time)
+
+    query = model.query.filter(model.project_id == project_id, model.sync_version > since_version)
+    if fields:
+        query = query.options(load_columns(entity, fields, model.sync_version, model.is_deleted))
+    else:
+        query = query.options(undefer(model.sync_version))
+    if since_time:
+        query = query.filter(model.updated_at > since_time)
+    if not include_deleted:
+        query = query.filter(model.is_deleted.is_(False))
+    events = [(row.sync_version, row) for row in query.order_by(model.sync_version).limit(limit + 1)]
+
+    if include_deleted:
+        sql = ("SELECT sync_version, entity_id FROM sync_tombstones "
+               "WHERE project_id = :project_id AND entity = :entity AND sync_version > :since")
+        if since_time:
+            sql += " AND deleted_at > :since_time"
+        tombstones = db.session.execute(text(sql + " ORDER BY sync_version LIMIT :limit"), {
+            "project_id": project_id,
+            "entity": entity,
+            "since": since_version,
+            "since_time": since_time,
+            "limit": limit + 1,
+        })
+        events.extend((row.sync_version, row.entity_id) for row in tombstones)
+        events.sort(key=lambda event: event[0])
+
+    has_more = len(events) > limit
+    events = events[:limit]
+
+    rows, deleted = [], []
+    for _, item in events:
+        if not isinstance(item, model):
+            deleted.append(str(item))
+        elif item.is_deleted:
+            deleted.append(str(item.id))
+        else:
+            rows.append(item)
+
+    if events:
+        cursor = events[-1][0]
+    elif since_time:
+        # Nada cambio desde esa fecha: el cursor pasa a ser la ultima version confirmada del proyecto
+        cursor = max(
+            db.session.query(func.max(model.sync_version)).filter(model.project_id == project_id).scalar() or 0,
+            db.session.execute(
+                text("SELECT max(sync_version) FROM sync_tombstones WHERE project_id = :project_id AND entity = :entity"),
+                {"project_id": project_id, "entity": entity}
+            ).scalar() or 0
+        )
+    else:
+        cursor = since_version
+    return rows, deleted, cursor, has_more
+
+
+def prune_tombstones(project_id):
+    """
+    Purga las lapidas del proyecto mas antiguas que SYNC_TOMBSTONE_RETENTION_DAYS y sube el
+    sync_floor del proyecto para que un cursor anterior reciba 410. No hace commit.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(days=current_app.config["SYNC_TOMBSTONE_RETENTION_DAYS"])
+    db.session.execute(text("""
+        WITH pruned AS (
+            DELETE FROM sync_tombstones
+            WHERE project_id = :project_id AND deleted_at < :cutoff
+            RETURNING sync_version
+        )
+        UPDATE projects SET sync_floor = greatest(sync_floor, (SELECT max(sync_version) FROM pruned))
+        WHERE id = :project_id AND EXISTS (SELECT 1 FROM pruned)
+    """), {"project_id": project_id, "cutoff": cutoff})
+
+
+def sync_page(entity, schema_cls, project_id, args):
+    """Respuesta de un listado con 'since'/'limit': {items, deleted, cursor, hasMore}."""
+    fields = parse_fields(args.get("fields"), entity)
+    since_version, since_time = parse_since(args.get("since"))
+    rows, deleted, cursor, has_more = list_changes(entity, project_id, since_version, since_time, parse_limit(args.get("limit")), fields)
+    return {
+        "items": schema_cls(many=True, only=fields).dump(rows),
+        "deleted": deleted,
+        "cursor": cursor,
+        "hasMore": has_more,
+    }
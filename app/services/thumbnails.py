@@ -0,0 +1,239 @@
+import hashlib
+import hmac
+import logging
+import os
+import shutil
+import tempfile
+import time
+from xml.sax.saxutils import escape
+
+from app.database import db
+from app.models import Class, Project, Relationship
+from app.services.jobs import job_runner
+from app.services.pubsub import pubsub
+
+logger = logging.getLogger(__name__)
+
+# Miniaturas SVG de los diagramas para el listado de proyectos.
+#
+# Despues de cada guardado ("project.saved") se encola un trabajo "thumbnail" (services/jobs.py)
+# que dibuja la miniatura y la guarda en <THUMBNAIL_DIR>/<project_id>/<version>.svg. Como la URL
+# lleva la version, el archivo nunca cambia y se sirve con cache de larga duracion. Todos los
+# workers reciben el evento, pero la cola deja un solo trabajo pendiente por proyecto, y si aun
+# asi coinciden dos, solo dibuja el que consigue crear el archivo de reserva (.claim). Las
+# peticiones nunca dibujan: si la miniatura aun no existe reciben un marcador y se encola el
+# trabajo. Las URLs firmadas caducan (la firma incluye la fecha de caducidad).
+
+BOX_WIDTH = 180
+BOX_HEIGHT = 100
+PADDING = 8
+STALE_CLAIM_SECONDS = 60
+
+
+def render_svg(classes, relationships, width, height):
+    """
+    classes: lista de (id, nombre, x, y); relationships: lista de (origen, destino, tipo).
+    Escala el diagrama completo para que entre en width x height.
+    """
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" viewBox="0 0 {width} {height}">',
+        f'<rect width="{width}" height="{height}" fill="#ffffff"/>',
+    ]
+    if classes:
+        min_x = min(item[2] for item in classes)
+        min_y = min(item[3] for item in classes)
+        span_x = max(item[2] for item in classes) + BOX_WIDTH - min_x
+        span_y = max(item[3] for item in classes) + BOX_HEIGHT - min_y
+        scale = min((width - 2 * PADDING) / span_x, (height - 2 * PADDING) / span_y, 1.0)
+        offset_x = (width - span_x * scale) / 2 - min_x * scale
+        offset_y = (height - span_y * scale) / 2 - min_y * scale
+        box_w, box_h = BOX_WIDTH * scale, BOX_HEIGHT * scale
+
+        centers = {
+            class_id: (x * scale + offset_x + box_w / 2, y * scale + offset_y + box_h / 2)
+            for class_id, _, x, y in classes
+        }
+        lines = []
+        for source, target, rel_type in relationships:
+            if source in centers and target in centers:
+                (x1, y1), (x2, y2) = centers[source], centers[target]
+                dash = ' stroke-dasharray="3 2"' if rel_type in ("realization", "dependency") else ""
+                lines.append(f'<line x1="{x1:.1f}" y1="{y1:.1f}" x2="{x2:.1f}" y2="{y2:.1f}"{dash}/>')
+        if lines:
+            parts.append('<g stroke="#94a3b8" stroke-width="1">' + "".join(lines) + "</g>")
+
+        boxes = []
+        for class_id, name, _, _ in classes:
+            cx, cy = centers[class_id]
+            boxes.append(f'<rect x="{cx - box_w / 2:.1f}" y="{cy - box_h / 2:.1f}" width="{box_w:.1f}" height="{box_h:.1f}" rx="{2 * scale:.1f}"/>')
+        parts.append('<g fill="#eef2ff" stroke="#4f46e5" stroke-width="1">' + "".join(boxes) + "</g>")
+
+        # Los nombres solo se dibujan si se pueden leer
+        font_size = 14 * scale
+        if font_size >= 6:
+            labels = []
+            for class_id, name, _, _ in classes:
+                cx, cy = centers[class_id]
+                labels.append(f'<text x="{cx:.1f}" y="{cy - box_h / 2 + font_size * 1.4:.1f}">{escape((name or "")[:40])}</text>')
+            parts.append(f'<g font-family="sans-serif" font-size="{font_size:.1f}" text-anchor="middle" fill="#1e1b4b">' + "".join(labels) + "</g>")
+    parts.append("</svg>")
+    return "".join(parts)
+
+
+def _position(value):
+    value = value if isinstance(value, dict) else {}
+    try:
+        return float(value.get("x") or 0), float(value.get("y") or 0)
+    except (TypeError, ValueError):
+        return 0.0, 0.0
+
+
+class ThumbnailService:
+    def __init__(self):
+        self.app = None
+        self.directory = None
+        self.width = 320
+        self.height = 200
+        self.url_ttl = 24 * 3600
+        self._placeholder = None
+
+    def init_app(self, app):
+        self.app = app
+        self.directory = app.config["THUMBNAIL_DIR"]
+        self.width = app.config["THUMBNAIL_WIDTH"]
+        self.height = app.config["THUMBNAIL_HEIGHT"]
+        self.url_ttl = app.config["THUMBNAIL_URL_TTL_SECONDS"]
+        os.makedirs(self.directory, exist_ok=True)
+
+    # --- URLs firmadas (las etiquetas <img> no pueden enviar el token JWT) ---
+
+    def expiry(self):
+        # Redondeada a intervalos de url_ttl: durante un intervalo el listado genera las mismas URLs
+        # (y el mismo ETag), y cada URL sigue valiendo al menos url_ttl despues de generarse
+        return (int(time.time()) // self.url_ttl + 2) * self.url_ttl
+
+    def signature(self, project_id, version, expires):
+        message = f"{project_id}:{version}:{expires}".encode("utf-8")
+        return hmac.new(self.app.config["SECRET_KEY"].encode("utf-8"), message, hashlib.sha256).hexdigest()[:32]
+
+    def verify(self, project_id, version, expires, signature):
+        """Devuelve la caducidad (epoch) si la firma es valida y no vencio; None en otro caso."""
+        try:
+            expires = int(expires)
+        except (TypeError, ValueError):
+            return None
+        if expires < time.time() or not hmac.compare_digest(self.signature(project_id, version, expires), signature or ""):
+            return None
+        return expires
+
+    def url(self, project_id, version):
+        expires = self.expiry()
+        return f"/api/projects/{project_id}/thumbnail/{version}.svg?exp={expires}&sig={self.signature(project_id, version, expires)}"
+
+    def placeholder(self):
+        """Lienzo vacio que se sirve mientras el trabajo dibuja la miniatura."""
+        if self._placeholder is None:
+            self._placeholder = render_svg([], [], self.width, self.height)
+        return self._placeholder
+
+    # --- Archivos ---
+
+    def path(self, project_id, version):
+        return os.path.join(self.directory, str(project_id), f"{version}.svg")
+
+    def lookup(self, project_id, version):
+        path = self.path(project_id, version)
+        return path if os.path.exists(path) else None
+
+    def invalidate(self, project_id):
+        shutil.rmtree(os.path.join(self.directory, str(project_id)), ignore_errors=True)
+
+    # --- Renderizado ---
+
+    def schedule(self, project_id):
+        if self.directory is None:
+            return
+        job_runner.enqueue("thumbnail", {"projectId": str(project_id)}, project_id=project_id, dedupe_key=f"thumbnail:{project_id}")
+
+    def render(self, project_id):
+        """Dibuja la version actual del proyecto si nadie lo hizo ya. Devuelve la ruta o None."""
+        project = db.session.query(Project.id, Project.updated_at, Project.is_deleted).filter_by(id=project_id).one_or_none()
+        if project is None or project.is_deleted:
+            return None
+        version = int(project.updated_at.timestamp() * 1_000_000)
+        path = self.path(project.id, version)
+        if os.path.exists(path):
+            return path
+
+        folder = os.path.dirname(path)
+        os.makedirs(folder, exist_ok=True)
+        claim = path + ".claim"
+        if not self._claim(claim):
+            return None
+        try:
+            classes = [
+                (row.id, row.name, *_position(row.position))
+                for row in db.session.query(Class.id, Class.name, Class.position).filter_by(project_id=project.id, is_deleted=False)
+            ]
+            relationships = db.session.query(
+                Relationship.source_class_id, Relationship.target_class_id, Relationship.relationship_type
+            ).filter_by(project_id=project.id, is_deleted=False).all()
+            svg = render_svg(classes, relationships, self.width, self.height)
+
+            fd, temp_path = tempfile.mkstemp(dir=folder, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as handle:
+                handle.write(svg)
+            os.replace(temp_path, path)
+            self._prune(folder, keep=os.path.basename(path))
+            return path
+        finally:
+            try:
+                os.unlink(claim)
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def _claim(claim):
+        try:
+            os.close(os.open(claim, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o600))
+            return True
+        except FileExistsError:
+            # Un worker que murio a mitad de camino no debe bloquear la miniatura para siempre
+            try:
+                if time.time() - os.path.getmtime(claim) > STALE_CLAIM_SECONDS:
+                    os.unlink(claim)
+            except FileNotFoundError:
+                pass
+            return False
+
+    @staticmethod
+    def _prune(folder, keep):
+        # Solo se borran versiones anteriores: un renderizado lento no puede borrar uno mas nuevo
+        keep_version = int(keep[:-len(".svg")])
+        for name in os.listdir(folder):
+            if name.endswith(".svg") and name[:-len(".svg")].isdigit() and int(name[:-len(".svg")]) < keep_version:
+                try:
+                    os.unlink(os.path.join(folder, name))
+                except FileNotFoundError:
+                    pass
+
+
+thumbnail_service = ThumbnailService()
+
+
+@job_runner.task("thumbnail", concurrency=2, max_attempts=2)
+def _render_thumbnail(payload):
+    path = thumbnail_service.render(payload["projectId"])
+    return {"rendered": path is not None}
+
+
+# El trabajo se encola una sola vez, en el proceso que publico el guardado
+@pubsub.subscribe("project.saved", origin_only=True)
+def _on_project_saved(data):
+    thumbnail_service.schedule(data["projectId"])
+
+
+@pubsub.subscribe("project.deleted")
+def _on_project_deleted(data):
+    if thumbnail_service.directory:
+        thumbnail_service.invalidate(data["projectId"])
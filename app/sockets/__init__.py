@@ -0,0 +1,28 @@
+from flask_socketio import SocketIO
+
+#en este archivo se define la extension de Socket.IO para la edicion colaborativa
+socketio = SocketIO()
+
+#se inicia igual que la bd: recibe la app y registra los eventos de cada espacio de nombres
+def init_sockets(app):
+    # Los handlers se importan antes de init_app para que queden registrados en cada servidor creado
+    from app.sockets import collaboration  # noqa: F401
+    from app.sockets.presence import presence_service
+    from app.services.pubsub import pubsub
+
+    options = {}
+    if pubsub.is_distributed:
+        # Con varios workers los emits se reparten entre procesos a traves del bus de eventos
+        from app.sockets.pubsub_manager import PubSubClientManager
+        options["client_manager"] = PubSubClientManager()
+
+    socketio.init_app(
+        app,
+        async_mode=app.config["SOCKETIO_ASYNC_MODE"],
+        cors_allowed_origins=app.config["SOCKETIO_CORS_ORIGINS"],
+        # Los espacios de nombres son dinamicos: uno por proyecto (/projects/<uuid>)
+        namespaces="*",
+        **options,
+    )
+    # La presencia y los cursores son locales a cada worker (los slots se asignan por proceso)
+    presence_service.init_app(app, lambda event, data, namespace: socketio.emit(event, data, namespace=namespace, ignore_queue=True))
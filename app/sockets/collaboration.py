@@ -0,0 +1,189 @@
+import logging
+import re
+import threading
+import uuid
+import weakref
+from http import HTTPStatus
+
+from flask import current_app, request, session
+from flask_jwt_extended import decode_token
+from flask_socketio import ConnectionRefusedError, emit
+
+from app.errors.errors import GenericError
+from app.models import Project, Users
+from app.services.autosave import autosave_buffer
+from app.services.diagram_operations import normalize_operation, serialize_operation_data
+from app.services.pubsub import pubsub
+from app.sockets import socketio
+from app.sockets.presence import presence_service
+
+logger = logging.getLogger(__name__)
+
+# Cada proyecto tiene su propio espacio de nombres: /projects/<uuid>
+PROJECT_NAMESPACE = re.compile(r"^/projects/([0-9a-fA-F-]{36})$")
+
+# Numero de secuencia asignado por el servidor a cada operacion, por proyecto. El contador
+# vive en el bus de eventos para que sea unico entre workers. El candado por proyecto mantiene
+# el mismo orden en el diario del autosave y en la difusion dentro de cada worker. Las referencias
+# son debiles: el candado vive mientras alguna operacion lo usa, asi el diccionario no crece con
+# cada proyecto que se abrio en la vida del worker.
+_project_locks = weakref.WeakValueDictionary()
+_locks_guard = threading.Lock()
+
+
+def _project_lock(project_id):
+    with _locks_guard:
+        lock = _project_locks.get(project_id)
+        if lock is None:
+            lock = _project_locks[project_id] = threading.Lock()
+        return lock
+
+
+def current_sequence(project_id):
+    return pubsub.current_sequence(str(project_id))
+
+
+def project_namespace(project_id):
+    return f"/projects/{project_id}"
+
+
+def _namespace_project_id():
+    match = PROJECT_NAMESPACE.match(request.namespace or "")
+    return uuid.UUID(match.group(1)) if match else None
+
+
+def _extract_token(auth):
+    """El token se acepta en el payload 'auth' del cliente, en el query string o en la cabecera."""
+    if isinstance(auth, dict) and auth.get("token"):
+        return auth["token"]
+    if request.args.get("token"):
+        return request.args["token"]
+    header = request.headers.get("Authorization", "")
+    if header.startswith("Bearer "):
+        return header[len("Bearer "):]
+    return None
+
+
+@socketio.on("connect", namespace="*")
+def on_connect(auth=None):
+    project_id = _namespace_project_id()
+    if project_id is None:
+        raise ConnectionRefusedError({"error": "invalid_namespace", "message": "Espacio de nombres no valido."})
+
+    token = _extract_token(auth)
+    if not token:
+        raise ConnectionRefusedError({"error": "unauthorized", "message": "Token de acceso faltante en la conexion."})
+
+    try:
+        claims = decode_token(token)
+    except Exception as err:
+        raise ConnectionRefusedError({"error": "invalid_token", "message": f"Token inválido: {err}"})
+
+    current_user_id = claims[current_app.config["JWT_IDENTITY_CLAIM"]]
+
+    project = Project.get_active().filter_by(id=project_id).one_or_none()
+    if not project:
+        raise ConnectionRefusedError({"error": "not_found", "message": "Proyecto no encontrado o eliminado."})
+    if str(project.user_id) != current_user_id:
+        raise ConnectionRefusedError({"error": "forbidden", "message": "Acceso denegado. El proyecto no te pertenece."})
+
+    session["user_id"] = current_user_id
+    user = Users.query.get(current_user_id)
+    slot, viewers = presence_service.join(request.namespace, request.sid, current_user_id, user.username if user else None)
+
+    emit("joined", {"projectId": str(project_id), "seq": current_sequence(project_id), "slot": slot})
+    emit("cursors", presence_service.selections(request.namespace))
+    emit("presence", {"viewers": viewers}, broadcast=True, ignore_queue=True)
+
+
+@socketio.on("disconnect", namespace="*")
+def on_disconnect(reason=None):
+    viewers = presence_service.leave(request.namespace, request.sid)
+    if viewers is not None:
+        emit("presence", {"viewers": viewers}, broadcast=True, include_self=False, ignore_queue=True)
+
+
+@socketio.on("cursor", namespace="*")
+def on_cursor(frame):
+    """Frame binario con la posicion del cursor y la seleccion; nunca se persiste."""
+    presence_service.update_cursor(request.namespace, request.sid, frame)
+
+
+@socketio.on("sync", namespace="*")
+def on_sync(payload=None):
+    """Devuelve la ultima secuencia para que el cliente detecte operaciones perdidas."""
+    project_id = _namespace_project_id()
+    return {"projectId": str(project_id), "seq": current_sequence(project_id)}
+
+
+@socketio.on("operation", namespace="*")
+def on_operation(payload):
+    """
+    Acepta una operacion granular (clase o relacion) en el buffer de autosave y la difunde al
+    resto de clientes del proyecto. El valor devuelto es el ack que recibe el emisor con la
+    secuencia asignada; en ese momento la operacion ya esta en el diario del autosave. Si algun
+    worker no recibio la difusion, el ack trae resync=True y los clientes reciben "resync".
+    """
+    project_id = _namespace_project_id()
+    client_op_id = payload.get("clientOpId") if isinstance(payload, dict) else None
+
+    with _project_lock(str(project_id)):
+        try:
+            project = Project.get_active().filter_by(id=project_id).one_or_none()
+            if not project:
+                raise GenericError(HTTPStatus.NOT_FOUND, HTTPStatus.NOT_FOUND.phrase, "Proyecto no encontrado o eliminado.")
+
+            op_type, data = normalize_operation(payload)
+            autosave_buffer.submit(project_id, [(op_type, data)])
+        except GenericError as e:
+            return {"error": e.error, "message": e.message, "clientOpId": client_op_id}
+        except Exception as err:
+            logger.exception("Error inesperado en la operacion colaborativa")
+            return {
+                "error": HTTPStatus.INTERNAL_SERVER_ERROR.phrase,
+                "message": "Error interno del servidor al aplicar la operacion.",
+                "clientOpId": client_op_id,
+            }
+
+        seq = pubsub.next_sequence(str(project_id))
+        operation = {
+            "seq": seq,
+            "type": op_type,
+            "data": serialize_operation_data(data),
+            "userId": session.get("user_id"),
+            "clientOpId": client_op_id,
+        }
+        # Los clientes de este worker la reciben directamente y los de los demas workers por el bus
+        emit("operation", operation, broadcast=True, include_self=False, ignore_queue=True)
+        delivered = pubsub.publish("collab.operation", {"projectId": str(project_id), "operation": operation}, local=False)
+
+    ack = {"seq": seq, "clientOpId": client_op_id, "id": str(data["id"])}
+    if not delivered:
+        # Algun worker no recibio la operacion: sus clientes no deben esperar una secuencia que no va
+        # a llegar, se les pide que vuelvan a cargar el estado (un evento pequeño que si cabe en el bus)
+        logger.warning("Operacion %s del proyecto %s sin difundir a todos los workers, se pide resincronizar", seq, project_id)
+        pubsub.publish("collab.resync", {"projectId": str(project_id), "seq": seq}, local=False)
+        ack["resync"] = True
+    return ack
+
+
+# --- Eventos del bus: cada worker avisa a sus propios clientes conectados ---
+
+@pubsub.subscribe("collab.operation")
+def on_remote_operation(data):
+    socketio.emit("operation", data["operation"], namespace=project_namespace(data["projectId"]), ignore_queue=True)
+
+
+@pubsub.subscribe("collab.resync")
+def on_resync(data):
+    socketio.emit("resync", data, namespace=project_namespace(data["projectId"]), ignore_queue=True)
+
+
+@pubsub.subscribe("project.saved")
+def on_project_saved(data):
+    socketio.emit("project_saved", data, namespace=project_namespace(data["projectId"]), ignore_queue=True)
+
+
+@pubsub.subscribe("project.deleted")
+def on_project_deleted(data):
+    socketio.emit("project_deleted", data, namespace=project_namespace(data["projectId"]), ignore_queue=True)
@@ -0,0 +1,91 @@
+import struct
+import uuid
+
+# Formato binario compacto para cursores y selecciones (todo little-endian).
+#
+# Cliente -> servidor (evento 'cursor'):
+#   version u8 | flags u8 | ts_cliente_ms u32 | x f32 | y f32 | n_seleccion u16 | n * uuid (16 bytes)
+#
+# Servidor -> clientes (evento 'cursors', un lote por proyecto y por tick):
+#   version u8 | n_entradas u16 | ts_servidor_ms u32
+#   por entrada: slot u16 | flags u8 | x f32 | y f32 | n_seleccion u16 | n * uuid (16 bytes)
+#
+# El slot identifica al espectador dentro del proyecto (ver el evento 'presence'), asi las
+# posiciones no repiten el id del usuario en cada mensaje.
+
+FRAME_VERSION = 1
+
+# El cursor esta dentro del lienzo (si no, el cliente lo oculta)
+FLAG_CURSOR_VISIBLE = 0x01
+# La entrada trae la seleccion completa; si no, la seleccion no cambio desde el ultimo lote
+FLAG_SELECTION = 0x02
+
+_CLIENT_HEADER = struct.Struct("<BBIffH")
+_BATCH_HEADER = struct.Struct("<BHI")
+_ENTRY_HEADER = struct.Struct("<HBffH")
+_UUID_SIZE = 16
+
+
+class FrameError(ValueError):
+    pass
+
+
+def _read_selection(data, offset, count):
+    end = offset + count * _UUID_SIZE
+    if end != len(data):
+        raise FrameError("Longitud de seleccion inconsistente.")
+    return tuple(data[start:start + _UUID_SIZE] for start in range(offset, end, _UUID_SIZE))
+
+
+def decode_client_frame(data, max_selection):
+    """Devuelve (flags, ts_cliente, x, y, seleccion) con la seleccion como tupla de bytes crudos."""
+    if not isinstance(data, (bytes, bytearray)) or len(data) < _CLIENT_HEADER.size:
+        raise FrameError("Frame de cursor demasiado corto.")
+
+    version, flags, client_ts, x, y, count = _CLIENT_HEADER.unpack_from(data)
+    if version != FRAME_VERSION:
+        raise FrameError(f"Version de frame no soportada: {version}")
+    if count > max_selection:
+        raise FrameError("La seleccion supera el maximo permitido.")
+    if x != x or y != y:
+        raise FrameError("Coordenadas no validas.")
+
+    selection = _read_selection(bytes(data), _CLIENT_HEADER.size, count)
+    return flags, client_ts, x, y, selection
+
+
+def encode_client_frame(x, y, client_ts, selection=(), visible=True):
+    """Codifica un frame de cliente (usado por clientes Python y por el benchmark)."""
+    flags = (FLAG_CURSOR_VISIBLE if visible else 0) | (FLAG_SELECTION if selection else 0)
+    raw = [item.bytes if isinstance(item, uuid.UUID) else item for item in selection]
+    return _CLIENT_HEADER.pack(FRAME_VERSION, flags, client_ts & 0xFFFFFFFF, x, y, len(raw)) + b"".join(raw)
+
+
+def encode_batch(entries, server_ts):
+    """entries: iterable de (slot, flags, x, y, seleccion o None)."""
+    parts = []
+    count = 0
+    for slot, flags, x, y, selection in entries:
+        if selection is None:
+            parts.append(_ENTRY_HEADER.pack(slot, flags & ~FLAG_SELECTION, x, y, 0))
+        else:
+            parts.append(_ENTRY_HEADER.pack(slot, flags | FLAG_SELECTION, x, y, len(selection)))
+            parts.extend(selection)
+        count += 1
+    return _BATCH_HEADER.pack(FRAME_VERSION, count, server_ts & 0xFFFFFFFF) + b"".join(parts)
+
+
+def decode_batch(data):
+    """Decodifica un lote del servidor a una lista de dicts (para clientes Python y pruebas)."""
+    version, count, server_ts = _BATCH_HEADER.unpack_from(data)
+    offset = _BATCH_HEADER.size
+    entries = []
+    for _ in range(count):
+        slot, flags, x, y, n_selection = _ENTRY_HEADER.unpack_from(data, offset)
+        offset += _ENTRY_HEADER.size
+        selection = None
+        if flags & FLAG_SELECTION:
+            selection = [str(uuid.UUID(bytes=bytes(data[offset + i * _UUID_SIZE:offset + (i + 1) * _UUID_SIZE]))) for i in range(n_selection)]
+            offset += n_selection * _UUID_SIZE
+        entries.append({"slot": slot, "flags": flags, "x": x, "y": y, "selection": selection})
+    return {"version": version, "serverTs": server_ts, "entries": entries}
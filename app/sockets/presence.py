@@ -0,0 +1,172 @@
+import logging
+import os
+import threading
+import time
+
+from app.sockets.cursor_frames import FLAG_SELECTION, FrameError, decode_client_frame, encode_batch
+
+logger = logging.getLogger(__name__)
+
+# Presencia (quien ve cada proyecto) y posiciones de cursor/seleccion en vivo.
+# Todo vive en memoria del worker y nunca toca la BD. Los cursores se muestrean: de cada
+# cliente solo se conserva la ultima posicion recibida y se difunde como mucho una vez por
+# tick, en un unico lote binario por proyecto. Asi el coste de difusion por tick es
+# O(espectadores) en lugar de O(espectadores x mensajes recibidos).
+
+
+def _now_ms():
+    return int(time.monotonic() * 1000)
+
+
+def _is_newer(ts, previous):
+    # Comparacion con desbordamiento de u32 (el reloj del cliente da la vuelta cada ~49 dias)
+    return previous is None or 0 < ((ts - previous) & 0xFFFFFFFF) < 0x80000000
+
+
+class _Viewer:
+    __slots__ = ("sid", "slot", "user_id", "username", "last_client_ts", "selection", "pending", "received_at")
+
+    def __init__(self, sid, slot, user_id, username):
+        self.sid = sid
+        self.slot = slot
+        self.user_id = user_id
+        self.username = username
+        self.last_client_ts = None
+        self.selection = ()
+        # Ultimo cursor aceptado y aun no difundido: (flags, x, y, seleccion o None)
+        self.pending = None
+        self.received_at = 0
+
+
+class PresenceService:
+    def __init__(self, emit=None):
+        self._emit = emit
+        self._projects = {}  # namespace -> {sid: _Viewer}
+        self._lock = threading.Lock()
+        self._ticker_pid = None
+        self.interval_ms = 50
+        self.stale_ms = 1000
+        self.max_selection = 256
+
+    def init_app(self, app, emit):
+        self._emit = emit
+        self.interval_ms = app.config["CURSOR_BROADCAST_INTERVAL_MS"]
+        self.stale_ms = app.config["CURSOR_STALE_MS"]
+        self.max_selection = app.config["CURSOR_MAX_SELECTION"]
+
+    # --- Presencia ---
+
+    def join(self, namespace, sid, user_id, username):
+        with self._lock:
+            viewers = self._projects.setdefault(namespace, {})
+            used = {viewer.slot for viewer in viewers.values()}
+            slot = next(candidate for candidate in range(len(used) + 1) if candidate not in used)
+            viewers[sid] = _Viewer(sid, slot, user_id, username)
+            snapshot = self._snapshot(viewers)
+        self._ensure_ticker()
+        return slot, snapshot
+
+    def leave(self, namespace, sid):
+        with self._lock:
+            viewers = self._projects.get(namespace)
+            if not viewers or viewers.pop(sid, None) is None:
+                return None
+            if not viewers:
+                del self._projects[namespace]
+            return self._snapshot(viewers)
+
+    def viewers(self, namespace):
+        with self._lock:
+            return self._snapshot(self._projects.get(namespace, {}))
+
+    def selections(self, namespace):
+        """Lote con la seleccion actual de todos, para que un cliente recien unido parta completo."""
+        with self._lock:
+            entries = [
+                (viewer.slot, FLAG_SELECTION, 0.0, 0.0, viewer.selection)
+                for viewer in self._projects.get(namespace, {}).values()
+            ]
+        return encode_batch(entries, _now_ms())
+
+    @staticmethod
+    def _snapshot(viewers):
+        return [
+            {"slot": viewer.slot, "userId": viewer.user_id, "username": viewer.username}
+            for viewer in sorted(viewers.values(), key=lambda viewer: viewer.slot)
+        ]
+
+    # --- Cursores ---
+
+    def update_cursor(self, namespace, sid, frame):
+        """
+        Registra el ultimo cursor de un cliente. Devuelve False si el frame se descarta
+        (mal formado, fuera de orden o de un cliente que ya no esta en el proyecto).
+        """
+        try:
+            flags, client_ts, x, y, selection = decode_client_frame(frame, self.max_selection)
+        except FrameError:
+            return False
+
+        with self._lock:
+            viewer = self._projects.get(namespace, {}).get(sid)
+            if viewer is None or not _is_newer(client_ts, viewer.last_client_ts):
+                return False
+
+            viewer.last_client_ts = client_ts
+            changed = None
+            if flags & FLAG_SELECTION and selection != viewer.selection:
+                viewer.selection = changed = selection
+            elif viewer.pending is not None:
+                # Si la posicion anterior no alcanzo a difundirse, su cambio de seleccion se conserva
+                changed = viewer.pending[3]
+            viewer.pending = (flags, x, y, changed)
+            viewer.received_at = _now_ms()
+        return True
+
+    def collect(self):
+        """
+        Extrae los lotes listos para difundir: [(namespace, bytes)]. Las posiciones mas viejas
+        que el umbral de caducidad se descartan en lugar de enviarse tarde.
+        """
+        now = _now_ms()
+        batches = []
+        with self._lock:
+            for namespace, viewers in self._projects.items():
+                entries = []
+                for viewer in viewers.values():
+                    if viewer.pending is None:
+                        continue
+                    if now - viewer.received_at <= self.stale_ms:
+                        flags, x, y, selection = viewer.pending
+                        entries.append((viewer.slot, flags, x, y, selection))
+                    viewer.pending = None
+                if entries:
+                    batches.append((namespace, encode_batch(entries, now)))
+        return batches
+
+    def tick(self):
+        batches = self.collect()
+        for namespace, payload in batches:
+            self._emit("cursors", payload, namespace=namespace)
+        return batches
+
+    def _ensure_ticker(self):
+        # Un hilo por worker; se arranca bajo demanda porque los hilos no sobreviven al fork
+        with self._lock:
+            if self._ticker_pid == os.getpid():
+                return
+            self._ticker_pid = os.getpid()
+        threading.Thread(target=self._run, name="presence-ticker", daemon=True).start()
+
+    def _run(self):
+        while True:
+            started = time.monotonic()
+            try:
+                self.tick()
+            except Exception as err:
+                logger.exception("Error al difundir cursores")
+            elapsed = time.monotonic() - started
+            time.sleep(max(self.interval_ms / 1000 - elapsed, 0.001))
+
+
+presence_service = PresenceService()
@@ -0,0 +1,27 @@
+import queue
+
+import socketio
+
+from app.services.pubsub import pubsub
+
+
+class PubSubClientManager(socketio.PubSubManager):
+    """
+    Gestor de clientes de Socket.IO que usa el bus de eventos de la app como cola de mensajes,
+    asi un emit hecho en un worker de gunicorn llega tambien a los clientes de los demas.
+    """
+    name = "app-pubsub"
+
+    def __init__(self, channel="socketio", write_only=False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self._messages = queue.Queue()
+        pubsub.subscribe(self.channel, self._messages.put)
+
+    def _publish(self, data):
+        # El propio host ya proceso el mensaje en PubSubManager.emit
+        pubsub.publish(self.channel, data, local=False)
+
+    def _listen(self):
+        pubsub.start()
+        while True:
+            yield self._messages.get()
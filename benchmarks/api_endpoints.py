@@ -0,0 +1,252 @@
+"""
+Benchmark reproducible de los endpoints de proyectos, clases y relaciones con diagramas sinteticos.
+
+Crea usuarios y proyectos sinteticos (por defecto de 10, 100, 1000 y 10000 clases, con ~1.5
+relaciones por clase) y recorre la API con el cliente de pruebas de Flask contra PostgreSQL. Por
+endpoint y tamaño registra los percentiles de latencia, el numero de consultas SQL por peticion,
+el tamaño de la respuesta y el pico de memoria de Python (tracemalloc, en una pasada aparte para
+no inflar las latencias; no incluye los buffers de psycopg2).
+
+El esquema depende de PostgreSQL (uuid_generate_v4, triggers de busqueda y sincronizacion,
+columnas generadas), asi que no hay modo SQLite: usa una base migrada (flask db upgrade). Por
+defecto es la de la configuracion normal; BENCH_DATABASE_URL apunta a otra. Los usuarios creados
+se borran al terminar.
+
+Uso:
+    python -m benchmarks.api_endpoints --sizes 10 100 1000 --save-baseline benchmarks/baselines/local.json
+    python -m benchmarks.api_endpoints --sizes 10 100 1000 --baseline benchmarks/baselines/local.json
+
+Con --baseline el proceso termina con codigo 1 si algun endpoint empeora mas que --tolerance.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timezone
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import delete, event, text
+
+from app import create_app
+from app.config.config import Config
+from app.database import db
+from app.models import Users
+from benchmarks.synthetic import synthetic_diagram
+
+
+class BenchConfig(Config):
+    SQLALCHEMY_ECHO = False
+    SQLALCHEMY_DATABASE_URI = os.getenv("BENCH_DATABASE_URL", Config.SQLALCHEMY_DATABASE_URI)
+    # Los archivos que generan los servicios (miniaturas, diario de autosave, zips) van a un temporal
+    _workdir = tempfile.mkdtemp(prefix="bench-")
+    THUMBNAIL_DIR = os.path.join(_workdir, "thumbnails")
+    AUTOSAVE_JOURNAL_DIR = os.path.join(_workdir, "autosave")
+    CODEGEN_CACHE_DIR = os.path.join(_workdir, "exports")
+    JOB_SPOOL_DIR = os.path.join(_workdir, "jobs")
+
+
+def create_user(app):
+    """Usuario sintetico insertado directamente (sin bcrypt) y su token JWT."""
+    with app.app_context():
+        suffix = uuid.uuid4().hex[:12]
+        user = Users(name="Bench", username=f"bench_{suffix}", email=f"bench_{suffix}@bench.local", password="!")
+        db.session.add(user)
+        db.session.commit()
+        user_id = str(user.id)
+        token = create_access_token(identity=user_id)
+        db.session.remove()
+    return user_id, {"Authorization": f"Bearer {token}"}
+
+
+def delete_users(app, user_ids):
+    # El borrado en cascada de la BD se lleva proyectos, clases, relaciones y revisiones
+    with app.app_context():
+        project_ids = [row[0] for row in db.session.execute(
+            text("SELECT id FROM projects WHERE user_id = ANY(:ids)"), {"ids": [uuid.UUID(item) for item in user_ids]}
+        )]
+        db.session.execute(delete(Users).where(Users.id.in_([uuid.UUID(item) for item in user_ids])))
+        if project_ids:
+            db.session.execute(text("DELETE FROM sync_tombstones WHERE project_id = ANY(:ids)"), {"ids": project_ids})
+        db.session.commit()
+        db.session.remove()
+
+
+# --- Medicion ---
+
+class QueryCounter:
+    """Cuenta las sentencias SQL que ejecuta el hilo del benchmark (no las de hilos de fondo)."""
+
+    def __init__(self, engine):
+        self.count = 0
+        self._thread = threading.get_ident()
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args):
+        if threading.get_ident() == self._thread:
+            self.count += 1
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def measure(client, counter, request, repeat, warmup, budget):
+    """Ejecuta request() hasta 'repeat' veces (minimo 3 si se acaba el presupuesto de segundos)."""
+    for _ in range(warmup):
+        request(client)
+
+    latencies, queries = [], []
+    size = 0
+    started = time.perf_counter()
+    for index in range(repeat):
+        counter.count = 0
+        t0 = time.perf_counter()
+        response = request(client)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        queries.append(counter.count)
+        if response.status_code >= 400:
+            raise RuntimeError(f"Respuesta {response.status_code}: {response.get_data(as_text=True)[:300]}")
+        size = len(response.get_data())
+        if index >= 2 and time.perf_counter() - started > budget:
+            break
+
+    # Pasada aparte con tracemalloc: el rastreo hace todo varias veces mas lento
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    request(client)
+    peak = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+
+    return {
+        "samples": len(latencies),
+        "mean_ms": round(statistics.fmean(latencies), 3),
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p90_ms": round(percentile(latencies, 0.90), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "max_ms": round(max(latencies), 3),
+        "queries": max(queries),
+        "response_bytes": size,
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def run(sizes, repeat, warmup, budget, filler_projects, seed):
+    app = create_app(BenchConfig)
+    client = app.test_client()
+    with app.app_context():
+        counter = QueryCounter(db.engine)
+
+    results = {}
+    user_ids = []
+    try:
+        for size in sizes:
+            user_id, headers = create_user(app)
+            user_ids.append(user_id)
+            diagram = synthetic_diagram(size, seed=seed + size)
+
+            for index in range(filler_projects):
+                client.post("/api/projects", json={"name": f"Relleno {index}"}, headers=headers)
+
+            created = []
+
+            def create_project(c):
+                response = c.post("/api/projects", json={"name": f"Bench {size}"}, headers=headers)
+                created.append(response.get_json()["id"])
+                return response
+
+            # El primer proyecto creado es el que se guarda y se lee en el resto de endpoints
+            endpoints = [
+                ("create_project", create_project),
+                ("save_project_data", lambda c: c.post(f"/api/projects/{created[0]}/save", json=diagram, headers=headers)),
+                ("get_project_data", lambda c: c.get(f"/api/projects/{created[0]}", headers=headers)),
+                ("get_classes_by_project", lambda c: c.get(f"/api/classes/?projectId={created[0]}", headers=headers)),
+                ("get_relationships_by_project", lambda c: c.get(f"/api/relationships/?projectId={created[0]}", headers=headers)),
+                ("get_user_projects", lambda c: c.get("/api/projects/list", headers=headers)),
+            ]
+            for name, request in endpoints:
+                key = f"{name}@{size}"
+                results[key] = measure(client, counter, request, repeat, warmup, budget)
+                row = results[key]
+                print(f"{key:<36} p50 {row['p50_ms']:>9.2f} ms  p90 {row['p90_ms']:>9.2f} ms  p99 {row['p99_ms']:>9.2f} ms  "
+                      f"consultas {row['queries']:>5}  pico {row['peak_kib']:>9.1f} KiB  {row['response_bytes']:>9} B",
+                      file=sys.stderr)
+    finally:
+        delete_users(app, user_ids)
+
+    return {
+        "meta": {
+            "date": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "sizes": sizes,
+            "repeat": repeat,
+            "seed": seed,
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline, tolerance):
+    """Tabla de diferencias contra la linea base; devuelve las claves que empeoraron."""
+    regressions = []
+    print(f"\n{'endpoint@tamaño':<36} {'p50 base':>10} {'p50 ahora':>10} {'cambio':>8} {'consultas':>11}")
+    for key, row in current["results"].items():
+        base = baseline["results"].get(key)
+        if base is None:
+            print(f"{key:<36} {'-':>10} {row['p50_ms']:>10.2f} {'nuevo':>8}")
+            continue
+        ratio = row["p50_ms"] / base["p50_ms"] if base["p50_ms"] else 1.0
+        queries = f"{base['queries']}->{row['queries']}"
+        worse = ratio > 1 + tolerance or row["queries"] > base["queries"]
+        if worse:
+            regressions.append(key)
+        print(f"{key:<36} {base['p50_ms']:>10.2f} {row['p50_ms']:>10.2f} {(ratio - 1) * 100:>+7.1f}% {queries:>11}{'  <-- peor' if worse else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=10, help="peticiones medidas por endpoint y tamaño")
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--budget", type=float, default=30.0, help="segundos maximos por endpoint (minimo 3 muestras)")
+    parser.add_argument("--filler-projects", type=int, default=20, help="proyectos vacios extra por usuario (para el listado)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="guarda los resultados en este JSON")
+    parser.add_argument("--save-baseline", help="guarda los resultados como linea base")
+    parser.add_argument("--baseline", help="compara contra esta linea base")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="empeoramiento de p50 tolerado (0.15 = 15%%)")
+    args = parser.parse_args()
+
+    current = run(args.sizes, args.repeat, args.warmup, args.budget, args.filler_projects, args.seed)
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as handle:
+                json.dump(current, handle, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as handle:
+            regressions = compare(current, json.load(handle), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} endpoint(s) empeoraron: {', '.join(regressions)}", file=sys.stderr)
+            sys.exit(1)
+    elif not args.output and not args.save_baseline:
+        print(json.dumps(current, indent=2))
+
+
+if __name__ == "__main__":
+    main()
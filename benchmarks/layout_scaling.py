@@ -0,0 +1,105 @@
+"""
+Prueba de rendimiento del layout de fuerzas vectorizado con 1k y 5k clases.
+
+Genera grafos sinteticos parecidos a un modelo importado (un arbol de herencia mas asociaciones
+aleatorias) y mide el tiempo por iteracion, el tiempo total y el pico de memoria de NumPy. Con
+--naive tambien mide una iteracion de la version con bucles de Python por nodo, como referencia.
+
+Uso:
+    python -m benchmarks.layout_scaling --sizes 1000 5000 --iterations 50
+"""
+import argparse
+import json
+import math
+import time
+import tracemalloc
+
+import numpy as np
+
+from app.services.layout import force_directed_layout
+
+
+def synthetic_edges(count, extra_ratio, seed):
+    rng = np.random.default_rng(seed)
+    nodes = np.arange(1, count)
+    tree = np.column_stack((nodes, rng.integers(0, nodes)))
+    extra = rng.integers(0, count, size=(int(count * extra_ratio), 2))
+    return np.concatenate((tree, extra))
+
+
+def naive_iteration(positions, edges, k):
+    # Una iteracion de Fruchterman-Reingold con bucles por nodo, solo para comparar
+    count = len(positions)
+    displacement = [[0.0, 0.0] for _ in range(count)]
+    for i in range(count):
+        xi, yi = positions[i]
+        for j in range(count):
+            if i == j:
+                continue
+            dx, dy = xi - positions[j][0], yi - positions[j][1]
+            dist2 = max(dx * dx + dy * dy, 1e-9)
+            displacement[i][0] += dx * k * k / dist2
+            displacement[i][1] += dy * k * k / dist2
+    for source, target in edges:
+        dx = positions[source][0] - positions[target][0]
+        dy = positions[source][1] - positions[target][1]
+        factor = math.sqrt(dx * dx + dy * dy) / k
+        displacement[source][0] -= dx * factor
+        displacement[source][1] -= dy * factor
+        displacement[target][0] += dx * factor
+        displacement[target][1] += dy * factor
+    return displacement
+
+
+def edge_ratio(positions, edges, seed):
+    """Longitud media de las relaciones frente a la distancia media entre pares al azar (menor es mejor)."""
+    rng = np.random.default_rng(seed)
+    edge_length = np.linalg.norm(positions[edges[:, 0]] - positions[edges[:, 1]], axis=1).mean()
+    pairs = rng.integers(0, len(positions), size=(10_000, 2))
+    random_length = np.linalg.norm(positions[pairs[:, 0]] - positions[pairs[:, 1]], axis=1).mean()
+    return edge_length / random_length
+
+
+def run(count, iterations, chunk_size, extra_ratio, naive, seed=0):
+    edges = synthetic_edges(count, extra_ratio, seed)
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    positions = force_directed_layout(count, edges, iterations=iterations, seed=seed, chunk_size=chunk_size)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {
+        "classes": count,
+        "relationships": len(edges),
+        "iterations": iterations,
+        "chunkSize": chunk_size,
+        "totalSeconds": round(elapsed, 3),
+        "millisPerIteration": round(elapsed / iterations * 1000, 2),
+        "peakMemoryMB": round(peak / 1024 / 1024, 1),
+        "edgeLengthRatio": round(float(edge_ratio(positions, edges, seed)), 4),
+    }
+
+    if naive:
+        rng = np.random.default_rng(seed)
+        points = rng.random((count, 2)).tolist()
+        started = time.perf_counter()
+        naive_iteration(points, edges.tolist(), 1.0 / math.sqrt(count))
+        naive_seconds = time.perf_counter() - started
+        result["naiveMillisPerIteration"] = round(naive_seconds * 1000, 1)
+        result["speedup"] = round(naive_seconds * 1000 / result["millisPerIteration"], 1)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000])
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("--extra-ratio", type=float, default=0.5, help="asociaciones extra por clase, ademas del arbol")
+    parser.add_argument("--naive", action="store_true", help="mide tambien una iteracion con bucles de Python")
+    args = parser.parse_args()
+
+    results = [run(size, args.iterations, args.chunk_size, args.extra_ratio, args.naive) for size in args.sizes]
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,439 @@
+"""
+Prueba de carga con usuarios virtuales que reproducen sesiones de edicion contra una instancia en marcha.
+
+Cada usuario virtual es una corrutina de asyncio con su propia conexion HTTP/1.1 persistente (solo
+biblioteca estandar, sin dependencias extra). Repite su escenario hasta que termina la etapa:
+inicio de sesion, listado de proyectos, apertura del proyecto, rafagas de autosave (/save) con
+pausas de "pensar" y lecturas concurrentes del proyecto (varias pestañas). La concurrencia sube
+por etapas y, por etapa y ruta, se informa el rendimiento (peticiones/s), los percentiles de
+latencia y la tasa de error. Se marca un "precipicio" cuando la tasa de error supera
+--max-error-rate o cuando el rendimiento deja de crecer mientras la latencia p99 se dispara.
+
+Los usuarios se registran una sola vez (loadtest<N>@loadtest.local, reutilizables entre
+ejecuciones) y cada uno trabaja sobre su propio proyecto "Carga", creado en la preparacion.
+
+Uso:
+    python -m benchmarks.load_sessions --url http://127.0.0.1:8000 --stages 5:30 20:30 50:30 100:30
+    python -m benchmarks.load_sessions --scenarios escenarios.json --output carga.json
+
+Formato de --scenarios (los pesos reparten los usuarios virtuales entre escenarios):
+    {"editor": {"weight": 3, "steps": [{"action": "login"}, {"action": "open_project"},
+                {"action": "save", "repeat": 20, "think_ms": [500, 3000]}]}}
+Acciones: login, list_projects, open_project (con "parallel": N peticiones a la vez), save
+(con "repeat", "think_ms" y "mutate": fraccion de clases que cambian en cada guardado) y think.
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+from urllib.parse import urlsplit
+
+from benchmarks.synthetic import synthetic_diagram
+
+DEFAULT_SCENARIOS = {
+    # Quien edita: abre su proyecto y el autosave dispara /save cada pocos segundos
+    "editor": {
+        "weight": 3,
+        "steps": [
+            {"action": "login"},
+            {"action": "list_projects"},
+            {"action": "open_project"},
+            {"action": "save", "repeat": 15, "think_ms": [1000, 4000], "mutate": 0.05},
+        ],
+    },
+    # Quien revisa: entra, lista y abre el proyecto desde varias pestañas
+    "viewer": {
+        "weight": 1,
+        "steps": [
+            {"action": "login"},
+            {"action": "list_projects"},
+            {"action": "open_project", "parallel": 4},
+            {"action": "think", "think_ms": [2000, 6000]},
+            {"action": "open_project"},
+        ],
+    },
+}
+
+PASSWORD = "carga-1234"
+
+
+# --- Cliente HTTP minimo ---
+
+class HttpError(Exception):
+    pass
+
+
+class Connection:
+    """Conexion HTTP/1.1 con keep-alive; se reabre sola si el servidor la cierra."""
+
+    def __init__(self, host, port, timeout):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._reader = None
+        self._writer = None
+
+    async def request(self, method, path, body=None, headers=None):
+        payload = json.dumps(body).encode() if body is not None else b""
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}", f"Content-Length: {len(payload)}"]
+        if body is not None:
+            lines.append("Content-Type: application/json")
+        for name, value in (headers or {}).items():
+            lines.append(f"{name}: {value}")
+        raw = ("\r\n".join(lines) + "\r\n\r\n").encode() + payload
+
+        # Un solo reintento: el servidor pudo cerrar la conexion inactiva entre dos peticiones
+        for attempt in (0, 1):
+            try:
+                if self._writer is None:
+                    self._reader, self._writer = await asyncio.wait_for(
+                        asyncio.open_connection(self.host, self.port), self.timeout
+                    )
+                self._writer.write(raw)
+                await self._writer.drain()
+                return await asyncio.wait_for(self._read_response(), self.timeout)
+            except (ConnectionError, asyncio.IncompleteReadError) as err:
+                self.close()
+                if attempt:
+                    raise HttpError(f"conexion: {err}") from err
+            except asyncio.TimeoutError as err:
+                self.close()
+                raise HttpError("timeout") from err
+
+    async def _read_response(self):
+        status_line = await self._reader.readuntil(b"\r\n")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await self._reader.readuntil(b"\r\n")
+            if line == b"\r\n":
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await self._reader.readuntil(b"\r\n")).split(b";")[0], 16)
+                chunk = await self._reader.readexactly(size + 2)
+                if size == 0:
+                    break
+                chunks.append(chunk[:-2])
+            data = b"".join(chunks)
+        elif "content-length" in headers:
+            data = await self._reader.readexactly(int(headers["content-length"]))
+        else:
+            data = await self._reader.read()
+            headers["connection"] = "close"
+
+        if headers.get("connection", "").lower() == "close":
+            self.close()
+        return status, data
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+
+# --- Estadisticas ---
+
+class StageStats:
+    def __init__(self, concurrency):
+        self.concurrency = concurrency
+        self.latencies = {}
+        self.errors = {}
+        self.error_samples = {}
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def record(self, route, elapsed_ms, error=None):
+        self.latencies.setdefault(route, []).append(elapsed_ms)
+        if error:
+            self.errors[route] = self.errors.get(route, 0) + 1
+            self.error_samples.setdefault(route, error)
+
+    def summary(self):
+        duration = (self.finished or time.perf_counter()) - self.started
+        routes = {}
+        total = errors = 0
+        for route, samples in sorted(self.latencies.items()):
+            count, failed = len(samples), self.errors.get(route, 0)
+            total, errors = total + count, errors + failed
+            ordered = sorted(samples)
+            routes[route] = {
+                "requests": count,
+                "throughput_rps": round(count / duration, 2),
+                "p50_ms": round(_percentile(ordered, 0.50), 2),
+                "p95_ms": round(_percentile(ordered, 0.95), 2),
+                "p99_ms": round(_percentile(ordered, 0.99), 2),
+                "max_ms": round(ordered[-1], 2),
+                "mean_ms": round(statistics.fmean(ordered), 2),
+                "error_rate": round(failed / count, 4),
+                "first_error": self.error_samples.get(route),
+            }
+        every = sorted(value for samples in self.latencies.values() for value in samples)
+        return {
+            "concurrency": self.concurrency,
+            "seconds": round(duration, 2),
+            "requests": total,
+            "throughput_rps": round(total / duration, 2) if duration else 0.0,
+            "p99_ms": round(_percentile(every, 0.99), 2) if every else 0.0,
+            "error_rate": round(errors / total, 4) if total else 0.0,
+            "routes": routes,
+        }
+
+
+def _percentile(ordered, fraction):
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def find_cliffs(stages, max_error_rate):
+    """Etapas donde la tasa de error cruza el umbral o el servidor se satura (mas carga, igual rendimiento)."""
+    cliffs = []
+    for previous, current in zip([None] + stages, stages):
+        if current["error_rate"] > max_error_rate and (previous is None or previous["error_rate"] <= max_error_rate):
+            cliffs.append({
+                "concurrency": current["concurrency"],
+                "kind": "errors",
+                "detail": f"tasa de error {current['error_rate']:.1%} (umbral {max_error_rate:.1%})",
+            })
+        if previous and previous["throughput_rps"] and previous["p99_ms"]:
+            load_growth = current["concurrency"] / previous["concurrency"]
+            throughput_growth = current["throughput_rps"] / previous["throughput_rps"]
+            latency_growth = current["p99_ms"] / previous["p99_ms"]
+            if load_growth >= 1.5 and throughput_growth < 1.1 and latency_growth > 2:
+                cliffs.append({
+                    "concurrency": current["concurrency"],
+                    "kind": "saturation",
+                    "detail": f"carga x{load_growth:.1f}, rendimiento x{throughput_growth:.2f}, p99 x{latency_growth:.1f}",
+                })
+    return cliffs
+
+
+# --- Usuarios virtuales ---
+
+class VirtualUser:
+    def __init__(self, index, scenario, options, current):
+        self.index = index
+        self.scenario = scenario
+        self.options = options
+        # Etapa vigente compartida por todos: {"stats": StageStats o None durante la preparacion}
+        self.current = current
+        self.email = f"{options.user_prefix}{index}@loadtest.local"
+        self.connection = Connection(options.host, options.port, options.timeout)
+        self.rng = random.Random(options.seed + index)
+        self.token = None
+        self.project_id = None
+        self.diagram = None
+
+    @property
+    def headers(self):
+        return {"Authorization": f"Bearer {self.token}"}
+
+    async def call(self, route, method, path, body=None, connection=None):
+        started = time.perf_counter()
+        error = None
+        status, data = 0, b""
+        try:
+            status, data = await (connection or self.connection).request(method, path, body, self.headers if self.token else None)
+            if status >= 400:
+                error = f"HTTP {status}: {data[:200].decode(errors='replace')}"
+        except HttpError as err:
+            error = str(err)
+        # Se anota en la etapa en la que termina la peticion
+        stats = self.current["stats"]
+        if stats is not None:
+            stats.record(route, (time.perf_counter() - started) * 1000, error)
+        return status, data
+
+    async def setup(self):
+        """Registro (si hace falta), inicio de sesion y proyecto de trabajo; no se mide."""
+        await self.call("register", "POST", "/api/auth/registrar",
+                        {"nombre": f"Carga {self.index}", "email": self.email, "password": PASSWORD})
+        await self.login()
+        if not self.token:
+            raise RuntimeError(f"No se pudo iniciar sesion como {self.email}")
+
+        status, data = await self.call("list_projects", "GET", "/api/projects/list")
+        existing = [item for item in json.loads(data) if item["name"] == "Carga"] if status == 200 else []
+        if existing:
+            self.project_id = existing[0]["id"]
+        else:
+            status, data = await self.call("create_project", "POST", "/api/projects", {"name": "Carga"})
+            if status != 201:
+                raise RuntimeError(f"No se pudo crear el proyecto de {self.email}: HTTP {status}")
+            self.project_id = json.loads(data)["id"]
+
+        self.diagram = synthetic_diagram(self.options.classes, seed=self.options.seed + self.index)
+        await self.call("save", "POST", f"/api/projects/{self.project_id}/save", self.diagram)
+
+    async def login(self):
+        self.token = None
+        status, data = await self.call("login", "POST", "/api/auth/login", {"email": self.email, "password": PASSWORD})
+        if status == 200:
+            self.token = json.loads(data)["access_token"]
+
+    async def think(self, step):
+        low, high = step.get("think_ms", (0, 0))
+        await asyncio.sleep(self.rng.uniform(low, high) / 1000 * self.options.think_scale)
+
+    def mutate(self, fraction):
+        # Cambios pequeños como los del autosave: se mueven y renombran unas pocas clases
+        classes = self.diagram["classes"]
+        for item in self.rng.sample(classes, max(1, int(len(classes) * fraction))):
+            item["position"] = {"x": item["position"]["x"] + self.rng.randint(-40, 40), "y": item["position"]["y"] + self.rng.randint(-40, 40)}
+            item["name"] = f"{item['name'].split('_v')[0]}_v{self.rng.randint(0, 9999)}"
+
+    async def run_forever(self):
+        """Repite el escenario hasta que se cancela la tarea al final de la prueba."""
+        while True:
+            for step in self.scenario["steps"]:
+                await self.run_step(step)
+
+    async def run_step(self, step):
+        action = step["action"]
+        if action == "login":
+            await self.login()
+        elif action == "list_projects":
+            await self.call("list_projects", "GET", "/api/projects/list")
+        elif action == "open_project":
+            path = f"/api/projects/{self.project_id}"
+            parallel = step.get("parallel", 1)
+            if parallel == 1:
+                await self.call("open_project", "GET", path)
+            else:
+                extra = [Connection(self.options.host, self.options.port, self.options.timeout) for _ in range(parallel - 1)]
+                try:
+                    await asyncio.gather(*(self.call("open_project", "GET", path, connection=conn) for conn in [None] + extra))
+                finally:
+                    for conn in extra:
+                        conn.close()
+        elif action == "save":
+            for _ in range(step.get("repeat", 1)):
+                self.mutate(step.get("mutate", 0.05))
+                await self.call("save", "POST", f"/api/projects/{self.project_id}/save", self.diagram)
+                await self.think(step)
+        elif action == "think":
+            await self.think(step)
+        else:
+            raise ValueError(f"Accion desconocida en el escenario: {action}")
+
+
+def assign_scenarios(count, scenarios):
+    """Reparte los usuarios por peso de forma determinista (intercalados, no por bloques)."""
+    pool = [name for name, scenario in scenarios.items() for _ in range(scenario.get("weight", 1))]
+    return [pool[index % len(pool)] for index in range(count)]
+
+
+async def run(options, scenarios):
+    stages = options.stages
+    peak = max(concurrency for concurrency, _ in stages)
+    names = assign_scenarios(peak, scenarios)
+    current = {"stats": None}
+    users = [VirtualUser(index, scenarios[names[index]], options, current) for index in range(peak)]
+
+    print(f"Preparando {peak} usuarios virtuales...", file=sys.stderr)
+    semaphore = asyncio.Semaphore(options.setup_concurrency)
+
+    async def prepare(user):
+        async with semaphore:
+            await user.setup()
+
+    await asyncio.gather(*(prepare(user) for user in users))
+
+    # Los usuarios de etapas anteriores siguen activos: la concurrencia solo crece
+    results = []
+    tasks = []
+    try:
+        for concurrency, seconds in stages:
+            stats = StageStats(concurrency)
+            current["stats"] = stats
+            for user in users[len(tasks):concurrency]:
+                tasks.append(asyncio.create_task(user.run_forever()))
+            await asyncio.sleep(seconds)
+            stats.finished = time.perf_counter()
+            summary = stats.summary()
+            results.append(summary)
+            print(f"concurrencia {concurrency:>4}: {summary['throughput_rps']:>8.1f} pet/s  "
+                  f"p99 {summary['p99_ms']:>9.1f} ms  errores {summary['error_rate']:>6.1%}", file=sys.stderr)
+            if options.stop_on_cliff and find_cliffs(results, options.max_error_rate):
+                break
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for user in users:
+            user.connection.close()
+
+    return {
+        "target": options.url,
+        "scenarios": {name: names.count(name) for name in scenarios},
+        "classes": options.classes,
+        "stages": results,
+        "cliffs": find_cliffs(results, options.max_error_rate),
+    }
+
+
+def print_report(report):
+    for stage in report["stages"]:
+        print(f"\n== concurrencia {stage['concurrency']} ({stage['seconds']} s) ==", file=sys.stderr)
+        print(f"{'ruta':<16} {'pet/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errores':>8}", file=sys.stderr)
+        for route, row in stage["routes"].items():
+            print(f"{route:<16} {row['throughput_rps']:>8.1f} {row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} "
+                  f"{row['p99_ms']:>9.1f} {row['error_rate']:>8.1%}", file=sys.stderr)
+    for cliff in report["cliffs"]:
+        print(f"\nPrecipicio ({cliff['kind']}) con {cliff['concurrency']} usuarios: {cliff['detail']}", file=sys.stderr)
+
+
+def _stage(value):
+    concurrency, _, seconds = value.partition(":")
+    return int(concurrency), float(seconds or 30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--stages", type=_stage, nargs="+", default=[(5, 30), (10, 30), (25, 30), (50, 30), (100, 30)],
+                        help="etapas usuarios:segundos, con concurrencia creciente")
+    parser.add_argument("--scenarios", help="JSON con los escenarios (por defecto editor y viewer)")
+    parser.add_argument("--classes", type=int, default=100, help="clases del diagrama de cada usuario")
+    parser.add_argument("--think-scale", type=float, default=1.0, help="multiplica las pausas (0 = sin pausas)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="segundos maximos por peticion")
+    parser.add_argument("--setup-concurrency", type=int, default=10)
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--stop-on-cliff", action="store_true", help="no sube mas la carga tras el primer precipicio")
+    parser.add_argument("--user-prefix", default="loadtest")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="guarda el informe en este JSON")
+    options = parser.parse_args()
+
+    url = urlsplit(options.url)
+    options.host, options.port = url.hostname, url.port or 80
+    options.stages.sort()
+
+    scenarios = DEFAULT_SCENARIOS
+    if options.scenarios:
+        with open(options.scenarios, encoding="utf-8") as handle:
+            scenarios = json.load(handle)
+
+    report = asyncio.run(run(options, scenarios))
+    print_report(report)
+
+    if options.output:
+        with open(options.output, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    if report["cliffs"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+"""
+Benchmark de las tablas classes/relationships sin particionar contra particionadas por HASH (project_id).
+
+Crea dos esquemas de trabajo en la base del benchmark con la forma de las tablas reales (mismas
+columnas, indices, claves foraneas y triggers de busqueda y sincronizacion):
+  - bench_heap: tablas normales, como antes de la migracion a2c7e9f4b1d3
+  - bench_hash: tablas particionadas con --partitions particiones (por defecto DIAGRAM_PARTITIONS)
+Las llena con --projects proyectos de --classes-per-project clases y 1.5 relaciones por clase
+(por defecto 50000 x 200: 10 millones de clases y 15 millones de relaciones en cada esquema),
+generadas en el servidor, y en cada esquema mide:
+  - load: leer las clases y relaciones de un proyecto, antes y despues de los guardados
+  - save: la escritura de filas de save_project_data (replace_diagram, upsert por id) en una
+    transaccion: el diagrama actual del proyecto con --mutate de sus clases movidas y renombradas,
+    como un guardado del editor. No incluye la revision ni el resto del endpoint
+  - vacuum: VACUUM de cada tabla con datos despues de los guardados (total y la que mas tarda), el
+    tamaño antes y despues de los guardados y la unidad mas grande que autovacuum tendria que
+    recorrer (la tabla entera o la particion mas grande)
+El autovacuum se desactiva en las tablas de trabajo para que no se cruce con las mediciones.
+
+Necesita una base migrada (usa las funciones de los triggers y la secuencia sync_version_seq); las
+lapidas que generan los guardados se borran al terminar. La carga tarda: con --projects 1000 se
+hace una pasada rapida.
+
+Uso:
+    python -m benchmarks.partitioning --projects 50000 --classes-per-project 200 --output benchmarks/results/partitioning.json
+    python -m benchmarks.partitioning --projects 1000 --saves 100 --partitions 16
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from sqlalchemy import text
+
+from app import create_app
+from app.database import db
+from app.services.diagram_operations import replace_diagram
+from benchmarks.api_endpoints import BenchConfig, percentile
+
+LAYOUTS = ("heap", "hash")
+LOAD_BATCH_PROJECTS = 1000
+
+CLASS_COLUMNS = (
+    "project_id", "id", "name", "stereotype", "attributes", "methods", "position",
+    "created_at", "updated_at", "is_deleted", "search_vector", "members_vector",
+)
+RELATIONSHIP_COLUMNS = (
+    "project_id", "id", "source_class_id", "target_class_id", "relationship_type",
+    "source_multiplicity", "target_multiplicity", "label", "created_at", "updated_at", "is_deleted",
+)
+
+# Misma expresion que classes_search_vector_update(): en la carga inicial los triggers todavia no
+# existen (una transaccion con miles de proyectos agotaria los bloqueos consultivos por proyecto)
+GENERATED_CLASSES = """
+    INSERT INTO {schema}.classes ({columns})
+    SELECT project_id, id, name, stereotype, attributes, methods, position, now(), now(), false,
+           setweight(fts_identifier(name), 'A') || setweight(fts_identifier(stereotype), 'C'),
+           setweight(fts_identifier(fts_member_names(attributes)), 'B') || setweight(fts_identifier(fts_member_names(methods)), 'B')
+    FROM (
+        SELECT p.id AS project_id,
+               md5(p.id::text || ':' || n)::uuid AS id,
+               'Entidad' || n AS name,
+               CASE WHEN n % 7 = 0 THEN 'entity' END AS stereotype,
+               json_build_array(
+                   json_build_object('name', 'campo' || n || '_0', 'type', 'String', 'visibility', 'private'),
+                   json_build_object('name', 'campo' || n || '_1', 'type', 'int', 'visibility', 'private'),
+                   json_build_object('name', 'campo' || n || '_2', 'type', 'Date', 'visibility', 'private')
+               ) AS attributes,
+               json_build_array(
+                   json_build_object('name', 'operacion' || n, 'returnType', 'void', 'parameters', json_build_array(), 'visibility', 'public')
+               ) AS methods,
+               json_build_object('x', (n % 50) * 260, 'y', (n / 50) * 220) AS position
+        FROM unnest(CAST(:ids AS uuid[])) AS p(id), generate_series(0, :classes - 1) AS n
+    ) AS generated
+"""
+
+GENERATED_RELATIONSHIPS = """
+    INSERT INTO {schema}.relationships ({columns})
+    SELECT p.id, gen_random_uuid(),
+           md5(p.id::text || ':' || (m % :classes))::uuid,
+           md5(p.id::text || ':' || ((m * 7 + 1) % :classes))::uuid,
+           CASE WHEN m < :classes THEN 'inheritance' ELSE 'association' END,
+           '1', '*', NULL, now(), now(), false
+    FROM unnest(CAST(:ids AS uuid[])) AS p(id), generate_series(0, :relationships - 1) AS m
+"""
+
+
+def _ddl(layout, schema, partitions):
+    """Sentencias que crean las tablas vacias de un esquema (sin indices ni restricciones)."""
+    partition_by = " PARTITION BY HASH (project_id)" if layout == "hash" else ""
+    statements = [
+        f"DROP SCHEMA IF EXISTS {schema} CASCADE",
+        f"CREATE SCHEMA {schema}",
+        f"CREATE TABLE {schema}.projects (id uuid PRIMARY KEY)",
+        f"CREATE TABLE {schema}.classes (LIKE public.classes INCLUDING DEFAULTS INCLUDING GENERATED){partition_by}",
+        f"CREATE TABLE {schema}.relationships (LIKE public.relationships INCLUDING DEFAULTS){partition_by}",
+    ]
+    if layout == "hash":
+        for remainder in range(partitions):
+            for name in ("classes", "relationships"):
+                statements.append(
+                    f"CREATE TABLE {schema}.{name}_p{remainder} PARTITION OF {schema}.{name} "
+                    f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder}) WITH (autovacuum_enabled = false)"
+                )
+    else:
+        statements.append(f"ALTER TABLE {schema}.classes SET (autovacuum_enabled = false)")
+        statements.append(f"ALTER TABLE {schema}.relationships SET (autovacuum_enabled = false)")
+    return statements
+
+
+def _constraints(layout, schema):
+    """Indices, claves y triggers de las tablas reales en cada forma (ver la migracion a2c7e9f4b1d3)."""
+    key = "project_id, " if layout == "hash" else ""
+    return [
+        f"ALTER TABLE {schema}.classes ADD PRIMARY KEY ({key}id)",
+        f"ALTER TABLE {schema}.relationships ADD PRIMARY KEY ({key}id)",
+        f"CREATE INDEX ON {schema}.classes (project_id, pos_x, pos_y)",
+        f"CREATE INDEX ON {schema}.classes (project_id, sync_version)",
+        f"CREATE INDEX ON {schema}.classes USING gin (search_vector)",
+        f"CREATE INDEX ON {schema}.classes USING gin (members_vector)",
+        f"CREATE INDEX ON {schema}.relationships (project_id, sync_version)",
+        f"CREATE INDEX ON {schema}.relationships ({key}source_class_id)",
+        f"CREATE INDEX ON {schema}.relationships ({key}target_class_id)",
+        f"ALTER TABLE {schema}.classes ADD FOREIGN KEY (project_id) REFERENCES {schema}.projects (id) ON DELETE CASCADE",
+        f"ALTER TABLE {schema}.relationships ADD FOREIGN KEY (project_id) REFERENCES {schema}.projects (id) ON DELETE CASCADE",
+        f"ALTER TABLE {schema}.relationships ADD FOREIGN KEY ({key}source_class_id) REFERENCES {schema}.classes ({key}id) ON DELETE CASCADE",
+        f"ALTER TABLE {schema}.relationships ADD FOREIGN KEY ({key}target_class_id) REFERENCES {schema}.classes ({key}id) ON DELETE CASCADE",
+        f"CREATE TRIGGER search_vector BEFORE INSERT OR UPDATE OF name, stereotype, attributes, methods ON {schema}.classes "
+        f"FOR EACH ROW EXECUTE FUNCTION public.classes_search_vector_update()",
+        f"CREATE TRIGGER sync_version BEFORE INSERT OR UPDATE ON {schema}.classes FOR EACH ROW EXECUTE FUNCTION public.sync_version_update()",
+        f"CREATE TRIGGER sync_tombstone AFTER DELETE ON {schema}.classes FOR EACH ROW EXECUTE FUNCTION public.sync_tombstone_insert('class')",
+        f"CREATE TRIGGER sync_version BEFORE INSERT OR UPDATE ON {schema}.relationships FOR EACH ROW EXECUTE FUNCTION public.sync_version_update()",
+        f"CREATE TRIGGER sync_tombstone AFTER DELETE ON {schema}.relationships FOR EACH ROW EXECUTE FUNCTION public.sync_tombstone_insert('relationship')",
+    ]
+
+
+def _log(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+def build(engine, projects, classes_per_project, partitions):
+    """Crea los dos esquemas con los mismos datos y devuelve los ids de los proyectos."""
+    project_ids = [uuid.uuid4() for _ in range(projects)]
+    relationships = int(classes_per_project * 1.5)
+
+    for layout in LAYOUTS:
+        with engine.begin() as conn:
+            for statement in _ddl(layout, f"bench_{layout}", partitions):
+                conn.execute(text(statement))
+
+    # Se genera una vez en bench_heap y se copia a bench_hash: los dos esquemas tienen las mismas filas
+    started = time.perf_counter()
+    for offset in range(0, projects, LOAD_BATCH_PROJECTS):
+        ids = project_ids[offset:offset + LOAD_BATCH_PROJECTS]
+        params = {"ids": ids, "classes": classes_per_project, "relationships": relationships}
+        with engine.begin() as conn:
+            conn.execute(text("INSERT INTO bench_heap.projects SELECT unnest(CAST(:ids AS uuid[]))"), params)
+            conn.execute(text(GENERATED_CLASSES.format(schema="bench_heap", columns=", ".join(CLASS_COLUMNS))), params)
+            conn.execute(text(GENERATED_RELATIONSHIPS.format(schema="bench_heap", columns=", ".join(RELATIONSHIP_COLUMNS))), params)
+        _log(f"  carga: {offset + len(ids)}/{projects} proyectos ({time.perf_counter() - started:.0f} s)")
+
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO bench_hash.projects SELECT id FROM bench_heap.projects"))
+        for name, columns in (("classes", CLASS_COLUMNS), ("relationships", RELATIONSHIP_COLUMNS)):
+            names = ", ".join(columns)
+            conn.execute(text(f"INSERT INTO bench_hash.{name} ({names}) SELECT {names} FROM bench_heap.{name}"))
+    _log(f"  copia a bench_hash lista ({time.perf_counter() - started:.0f} s)")
+
+    for layout in LAYOUTS:
+        with engine.begin() as conn:
+            for statement in _constraints(layout, f"bench_{layout}"):
+                conn.execute(text(statement))
+        _vacuum(engine, f"bench_{layout}")
+    _log(f"  indices y VACUUM inicial listos ({time.perf_counter() - started:.0f} s)")
+    return project_ids
+
+
+def _leaf_tables(engine, schema):
+    """(nombre, bytes con indices) de las tablas con datos: las dos tablas normales o todas las particiones."""
+    with engine.connect() as conn:
+        return conn.execute(text("""
+            SELECT c.relname AS name, pg_total_relation_size(c.oid) AS bytes
+            FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = :schema AND c.relkind = 'r' AND c.relname <> 'projects'
+            ORDER BY c.relname
+        """), {"schema": schema}).all()
+
+
+def _vacuum(engine, schema):
+    """
+    VACUUM de cada tabla con datos por separado, como lo haria autovacuum; devuelve los segundos
+    en total y los de la tabla que mas tardo. El ANALYZE va aparte y no se mide: en una tabla
+    particionada, ANALYZE del padre vuelve a muestrear todas las particiones.
+    """
+    timings = []
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for leaf in _leaf_tables(engine, schema):
+            started = time.perf_counter()
+            conn.execute(text(f"VACUUM {schema}.{leaf.name}"))
+            timings.append(time.perf_counter() - started)
+        conn.execute(text(f"ANALYZE {schema}.classes"))
+        conn.execute(text(f"ANALYZE {schema}.relationships"))
+    return sum(timings), max(timings)
+
+
+def _sizes(engine, schema):
+    """Tamaño total (tablas + indices) y el de la tabla con datos mas grande, en MB."""
+    sizes = [leaf.bytes for leaf in _leaf_tables(engine, schema)]
+    return round(sum(sizes) / 2 ** 20, 1), round(max(sizes) / 2 ** 20, 1)
+
+
+def _summary(samples):
+    return {
+        "samples": len(samples),
+        "mean_ms": round(statistics.fmean(samples), 3),
+        "p50_ms": round(percentile(samples, 0.50), 3),
+        "p90_ms": round(percentile(samples, 0.90), 3),
+        "p99_ms": round(percentile(samples, 0.99), 3),
+    }
+
+
+def measure_load(engine, schema, project_ids):
+    samples = []
+    with engine.connect() as conn:
+        for project_id in project_ids:
+            started = time.perf_counter()
+            conn.execute(text(
+                f"SELECT id, name, stereotype, attributes, methods, position FROM {schema}.classes "
+                "WHERE project_id = :p AND is_deleted = false"
+            ), {"p": project_id}).all()
+            conn.execute(text(
+                f"SELECT id, source_class_id, target_class_id, relationship_type, source_multiplicity, target_multiplicity, label "
+                f"FROM {schema}.relationships WHERE project_id = :p AND is_deleted = false"
+            ), {"p": project_id}).all()
+            samples.append((time.perf_counter() - started) * 1000)
+            conn.rollback()
+    return _summary(samples)
+
+
+def _current_diagram(engine, schema, project_id):
+    """Clases y relaciones del proyecto como las tiene abiertas el editor (con los ids de las filas)."""
+    with engine.connect() as conn:
+        classes = [{
+            "id": str(row.id), "name": row.name, "stereotype": row.stereotype,
+            "attributes": row.attributes, "methods": row.methods, "position": row.position,
+        } for row in conn.execute(text(
+            f"SELECT id, name, stereotype, attributes, methods, position FROM {schema}.classes "
+            "WHERE project_id = :p AND is_deleted = false"
+        ), {"p": project_id})]
+        relationships = [{
+            "id": str(row.id), "sourceClassId": str(row.source_class_id), "targetClassId": str(row.target_class_id),
+            "relationshipType": row.relationship_type, "sourceMultiplicity": row.source_multiplicity,
+            "targetMultiplicity": row.target_multiplicity, "label": row.label,
+        } for row in conn.execute(text(
+            f"SELECT id, source_class_id, target_class_id, relationship_type, source_multiplicity, target_multiplicity, label "
+            f"FROM {schema}.relationships WHERE project_id = :p AND is_deleted = false"
+        ), {"p": project_id})]
+    return classes, relationships
+
+
+def _mutate(classes, rng, fraction):
+    # Cambios pequeños como los de benchmarks.load_sessions: se mueven y renombran unas pocas clases
+    for item in rng.sample(classes, max(1, int(len(classes) * fraction))):
+        item["position"] = {"x": item["position"]["x"] + rng.randint(-40, 40), "y": item["position"]["y"] + rng.randint(-40, 40)}
+        item["name"] = f"{item['name'].split('_v')[0]}_v{rng.randint(0, 9999)}"
+
+
+def measure_save(engine, schema, project_ids, mutate, seed):
+    """El guardado completo de save_project_data: replace_diagram sobre las tablas del esquema y commit."""
+    # Misma semilla en los dos esquemas: los dos reciben exactamente los mismos cambios
+    rng = random.Random(seed)
+    samples = []
+    for project_id in project_ids:
+        classes, relationships = _current_diagram(engine, schema, project_id)
+        _mutate(classes, rng, mutate)
+        started = time.perf_counter()
+        # Los modelos apuntan a public: la sesion traduce sus tablas a las del esquema de trabajo
+        db.session.connection(execution_options={"schema_translate_map": {None: schema}})
+        replace_diagram(SimpleNamespace(id=project_id), classes, relationships)
+        db.session.commit()
+        samples.append((time.perf_counter() - started) * 1000)
+        db.session.remove()
+    return _summary(samples)
+
+
+def run(projects, classes_per_project, partitions, loads, saves, mutate, seed, keep):
+    app = create_app(BenchConfig)
+    results = {}
+    with app.app_context():
+        engine = db.engine
+        _log(f"Cargando {projects} proyectos x {classes_per_project} clases en bench_heap y bench_hash ({partitions} particiones)")
+        project_ids = build(engine, projects, classes_per_project, partitions)
+        rng = random.Random(seed)
+        load_ids = rng.sample(project_ids, min(loads, projects))
+        save_ids = rng.sample(project_ids, min(saves, projects))
+
+        try:
+            for layout in LAYOUTS:
+                schema = f"bench_{layout}"
+                row = {"size_mb": _sizes(engine, schema)[0]}
+                row["load"] = measure_load(engine, schema, load_ids)
+                row["save"] = measure_save(engine, schema, save_ids, mutate, seed)
+                row["load_after_saves"] = measure_load(engine, schema, load_ids)
+                row["size_after_saves_mb"], row["largest_vacuum_unit_mb"] = _sizes(engine, schema)
+                total, largest = _vacuum(engine, schema)
+                row["vacuum_seconds"], row["largest_vacuum_unit_seconds"] = round(total, 3), round(largest, 3)
+                row["size_after_vacuum_mb"] = _sizes(engine, schema)[0]
+                results[layout] = row
+                _log(f"{layout:<5} load p50 {row['load']['p50_ms']:>8.2f} ms  save p50 {row['save']['p50_ms']:>8.2f} ms  "
+                     f"p90 {row['save']['p90_ms']:>8.2f} ms  load tras guardados p50 {row['load_after_saves']['p50_ms']:>8.2f} ms  "
+                     f"vacuum {row['vacuum_seconds']:>8.2f} s (max {row['largest_vacuum_unit_seconds']:.2f} s)  "
+                     f"{row['size_mb']:.0f} -> {row['size_after_saves_mb']:.0f} MB (unidad de vacuum {row['largest_vacuum_unit_mb']:.0f} MB)")
+        finally:
+            with engine.begin() as conn:
+                conn.execute(text("DELETE FROM sync_tombstones WHERE project_id = ANY(CAST(:ids AS uuid[]))"), {"ids": save_ids})
+                if not keep:
+                    for layout in LAYOUTS:
+                        conn.execute(text(f"DROP SCHEMA IF EXISTS bench_{layout} CASCADE"))
+
+    return {
+        "meta": {
+            "date": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "projects": projects,
+            "classes_per_project": classes_per_project,
+            "rows_per_layout": projects * (classes_per_project + int(classes_per_project * 1.5)),
+            "partitions": partitions,
+            "saves": len(save_ids),
+            "mutate": mutate,
+            "seed": seed,
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--projects", type=int, default=50000)
+    parser.add_argument("--classes-per-project", type=int, default=200)
+    parser.add_argument("--partitions", type=int, default=BenchConfig.DIAGRAM_PARTITIONS)
+    parser.add_argument("--loads", type=int, default=200, help="proyectos leidos en cada medicion de carga")
+    parser.add_argument("--saves", type=int, default=500, help="proyectos guardados (cada uno una vez)")
+    parser.add_argument("--mutate", type=float, default=0.05, help="fraccion de clases que cambian en cada guardado")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep", action="store_true", help="no borra los esquemas bench_heap/bench_hash al terminar")
+    parser.add_argument("--output", help="guarda los resultados en este JSON")
+    args = parser.parse_args()
+
+    current = run(args.projects, args.classes_per_project, args.partitions, args.loads, args.saves, args.mutate, args.seed, args.keep)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(current, handle, indent=2)
+    else:
+        print(json.dumps(current, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Prueba de carga del servicio de presencia: coste de difusion de cursores con 50 espectadores por proyecto.
+
+Simula clientes que envian su cursor a 60 Hz y mide, por segundo simulado, cuantos mensajes y
+bytes salen hacia los espectadores con el muestreo por tick y el lote binario, comparado con
+reenviar cada posicion en JSON a todos los demas (difusion ingenua).
+
+Es una simulacion en el proceso, no una difusion real: PresenceService corre con un emisor de
+prueba (_CountingEmitter) que cuenta un mensaje por espectador en vez de llamar a Socket.IO, sin
+servidor, WebSocket ni red. Mide lo que decide el servicio (cuantos lotes y de que tamaño), no la
+latencia ni el coste de serializar y enviar por WebSocket, que hay que medir con clientes reales
+contra un servidor en marcha.
+
+Uso:
+    python -m benchmarks.presence_fanout --viewers 50 --projects 4 --seconds 10
+"""
+import argparse
+import json
+import os
+import random
+import time
+import uuid
+
+from app.sockets.cursor_frames import encode_client_frame
+from app.sockets.presence import PresenceService
+
+
+class _CountingEmitter:
+    def __init__(self, viewers_per_project):
+        self.viewers = viewers_per_project
+        self.messages = 0
+        self.bytes = 0
+
+    def __call__(self, event, payload, namespace):
+        # Socket.IO entrega el lote a cada espectador del espacio de nombres
+        self.messages += self.viewers
+        self.bytes += len(payload) * self.viewers
+
+
+def run(viewers, projects, seconds, send_hz, interval_ms, selection_size):
+    emitter = _CountingEmitter(viewers)
+    service = PresenceService(emit=emitter)
+    service.interval_ms = interval_ms
+    # El benchmark controla los ticks: se marca el hilo de difusion como ya arrancado
+    service._ticker_pid = os.getpid()
+
+    namespaces = [f"/projects/{uuid.uuid4()}" for _ in range(projects)]
+    clients = []
+    for namespace in namespaces:
+        for index in range(viewers):
+            sid = uuid.uuid4().hex
+            service.join(namespace, sid, str(uuid.uuid4()), f"user{index}")
+            clients.append((namespace, sid))
+
+    ticks = int(seconds * 1000 / interval_ms)
+    frames_per_tick = max(1, round(send_hz * interval_ms / 1000))
+    selection = [uuid.uuid4() for _ in range(selection_size)]
+
+    received = 0
+    naive_bytes = 0
+    ingest_time = 0.0
+    tick_time = 0.0
+    clock = 0
+
+    for tick in range(ticks):
+        started = time.perf_counter()
+        for _ in range(frames_per_tick):
+            clock += 1000 // send_hz
+            for namespace, sid in clients:
+                x, y = random.uniform(0, 4000), random.uniform(0, 3000)
+                # Las selecciones cambian con poca frecuencia frente a los movimientos del cursor
+                changed = selection if random.random() < 0.02 else ()
+                frame = encode_client_frame(x, y, clock, changed)
+                service.update_cursor(namespace, sid, frame)
+                received += 1
+                naive_bytes += len(json.dumps({"x": x, "y": y, "userId": sid, "selection": [str(item) for item in changed]})) * (viewers - 1)
+        ingest_time += time.perf_counter() - started
+
+        started = time.perf_counter()
+        service.tick()
+        tick_time += time.perf_counter() - started
+
+    naive_messages = received * (viewers - 1)
+    return {
+        "viewersPerProject": viewers,
+        "projects": projects,
+        "simulatedSeconds": seconds,
+        "framesReceivedPerSecond": round(received / seconds),
+        "batchedMessagesPerSecond": round(emitter.messages / seconds),
+        "batchedKBPerSecond": round(emitter.bytes / seconds / 1024, 1),
+        "naiveMessagesPerSecond": round(naive_messages / seconds),
+        "naiveKBPerSecond": round(naive_bytes / seconds / 1024, 1),
+        "ingestMicrosPerFrame": round(ingest_time / received * 1e6, 2),
+        "tickMillisAvg": round(tick_time / ticks * 1000, 3),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--viewers", type=int, default=50)
+    parser.add_argument("--projects", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--send-hz", type=int, default=60)
+    parser.add_argument("--interval-ms", type=int, default=50)
+    parser.add_argument("--selection-size", type=int, default=8)
+    args = parser.parse_args()
+
+    result = run(args.viewers, args.projects, args.seconds, args.send_hz, args.interval_ms, args.selection_size)
+    print(json.dumps(result, indent=2))
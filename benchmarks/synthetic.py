@@ -0,0 +1,56 @@
+"""Generadores de diagramas sinteticos compartidos por los benchmarks y la prueba de carga."""
+import random
+
+TYPES = ("int", "String", "boolean", "double", "Date", "List<String>")
+VISIBILITIES = ("public", "private", "protected")
+ASSOCIATIONS = ("association", "aggregation", "composition", "dependency")
+
+
+def synthetic_diagram(class_count, relationship_ratio=1.5, seed=0):
+    """Diagrama con la forma que envia el frontend: un arbol de herencia mas asociaciones al azar."""
+    rng = random.Random(seed)
+    classes = []
+    for index in range(class_count):
+        classes.append({
+            "id": f"c{index}",
+            "name": f"Entidad{index}",
+            "stereotype": "entity" if index % 7 == 0 else None,
+            "attributes": [
+                {"name": f"campo{index}_{n}", "type": rng.choice(TYPES), "visibility": rng.choice(VISIBILITIES)}
+                for n in range(rng.randint(3, 8))
+            ],
+            "methods": [
+                {
+                    "name": f"operacion{index}_{n}",
+                    "returnType": rng.choice(TYPES + ("void",)),
+                    "parameters": [{"name": f"p{k}", "type": rng.choice(TYPES)} for k in range(rng.randint(0, 3))],
+                    "visibility": "public",
+                }
+                for n in range(rng.randint(1, 5))
+            ],
+            "position": {"x": (index % 50) * 260, "y": (index // 50) * 220},
+        })
+
+    relationships = []
+    relationship_count = int(class_count * relationship_ratio)
+    for index in range(1, class_count):
+        if len(relationships) >= relationship_count:
+            break
+        # Cada clase hereda de una anterior: el arbol nunca tiene ciclos
+        relationships.append({
+            "id": f"r{len(relationships)}",
+            "sourceClassId": f"c{index}",
+            "targetClassId": f"c{rng.randrange(index)}",
+            "relationshipType": "inheritance",
+        })
+    while class_count > 1 and len(relationships) < relationship_count:
+        source, target = rng.sample(range(class_count), 2)
+        relationships.append({
+            "id": f"r{len(relationships)}",
+            "sourceClassId": f"c{source}",
+            "targetClassId": f"c{target}",
+            "relationshipType": rng.choice(ASSOCIATIONS),
+            "sourceMultiplicity": "1",
+            "targetMultiplicity": rng.choice(("0..1", "1..*", "*")),
+        })
+    return {"classes": classes, "relationships": relationships}
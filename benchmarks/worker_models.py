@@ -0,0 +1,143 @@
+"""
+Comparacion de los modelos de worker de gunicorn sobre los endpoints de proyectos.
+
+Arranca gunicorn (wsgi:app con gunicorn.conf.py) una vez por modelo, mide el arranque en frio
+hasta que /metrics responde, lanza la carga de benchmarks.load_sessions con un escenario de
+proyectos sin pausas (listado, apertura, guardados y aperturas en paralelo) y mide cuanto tarda
+en pararse con SIGTERM (drenaje de peticiones en curso y volcado del autosave). Los modelos
+cuyo paquete no esta instalado (gevent, eventlet) se omiten.
+
+Necesita la base de datos configurada en .env, como el servidor normal.
+
+Uso:
+    python -m benchmarks.worker_models --models sync gthread gevent --stages 10:20 50:20
+"""
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+from benchmarks.load_sessions import _stage, print_report, run as run_load
+
+MODELS = {
+    "sync": {"GUNICORN_WORKER_CLASS": "sync"},
+    "gthread": {"GUNICORN_WORKER_CLASS": "gthread"},
+    "gevent": {"GUNICORN_WORKER_CLASS": "gevent"},
+    "eventlet": {"GUNICORN_WORKER_CLASS": "eventlet"},
+}
+
+PROJECT_SCENARIO = {
+    "projects": {
+        "weight": 1,
+        "steps": [
+            {"action": "list_projects"},
+            {"action": "open_project"},
+            {"action": "save", "repeat": 3, "mutate": 0.05},
+            {"action": "open_project", "parallel": 2},
+        ],
+    },
+}
+
+
+def wait_until_ready(url, process, timeout, token):
+    started = time.monotonic()
+    probe = urllib.request.Request(f"{url}/metrics", headers={"Authorization": f"Bearer {token}"})
+    while time.monotonic() - started < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn termino al arrancar (codigo {process.returncode})")
+        try:
+            with urllib.request.urlopen(probe, timeout=1) as response:
+                if response.status == 200:
+                    return time.monotonic() - started
+        except (urllib.error.URLError, ConnectionError, TimeoutError):
+            time.sleep(0.05)
+    raise RuntimeError(f"gunicorn no respondio en {timeout} s")
+
+
+def benchmark_model(name, args):
+    env = dict(os.environ, **MODELS[name])
+    env["GUNICORN_BIND"] = f"127.0.0.1:{args.port}"
+    # /metrics solo responde con token
+    env.setdefault("METRICS_TOKEN", "benchmark")
+    if args.workers:
+        env["GUNICORN_WORKERS"] = str(args.workers)
+    if args.threads:
+        env["GUNICORN_THREADS"] = str(args.threads)
+    url = f"http://127.0.0.1:{args.port}"
+
+    log = open(os.path.join(args.log_dir, f"gunicorn-{name}.log"), "w", encoding="utf-8")
+    process = subprocess.Popen([sys.executable, "-m", "gunicorn", "wsgi:app"], env=env, stdout=log, stderr=subprocess.STDOUT)
+    try:
+        cold_start = wait_until_ready(url, process, args.start_timeout, env["METRICS_TOKEN"])
+        options = argparse.Namespace(
+            url=url, host="127.0.0.1", port=args.port, stages=args.stages, classes=args.classes,
+            think_scale=0.0, timeout=args.timeout, setup_concurrency=10, max_error_rate=args.max_error_rate,
+            stop_on_cliff=False, user_prefix="workers", seed=args.seed,
+        )
+        report = asyncio.run(run_load(options, PROJECT_SCENARIO))
+    finally:
+        started = time.monotonic()
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=args.start_timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+        shutdown = time.monotonic() - started
+        log.close()
+
+    report["model"] = name
+    report["cold_start_seconds"] = round(cold_start, 3)
+    report["shutdown_seconds"] = round(shutdown, 3)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", nargs="+", default=list(MODELS), choices=list(MODELS))
+    parser.add_argument("--stages", type=_stage, nargs="+", default=[(10, 20), (50, 20), (100, 20)], help="etapas usuarios:segundos")
+    parser.add_argument("--workers", type=int, help="GUNICORN_WORKERS (por defecto el de gunicorn.conf.py)")
+    parser.add_argument("--threads", type=int, help="GUNICORN_THREADS para gthread")
+    parser.add_argument("--classes", type=int, default=200)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--start-timeout", type=float, default=60.0)
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--log-dir", default="/tmp", help="donde se guarda la salida de cada gunicorn")
+    parser.add_argument("--output", help="guarda los resultados en este JSON")
+    args = parser.parse_args()
+
+    reports = []
+    for name in args.models:
+        if name in ("gevent", "eventlet") and importlib.util.find_spec(name) is None:
+            print(f"{name}: no instalado, se omite", file=sys.stderr)
+            continue
+        print(f"\n### {name}", file=sys.stderr)
+        report = benchmark_model(name, args)
+        print_report(report)
+        reports.append(report)
+
+    print(f"\n{'modelo':<10} {'arranque s':>10} {'parada s':>9} {'usuarios':>9} {'pet/s':>9} {'p99 ms':>9} {'errores':>8}", file=sys.stderr)
+    for report in reports:
+        for stage in report["stages"]:
+            print(f"{report['model']:<10} {report['cold_start_seconds']:>10.2f} {report['shutdown_seconds']:>9.2f} "
+                  f"{stage['concurrency']:>9} {stage['throughput_rps']:>9.1f} {stage['p99_ms']:>9.1f} {stage['error_rate']:>8.1%}",
+                  file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(reports, handle, indent=2)
+    else:
+        print(json.dumps(reports, indent=2))
+
+
+if __name__ == "__main__":
+    main()
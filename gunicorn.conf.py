@@ -0,0 +1,134 @@
+"""
+Configuracion de gunicorn para produccion (gunicorn la carga sola desde el directorio actual):
+
+    gunicorn wsgi:app
+
+Todo se puede ajustar con variables de entorno:
+    GUNICORN_WORKER_CLASS  gthread (por defecto), gevent o eventlet. Flask-SocketIO necesita un
+                           worker con hilos o greenlets; "sync" solo sirve para comparar en los benchmarks.
+                           Con gevent/eventlet psycopg2 bloquea el bucle de eventos salvo que se
+                           parchee (psycogreen), por eso gthread es la opcion recomendada.
+    GUNICORN_WORKERS       procesos (por defecto 1: ver abajo; con "sync", 2 * CPU + 1)
+    GUNICORN_THREADS       hilos por worker con gthread. Cada WebSocket abierto ocupa un hilo
+                           mientras dura la conexion, por eso el valor por defecto es alto.
+    GUNICORN_BIND, GUNICORN_TIMEOUT, GUNICORN_GRACEFUL_TIMEOUT, GUNICORN_KEEPALIVE
+
+Socket.IO admite un solo worker por maestro: gunicorn reparte cada peticion al worker que la acepta
+y no puede devolver una sesion de Socket.IO al que la creo, asi que el handshake por long-polling
+con el que arranca socket.io-client fallaria en la mayoria de las peticiones. Un balanceador
+externo tampoco lo arregla, porque solo ve el maestro. Por eso el valor por defecto es 1 worker y
+la concurrencia la dan los hilos (o greenlets). Para escalar:
+  - varias instancias de un solo worker (cada una con su GUNICORN_BIND) detras de un proxy con
+    sesiones pegajosas, compartiendo PUBSUB_SOCKET_DIR (PUBSUB_BACKEND=unix) y AUTOSAVE_JOURNAL_DIR
+    para que los emits y los volcados del autosave lleguen a todas, o
+  - GUNICORN_WORKERS > 1 solo si todos los clientes usan unicamente el transporte websocket
+    (transports: ["websocket"]), tambien con PUBSUB_BACKEND=unix.
+"""
+import math
+import os
+import time
+
+
+def available_cpus():
+    """CPU que puede usar el proceso: afinidad y cuota de cgroups (v2 o v1), no las del host."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    quota = None
+    try:
+        with open("/sys/fs/cgroup/cpu.max", encoding="utf-8") as handle:
+            limit, period = handle.read().split()
+            if limit != "max":
+                quota = int(limit) / int(period)
+    except (OSError, ValueError):
+        try:
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us", encoding="utf-8") as handle:
+                limit = int(handle.read())
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us", encoding="utf-8") as handle:
+                period = int(handle.read())
+            if limit > 0:
+                quota = limit / period
+        except (OSError, ValueError):
+            pass
+
+    if quota is not None:
+        cpus = min(cpus, max(1, math.ceil(quota)))
+    return max(1, cpus)
+
+
+CPUS = available_cpus()
+
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+
+# El modo asincrono de Socket.IO tiene que coincidir con el worker; se fija antes de cargar la app
+os.environ.setdefault("SOCKETIO_ASYNC_MODE", worker_class if worker_class in ("gevent", "eventlet") else "threading")
+
+# Socket.IO necesita un solo worker (ver arriba); las peticiones pasan la mayor parte del tiempo
+# esperando a PostgreSQL, asi que la concurrencia la dan los hilos o greenlets del worker. "sync" no
+# sirve Socket.IO y solo se usa para comparar en los benchmarks, con un proceso por peticion
+workers = int(os.getenv("GUNICORN_WORKERS", "1" if worker_class != "sync" else str(2 * CPUS + 1)))
+threads = int(os.getenv("GUNICORN_THREADS", "64")) if worker_class == "gthread" else 1
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "1000"))
+
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+# Cargar la app una vez en el maestro: los workers nacen ya importados (copy-on-write) y un error
+# de arranque se ve antes de hacer fork
+preload_app = True
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+# Tiempo que se espera a las peticiones en curso (guardados incluidos) al parar o recargar
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+# El registro estructurado de la app ya escribe en stdout; gunicorn solo anota sus errores
+accesslog = None
+errorlog = "-"
+loglevel = os.getenv("LOG_LEVEL", "info").lower()
+
+_started = time.monotonic()
+
+
+def on_starting(server):
+    server.log.info(
+        "Arrancando con %s workers %s (%s hilos, %s CPU disponibles)", workers, worker_class, threads, CPUS
+    )
+
+
+def when_ready(server):
+    # Con preload la app ya esta cargada: es el tiempo de arranque en frio hasta aceptar conexiones
+    server.log.info("Listo para aceptar conexiones en %.2f s", time.monotonic() - _started)
+
+
+def post_fork(server, worker):
+    # Las conexiones que el maestro abrio al cargar la app (p. ej. al recuperar diarios de autosave)
+    # no se pueden compartir entre procesos: cada worker abre las suyas
+    from app.database import db
+    from app.services.autosave import autosave_buffer
+    from app.services.pubsub import pubsub
+
+    with server.app.wsgi().app_context():
+        db.engine.dispose(close=False)
+
+    # El hilo de autosave tambien reaplica periodicamente los diarios de workers que mueren, y el
+    # bus escucha desde ya los pedidos de volcado de otros workers aunque este no reciba peticiones
+    autosave_buffer.start()
+    pubsub.start()
+
+
+def post_worker_init(worker):
+    worker.log.info("Worker %s listo en %.2f s desde el arranque", worker.pid, time.monotonic() - _started)
+
+
+def worker_exit(server, worker):
+    # Las peticiones en curso ya terminaron (graceful_timeout); se vuelcan las ediciones del
+    # autosave que seguian en memoria antes de que el proceso salga
+    from app.services.autosave import autosave_buffer
+    from app.services.jobs import job_runner
+
+    started = time.monotonic()
+    autosave_buffer.flush_all()
+    worker.log.info("Worker %s: autosave volcado en %.2f s", worker.pid, time.monotonic() - started)
+
+    # Los trabajos en segundo plano que no terminan en JOB_SHUTDOWN_TIMEOUT_SECONDS vuelven a la cola
+    job_runner.stop()
@@ -1,4 +1,5 @@
 import logging
+import re
 from logging.config import fileConfig
 
 from flask import current_app
@@ -45,6 +46,45 @@ target_db = current_app.extensions['migrate'].db
 # ... etc.
 
 
+# Columnas e indices que mantiene la BD (triggers, columnas generadas) y que el ORM no mapea
+# a proposito; sin este filtro el autogenerate propondria borrarlos.
+UNMAPPED_COLUMNS = {
+    ("projects", "search_vector"),
+    ("classes", "search_vector"),
+    ("classes", "members_vector"),
+    ("projects", "sync_floor"),
+    ("bitacora_users", "created_xid"),
+}
+UNMAPPED_INDEXES = {
+    "ix_projects_search_vector",
+    "ix_classes_search_vector",
+    "ix_classes_members_vector",
+    "ix_sync_tombstones_project_entity_version",
+    "ix_bitacora_users_created_xid",
+}
+UNMAPPED_TABLES = {
+    "sync_tombstones",
+    # Resumenes de la bitacora que mantiene services/audit_rollup.py con SQL propio
+    "bitacora_daily_counts",
+    "bitacora_user_daily_counts",
+    "bitacora_last_ips",
+    "bitacora_rollup_state",
+}
+
+# Particiones hash de classes y relationships: el ORM solo mapea la tabla padre
+PARTITION_TABLE = re.compile(r"^(classes|relationships)_p\d+$")
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    if type_ == "table" and reflected and (name in UNMAPPED_TABLES or PARTITION_TABLE.match(name)):
+        return False
+    if type_ == "column" and reflected and (object.table.name, name) in UNMAPPED_COLUMNS:
+        return False
+    if type_ == "index" and reflected and name in UNMAPPED_INDEXES:
+        return False
+    return True
+
+
 def get_metadata():
     if hasattr(target_db, 'metadatas'):
         return target_db.metadatas[None]
@@ -65,7 +105,8 @@ def run_migrations_offline():
     """
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
-        url=url, target_metadata=get_metadata(), literal_binds=True
+        url=url, target_metadata=get_metadata(), literal_binds=True,
+        include_object=include_object
     )
 
     with context.begin_transaction():
@@ -93,6 +134,7 @@ def run_migrations_online():
     conf_args = current_app.extensions['migrate'].configure_args
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
+    conf_args.setdefault("include_object", include_object)
 
     connectable = get_engine()
 
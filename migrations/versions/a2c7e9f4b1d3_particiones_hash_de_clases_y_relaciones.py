@@ -0,0 +1,160 @@
+"""Particiones hash por proyecto de clases y relaciones
+
+Revision ID: a2c7e9f4b1d3
+Revises: f1c6a8b2d4e7
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+from flask import current_app
+
+
+# revision identifiers, used by Alembic.
+revision = 'a2c7e9f4b1d3'
+down_revision = 'f1c6a8b2d4e7'
+branch_labels = None
+depends_on = None
+
+
+# classes y relationships pasan a ser tablas particionadas por HASH (project_id) con
+# DIAGRAM_PARTITIONS particiones cada una (classes_p0.., relationships_p0..). Cada guardado
+# (upsert por id) y cada edicion granular actualiza, inserta y borra filas de un solo proyecto: con
+# particiones, las tuplas muertas que dejan esos UPDATE/DELETE y el crecimiento de los indices
+# quedan en una particion de 1/N del tamaño, autovacuum solo trabaja sobre esa y las consultas por
+# project_id leen una sola particion. Las dos tablas usan el mismo modulo, asi
+# que las clases y las relaciones de un proyecto caen en particiones con el mismo numero.
+#
+# La clave primaria tiene que incluir la clave de particion: pasa a ser (project_id, id), y las
+# relaciones apuntan a sus clases con (project_id, source_class_id) / (project_id, target_class_id).
+#
+# La migracion copia todas las filas en una sola transaccion y bloquea las escrituras en las dos
+# tablas mientras dura (las lecturas siguen): con decenas de millones de filas conviene una
+# ventana de mantenimiento. Para cambiar el numero de particiones despues:
+#     flask db downgrade f1c6a8b2d4e7 && DIAGRAM_PARTITIONS=64 flask db upgrade
+
+# Columnas que se copian (pos_x/pos_y son generadas y las recalcula PostgreSQL). sync_version y
+# los vectores de busqueda se copian tal cual: los triggers se crean despues de la copia.
+CLASS_COLUMNS = (
+    "project_id, name, stereotype, attributes, methods, position, id, created_at, updated_at, "
+    "is_deleted, search_vector, members_vector, sync_version"
+)
+RELATIONSHIP_COLUMNS = (
+    "project_id, source_class_id, target_class_id, relationship_type, source_multiplicity, "
+    "target_multiplicity, label, id, created_at, updated_at, is_deleted, sync_version"
+)
+
+
+def _create_triggers():
+    op.execute("""
+        CREATE TRIGGER classes_search_vector_trigger
+        BEFORE INSERT OR UPDATE OF name, stereotype, attributes, methods ON classes
+        FOR EACH ROW EXECUTE FUNCTION classes_search_vector_update()
+    """)
+    op.execute("""
+        CREATE TRIGGER classes_sync_version_trigger
+        BEFORE INSERT OR UPDATE ON classes
+        FOR EACH ROW EXECUTE FUNCTION sync_version_update()
+    """)
+    op.execute("""
+        CREATE TRIGGER classes_sync_tombstone_trigger
+        AFTER DELETE ON classes
+        FOR EACH ROW EXECUTE FUNCTION sync_tombstone_insert('class')
+    """)
+    op.execute("""
+        CREATE TRIGGER relationships_sync_version_trigger
+        BEFORE INSERT OR UPDATE ON relationships
+        FOR EACH ROW EXECUTE FUNCTION sync_version_update()
+    """)
+    op.execute("""
+        CREATE TRIGGER relationships_sync_tombstone_trigger
+        AFTER DELETE ON relationships
+        FOR EACH ROW EXECUTE FUNCTION sync_tombstone_insert('relationship')
+    """)
+
+
+def _create_indexes():
+    op.execute("CREATE INDEX ix_classes_project_position ON classes (project_id, pos_x, pos_y)")
+    op.execute("CREATE INDEX ix_classes_project_sync_version ON classes (project_id, sync_version)")
+    op.execute("CREATE INDEX ix_classes_search_vector ON classes USING gin (search_vector)")
+    op.execute("CREATE INDEX ix_classes_members_vector ON classes USING gin (members_vector)")
+    op.execute("CREATE INDEX ix_relationships_project_sync_version ON relationships (project_id, sync_version)")
+
+
+def _swap_tables():
+    """Copia las filas a classes_new/relationships_new, borra las tablas viejas y renombra."""
+    # SHARE: nadie escribe en las tablas viejas mientras se copian (una escritura posterior a la
+    # copia se perderia al borrarlas)
+    op.execute("LOCK TABLE classes, relationships IN SHARE MODE")
+    op.execute(f"INSERT INTO classes_new ({CLASS_COLUMNS}) SELECT {CLASS_COLUMNS} FROM classes")
+    op.execute(f"INSERT INTO relationships_new ({RELATIONSHIP_COLUMNS}) SELECT {RELATIONSHIP_COLUMNS} FROM relationships")
+    # Al borrar la tabla no se disparan los triggers de fila: no se generan lapidas
+    op.execute("DROP TABLE relationships")
+    op.execute("DROP TABLE classes")
+    op.execute("ALTER TABLE classes_new RENAME TO classes")
+    op.execute("ALTER TABLE relationships_new RENAME TO relationships")
+
+
+def upgrade():
+    partitions = current_app.config['DIAGRAM_PARTITIONS']
+    if partitions < 1:
+        raise ValueError("DIAGRAM_PARTITIONS debe ser al menos 1.")
+    # Triggers BEFORE ROW en tablas particionadas: PostgreSQL 13 o posterior
+    version = op.get_bind().exec_driver_sql("SHOW server_version_num").scalar()
+    if int(version) < 130000:
+        raise RuntimeError("Las tablas particionadas de clases y relaciones requieren PostgreSQL 13 o posterior.")
+
+    # LIKE copia tipos, NOT NULL, valores por defecto y las expresiones de pos_x/pos_y
+    op.execute("CREATE TABLE classes_new (LIKE classes INCLUDING DEFAULTS INCLUDING GENERATED) PARTITION BY HASH (project_id)")
+    op.execute("CREATE TABLE relationships_new (LIKE relationships INCLUDING DEFAULTS) PARTITION BY HASH (project_id)")
+    for remainder in range(partitions):
+        op.execute(f"CREATE TABLE classes_p{remainder} PARTITION OF classes_new FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})")
+        op.execute(f"CREATE TABLE relationships_p{remainder} PARTITION OF relationships_new FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})")
+
+    _swap_tables()
+
+    # Indices y restricciones despues de la copia: construirlos de una vez es mas rapido que
+    # mantenerlos fila a fila
+    op.execute("ALTER TABLE classes ADD CONSTRAINT classes_pkey PRIMARY KEY (project_id, id)")
+    op.execute("ALTER TABLE relationships ADD CONSTRAINT relationships_pkey PRIMARY KEY (project_id, id)")
+    _create_indexes()
+    # Los indices de las claves foraneas hacia classes cubren el borrado en cascada de una clase
+    op.execute("CREATE INDEX ix_relationships_source_class_id ON relationships (project_id, source_class_id)")
+    op.execute("CREATE INDEX ix_relationships_target_class_id ON relationships (project_id, target_class_id)")
+
+    op.execute("ALTER TABLE classes ADD CONSTRAINT classes_project_id_fkey FOREIGN KEY (project_id) REFERENCES projects (id) ON DELETE CASCADE")
+    op.execute("ALTER TABLE relationships ADD CONSTRAINT relationships_project_id_fkey FOREIGN KEY (project_id) REFERENCES projects (id) ON DELETE CASCADE")
+    op.execute("""
+        ALTER TABLE relationships ADD CONSTRAINT relationships_source_class_id_fkey
+        FOREIGN KEY (project_id, source_class_id) REFERENCES classes (project_id, id) ON DELETE CASCADE
+    """)
+    op.execute("""
+        ALTER TABLE relationships ADD CONSTRAINT relationships_target_class_id_fkey
+        FOREIGN KEY (project_id, target_class_id) REFERENCES classes (project_id, id) ON DELETE CASCADE
+    """)
+
+    _create_triggers()
+    op.execute("ANALYZE classes")
+    op.execute("ANALYZE relationships")
+
+
+def downgrade():
+    op.execute("CREATE TABLE classes_new (LIKE classes INCLUDING DEFAULTS INCLUDING GENERATED)")
+    op.execute("CREATE TABLE relationships_new (LIKE relationships INCLUDING DEFAULTS)")
+
+    # Al borrar las tablas particionadas se borran tambien sus particiones
+    _swap_tables()
+
+    op.execute("ALTER TABLE classes ADD CONSTRAINT classes_pkey PRIMARY KEY (id)")
+    op.execute("ALTER TABLE relationships ADD CONSTRAINT relationships_pkey PRIMARY KEY (id)")
+    _create_indexes()
+    op.execute("CREATE INDEX ix_relationships_source_class_id ON relationships (source_class_id)")
+    op.execute("CREATE INDEX ix_relationships_target_class_id ON relationships (target_class_id)")
+
+    op.execute("ALTER TABLE classes ADD CONSTRAINT classes_project_id_fkey FOREIGN KEY (project_id) REFERENCES projects (id) ON DELETE CASCADE")
+    op.execute("ALTER TABLE relationships ADD CONSTRAINT relationships_project_id_fkey FOREIGN KEY (project_id) REFERENCES projects (id) ON DELETE CASCADE")
+    op.execute("ALTER TABLE relationships ADD CONSTRAINT relationships_source_class_id_fkey FOREIGN KEY (source_class_id) REFERENCES classes (id) ON DELETE CASCADE")
+    op.execute("ALTER TABLE relationships ADD CONSTRAINT relationships_target_class_id_fkey FOREIGN KEY (target_class_id) REFERENCES classes (id) ON DELETE CASCADE")
+
+    _create_triggers()
+    op.execute("ANALYZE classes")
+    op.execute("ANALYZE relationships")
@@ -0,0 +1,99 @@
+"""Busqueda de texto completo en proyectos, clases y miembros
+
+Revision ID: b7d41c2e9f10
+Revises: 8ece7205059a
+Create Date: 2026-10-19 09:30:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d41c2e9f10'
+down_revision = '8ece7205059a'
+branch_labels = None
+depends_on = None
+
+
+# Las columnas tsvector las mantienen triggers y no se mapean en el ORM: los INSERT/UPDATE
+# normales (incluidos los masivos) las actualizan sin que el codigo Python las conozca.
+def upgrade():
+    # Un identificador se indexa entero y partido por camelCase/snake_case:
+    # "getUserName" -> getusername, get, user, name
+    op.execute("""
+        CREATE FUNCTION fts_identifier(value text) RETURNS tsvector
+        LANGUAGE sql IMMUTABLE AS $$
+            SELECT to_tsvector('simple',
+                coalesce(value, '') || ' ' ||
+                regexp_replace(regexp_replace(coalesce(value, ''), '([a-z0-9])([A-Z])', '\\1 \\2', 'g'), '[_$.]+', ' ', 'g'))
+        $$
+    """)
+
+    op.execute("""
+        CREATE FUNCTION fts_member_names(members json) RETURNS text
+        LANGUAGE sql IMMUTABLE AS $$
+            SELECT coalesce(string_agg(item ->> 'name', ' '), '')
+            FROM json_array_elements(CASE WHEN json_typeof(members) = 'array' THEN members ELSE '[]'::json END) AS item
+        $$
+    """)
+
+    op.execute("ALTER TABLE projects ADD COLUMN search_vector tsvector")
+    op.execute("""
+        CREATE FUNCTION projects_search_vector_update() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            NEW.search_vector :=
+                setweight(fts_identifier(NEW.name), 'A') ||
+                setweight(to_tsvector('simple', coalesce(NEW.description, '')), 'C');
+            RETURN NEW;
+        END
+        $$
+    """)
+    op.execute("""
+        CREATE TRIGGER projects_search_vector_trigger
+        BEFORE INSERT OR UPDATE OF name, description ON projects
+        FOR EACH ROW EXECUTE FUNCTION projects_search_vector_update()
+    """)
+
+    op.execute("ALTER TABLE classes ADD COLUMN search_vector tsvector, ADD COLUMN members_vector tsvector")
+    op.execute("""
+        CREATE FUNCTION classes_search_vector_update() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            NEW.search_vector :=
+                setweight(fts_identifier(NEW.name), 'A') ||
+                setweight(fts_identifier(NEW.stereotype), 'C');
+            NEW.members_vector :=
+                setweight(fts_identifier(fts_member_names(NEW.attributes)), 'B') ||
+                setweight(fts_identifier(fts_member_names(NEW.methods)), 'B');
+            RETURN NEW;
+        END
+        $$
+    """)
+    op.execute("""
+        CREATE TRIGGER classes_search_vector_trigger
+        BEFORE INSERT OR UPDATE OF name, stereotype, attributes, methods ON classes
+        FOR EACH ROW EXECUTE FUNCTION classes_search_vector_update()
+    """)
+
+    # Relleno de las filas existentes (los triggers solo actuan sobre escrituras nuevas)
+    op.execute("UPDATE projects SET name = name")
+    op.execute("UPDATE classes SET name = name")
+
+    op.execute("CREATE INDEX ix_projects_search_vector ON projects USING gin (search_vector)")
+    op.execute("CREATE INDEX ix_classes_search_vector ON classes USING gin (search_vector)")
+    op.execute("CREATE INDEX ix_classes_members_vector ON classes USING gin (members_vector)")
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_classes_members_vector")
+    op.execute("DROP INDEX IF EXISTS ix_classes_search_vector")
+    op.execute("DROP INDEX IF EXISTS ix_projects_search_vector")
+    op.execute("DROP TRIGGER IF EXISTS classes_search_vector_trigger ON classes")
+    op.execute("DROP FUNCTION IF EXISTS classes_search_vector_update()")
+    op.execute("ALTER TABLE classes DROP COLUMN IF EXISTS members_vector, DROP COLUMN IF EXISTS search_vector")
+    op.execute("DROP TRIGGER IF EXISTS projects_search_vector_trigger ON projects")
+    op.execute("DROP FUNCTION IF EXISTS projects_search_vector_update()")
+    op.execute("ALTER TABLE projects DROP COLUMN IF EXISTS search_vector")
+    op.execute("DROP FUNCTION IF EXISTS fts_member_names(json)")
+    op.execute("DROP FUNCTION IF EXISTS fts_identifier(text)")
@@ -0,0 +1,67 @@
+"""Resumenes diarios de la bitacora de sesiones
+
+Revision ID: b8e3d5f7a9c2
+Revises: a2c7e9f4b1d3
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e3d5f7a9c2'
+down_revision = 'a2c7e9f4b1d3'
+branch_labels = None
+depends_on = None
+
+
+# Contadores de bitacora_users por dia y por usuario, y la ultima IP de cada usuario. Los llena
+# el trabajo "audit_rollup" (services/audit_rollup.py) a partir de la marca de
+# bitacora_rollup_state; la primera pasada recorre toda la bitacora existente.
+def upgrade():
+    op.create_table('bitacora_daily_counts',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('tipo_accion', sa.Text(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'tipo_accion')
+    )
+    # La clave empieza por user_id: el rango de dias de un usuario es un recorrido de indice
+    op.create_table('bitacora_user_daily_counts',
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('tipo_accion', sa.Text(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'day', 'tipo_accion')
+    )
+    op.create_table('bitacora_last_ips',
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('ip', sa.Text(), nullable=False),
+    sa.Column('seen_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_index('ix_bitacora_last_ips_seen_at', 'bitacora_last_ips', ['seen_at'], unique=False)
+
+    # Una sola fila: hasta donde (created_at) ya se sumo la bitacora
+    op.create_table('bitacora_rollup_state',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('watermark', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.CheckConstraint('id = 1', name='ck_bitacora_rollup_state_single_row'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute("INSERT INTO bitacora_rollup_state (id, watermark) VALUES (1, '1970-01-01 00:00:00+00')")
+
+    # Cada pasada lee solo el tramo nuevo de la bitacora
+    op.create_index('ix_bitacora_users_created_at', 'bitacora_users', ['created_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_bitacora_users_created_at', table_name='bitacora_users')
+    op.drop_table('bitacora_rollup_state')
+    op.drop_index('ix_bitacora_last_ips_seen_at', table_name='bitacora_last_ips')
+    op.drop_table('bitacora_last_ips')
+    op.drop_table('bitacora_user_daily_counts')
+    op.drop_table('bitacora_daily_counts')
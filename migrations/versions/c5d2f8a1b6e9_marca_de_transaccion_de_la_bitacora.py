@@ -0,0 +1,62 @@
+"""Marca de transaccion para los resumenes de la bitacora
+
+Revision ID: c5d2f8a1b6e9
+Revises: b8e3d5f7a9c2
+Create Date: 2026-10-20 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5d2f8a1b6e9'
+down_revision = 'b8e3d5f7a9c2'
+branch_labels = None
+depends_on = None
+
+
+# La marca de bitacora_rollup_state deja de ser un created_at (hora del servidor de la app, fijada
+# antes del commit) y pasa a ser un id de transaccion que asigna la BD: cada evento guarda el de la
+# transaccion que lo inserto (created_xid) y una pasada suma los que estan por debajo del xmin de
+# su snapshot, que ya terminaron todos.
+def upgrade():
+    op.execute("ALTER TABLE bitacora_users ADD COLUMN created_xid xid8")
+    # Lo ya sumado queda en 0; lo pendiente toma el id de esta migracion, que es tambien la marca
+    # nueva, asi la primera pasada despues del commit lo suma
+    op.execute("""
+        UPDATE bitacora_users
+        SET created_xid = CASE
+            WHEN created_at < (SELECT watermark FROM bitacora_rollup_state WHERE id = 1) THEN '0'::xid8
+            ELSE pg_current_xact_id()
+        END
+    """)
+    op.execute("""
+        ALTER TABLE bitacora_users
+            ALTER COLUMN created_xid SET DEFAULT pg_current_xact_id(),
+            ALTER COLUMN created_xid SET NOT NULL
+    """)
+    op.create_index('ix_bitacora_users_created_xid', 'bitacora_users', ['created_xid'], unique=False)
+    op.drop_index('ix_bitacora_users_created_at', table_name='bitacora_users')
+
+    op.execute("ALTER TABLE bitacora_rollup_state DROP COLUMN watermark")
+    op.execute("ALTER TABLE bitacora_rollup_state ADD COLUMN watermark xid8 NOT NULL DEFAULT pg_current_xact_id()")
+    op.execute("ALTER TABLE bitacora_rollup_state ALTER COLUMN watermark DROP DEFAULT")
+
+
+def downgrade():
+    # Aproximado: la marca por created_at vuelve justo despues del ultimo evento ya sumado
+    op.add_column('bitacora_rollup_state', sa.Column('watermark_at', sa.DateTime(timezone=True), nullable=True))
+    op.execute("""
+        UPDATE bitacora_rollup_state s
+        SET watermark_at = COALESCE(
+            (SELECT max(created_at) + interval '1 microsecond' FROM bitacora_users WHERE created_xid < s.watermark),
+            '1970-01-01 00:00:00+00'
+        )
+    """)
+    op.drop_column('bitacora_rollup_state', 'watermark')
+    op.alter_column('bitacora_rollup_state', 'watermark_at', new_column_name='watermark', nullable=False)
+
+    op.create_index('ix_bitacora_users_created_at', 'bitacora_users', ['created_at'], unique=False)
+    op.drop_index('ix_bitacora_users_created_xid', table_name='bitacora_users')
+    op.drop_column('bitacora_users', 'created_xid')
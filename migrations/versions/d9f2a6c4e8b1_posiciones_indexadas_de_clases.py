@@ -0,0 +1,33 @@
+"""Posiciones indexadas de clases para consultas por area visible
+
+Revision ID: d9f2a6c4e8b1
+Revises: c3a8e5d1f2b4
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd9f2a6c4e8b1'
+down_revision = 'c3a8e5d1f2b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Columnas generadas: PostgreSQL las recalcula en cada escritura de 'position' (valores no numericos -> NULL)
+    op.add_column('classes', sa.Column('pos_x', sa.Float(), sa.Computed("CASE WHEN json_typeof(position -> 'x') = 'number' THEN (position ->> 'x')::double precision END", persisted=True), nullable=True))
+    op.add_column('classes', sa.Column('pos_y', sa.Float(), sa.Computed("CASE WHEN json_typeof(position -> 'y') = 'number' THEN (position ->> 'y')::double precision END", persisted=True), nullable=True))
+    op.create_index('ix_classes_project_position', 'classes', ['project_id', 'pos_x', 'pos_y'], unique=False)
+    op.create_index(op.f('ix_relationships_source_class_id'), 'relationships', ['source_class_id'], unique=False)
+    op.create_index(op.f('ix_relationships_target_class_id'), 'relationships', ['target_class_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_relationships_target_class_id'), table_name='relationships')
+    op.drop_index(op.f('ix_relationships_source_class_id'), table_name='relationships')
+    op.drop_index('ix_classes_project_position', table_name='classes')
+    op.drop_column('classes', 'pos_y')
+    op.drop_column('classes', 'pos_x')
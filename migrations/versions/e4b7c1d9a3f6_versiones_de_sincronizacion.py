@@ -0,0 +1,94 @@
+"""Versiones de sincronizacion y lapidas de clases y relaciones
+
+Revision ID: e4b7c1d9a3f6
+Revises: d9f2a6c4e8b1
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4b7c1d9a3f6'
+down_revision = 'd9f2a6c4e8b1'
+branch_labels = None
+depends_on = None
+
+
+# Cada escritura en classes/relationships toma un numero nuevo de una secuencia global
+# (sync_version) y cada borrado fisico deja una lapida en sync_tombstones con otro numero.
+# Un cliente que recuerda el ultimo numero que vio pide solo lo que cambio despues.
+def upgrade():
+    op.execute("CREATE SEQUENCE sync_version_seq")
+
+    # El DEFAULT rellena las filas existentes al añadir la columna
+    op.execute("ALTER TABLE classes ADD COLUMN sync_version bigint NOT NULL DEFAULT nextval('sync_version_seq')")
+    op.execute("ALTER TABLE relationships ADD COLUMN sync_version bigint NOT NULL DEFAULT nextval('sync_version_seq')")
+    op.create_index('ix_classes_project_sync_version', 'classes', ['project_id', 'sync_version'], unique=False)
+    op.create_index('ix_relationships_project_sync_version', 'relationships', ['project_id', 'sync_version'], unique=False)
+
+    op.create_table('sync_tombstones',
+    sa.Column('sync_version', sa.BigInteger(), nullable=False),
+    sa.Column('project_id', sa.UUID(), nullable=False),
+    sa.Column('entity', sa.Text(), nullable=False),
+    sa.Column('entity_id', sa.UUID(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('sync_version')
+    )
+    op.create_index('ix_sync_tombstones_project_entity_version', 'sync_tombstones', ['project_id', 'entity', 'sync_version'], unique=False)
+
+    # Ultima version cuyas lapidas ya se purgaron: un cursor anterior obliga a resincronizar
+    op.add_column('projects', sa.Column('sync_floor', sa.BigInteger(), server_default='0', nullable=False))
+
+    # Los numeros se toman con un bloqueo por proyecto que dura hasta el commit: dentro de un
+    # proyecto el orden de las versiones es el orden de commit y ningun cursor salta una escritura
+    # que todavia no era visible.
+    op.execute("""
+        CREATE FUNCTION sync_version_update() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            PERFORM pg_advisory_xact_lock(hashtext(NEW.project_id::text));
+            NEW.sync_version := nextval('sync_version_seq');
+            RETURN NEW;
+        END
+        $$
+    """)
+    op.execute("""
+        CREATE FUNCTION sync_tombstone_insert() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            PERFORM pg_advisory_xact_lock(hashtext(OLD.project_id::text));
+            INSERT INTO sync_tombstones (sync_version, project_id, entity, entity_id)
+            VALUES (nextval('sync_version_seq'), OLD.project_id, TG_ARGV[0], OLD.id);
+            RETURN OLD;
+        END
+        $$
+    """)
+    for table, entity in (("classes", "class"), ("relationships", "relationship")):
+        op.execute(f"""
+            CREATE TRIGGER {table}_sync_version_trigger
+            BEFORE INSERT OR UPDATE ON {table}
+            FOR EACH ROW EXECUTE FUNCTION sync_version_update()
+        """)
+        op.execute(f"""
+            CREATE TRIGGER {table}_sync_tombstone_trigger
+            AFTER DELETE ON {table}
+            FOR EACH ROW EXECUTE FUNCTION sync_tombstone_insert('{entity}')
+        """)
+
+
+def downgrade():
+    for table in ("relationships", "classes"):
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_sync_tombstone_trigger ON {table}")
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_sync_version_trigger ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS sync_tombstone_insert()")
+    op.execute("DROP FUNCTION IF EXISTS sync_version_update()")
+    op.drop_column('projects', 'sync_floor')
+    op.drop_index('ix_sync_tombstones_project_entity_version', table_name='sync_tombstones')
+    op.drop_table('sync_tombstones')
+    op.drop_index('ix_relationships_project_sync_version', table_name='relationships')
+    op.drop_index('ix_classes_project_sync_version', table_name='classes')
+    op.drop_column('relationships', 'sync_version')
+    op.drop_column('classes', 'sync_version')
+    op.execute("DROP SEQUENCE IF EXISTS sync_version_seq")
@@ -0,0 +1,14 @@
+"""Punto de entrada WSGI de produccion: gunicorn wsgi:app (configuracion en gunicorn.conf.py)."""
+import logging
+import time
+
+_started = time.perf_counter()
+
+from app import create_app  # noqa: E402
+from app.services.metrics import metrics  # noqa: E402
+
+app = create_app()
+
+# Importar y construir la app es el arranque en frio de cada despliegue (con preload, una vez en el maestro)
+metrics.cold_start_seconds = time.perf_counter() - _started
+logging.getLogger(__name__).info("Aplicacion creada en %.3f s", metrics.cold_start_seconds)